@@ -0,0 +1,172 @@
+"""
+Пакет разнородных операций (POST /api/batch) в одной транзакции.
+
+Операции проверяются заранее, в потоке запроса, а выполняются одной
+операцией потока записи: ошибка любой из них откатывает весь пакет.
+Созданные записи можно использовать в следующих операциях пакета
+через ссылки "$имя".
+"""
+
+import sqlite3
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Type, Union
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+import backend.crud as crud
+from backend.schemas import (
+    BatchOperation, ClientCreate, ClientUpdate, DealCreate, DealUpdate, TaskCreate, TaskUpdate
+)
+
+REF_PREFIX = "$"
+# Поля data, которые могут ссылаться на записи пакета
+REF_FIELDS = ("client_id", "deal_id")
+
+
+class EntityOps(NamedTuple):
+    """CRUD-функции и схемы сущности."""
+    name: str
+    create: Callable[[sqlite3.Connection, dict], int]
+    get: Callable[[sqlite3.Connection, int], Optional[Dict[str, Any]]]
+    update: Callable[[sqlite3.Connection, int, dict], bool]
+    delete: Callable[[sqlite3.Connection, int], bool]
+    create_model: Type[BaseModel]
+    update_model: Type[BaseModel]
+
+
+ENTITIES = {
+    "clients": EntityOps("Client", crud.create_client, crud.get_client, crud.update_client, crud.delete_client, ClientCreate, ClientUpdate),
+    "deals": EntityOps("Deal", crud.create_deal, crud.get_deal, crud.update_deal, crud.delete_deal, DealCreate, DealUpdate),
+    "tasks": EntityOps("Task", crud.create_task, crud.get_task, crud.update_task, crud.delete_task, TaskCreate, TaskUpdate),
+}
+
+
+class PreparedOperation(NamedTuple):
+    """Проверенная операция; ссылки "$имя" ещё не подставлены."""
+    op: str
+    entity: str
+    id: Optional[Union[int, str]]
+    ref: Optional[str]
+    data: Dict[str, Any]
+
+
+def _error(index: int, status_code: int, detail: str) -> HTTPException:
+    """Ошибка с номером операции."""
+    return HTTPException(status_code=status_code, detail=f"Operation {index}: {detail}")
+
+
+def _check_ref(index: int, value: Union[int, str], refs: Set[str]):
+    """Проверить, что значение - ID или ссылка на уже созданную в пакете запись."""
+    if isinstance(value, int):
+        return
+    if not value.startswith(REF_PREFIX) or value[len(REF_PREFIX):] not in refs:
+        raise _error(index, 422, f"Unknown reference: {value}")
+
+
+def _resolve(value: Any, refs: Dict[str, int]) -> Any:
+    """Подставить ID вместо ссылки "$имя"."""
+    if isinstance(value, str) and value.startswith(REF_PREFIX):
+        return refs[value[len(REF_PREFIX):]]
+    return value
+
+
+def prepare_batch(operations: List[BatchOperation]) -> List[PreparedOperation]:
+    """
+    Проверить операции пакета до выполнения.
+    
+    Данные валидируются схемами Create/Update сущности, ссылки - на то,
+    что запись с таким ref создаётся раньше в этом же пакете.
+    
+    Raises:
+        HTTPException: 422 с номером операции
+    """
+    refs: Set[str] = set()
+    prepared = []
+    
+    for index, operation in enumerate(operations):
+        entity = ENTITIES[operation.entity]
+        
+        if operation.op == "create":
+            if operation.id is not None:
+                raise _error(index, 422, "id is not allowed for create")
+        else:
+            if operation.id is None:
+                raise _error(index, 422, f"id is required for {operation.op}")
+            _check_ref(index, operation.id, refs)
+        
+        payload: Dict[str, Any] = {}
+        if operation.op != "delete":
+            model = entity.create_model if operation.op == "create" else entity.update_model
+            data = dict(operation.data)
+            placeholders = {}
+            for field in REF_FIELDS:
+                if field in model.model_fields and isinstance(data.get(field), str):
+                    _check_ref(index, data[field], refs)
+                    placeholders[field] = data[field]
+                    # Для валидации ссылка временно заменяется числом
+                    data[field] = 0
+            try:
+                validated = model.model_validate(data)
+            except ValidationError as exc:
+                raise HTTPException(status_code=422, detail=[
+                    {**error, "loc": ["body", "operations", index, "data", *error["loc"]]}
+                    for error in exc.errors(include_url=False, include_context=False)
+                ])
+            payload = validated.model_dump(exclude_unset=operation.op == "update")
+            payload.update(placeholders)
+        
+        if operation.ref is not None:
+            if operation.op != "create":
+                raise _error(index, 422, "ref is only allowed for create")
+            if operation.ref in refs:
+                raise _error(index, 422, f"Duplicate ref: {operation.ref}")
+            refs.add(operation.ref)
+        
+        prepared.append(PreparedOperation(operation.op, operation.entity, operation.id, operation.ref, payload))
+    
+    return prepared
+
+
+def execute_batch(conn: sqlite3.Connection, prepared: List[PreparedOperation]) -> Dict[str, Any]:
+    """
+    Выполнить пакет (вызывается внутри транзакции потока записи).
+    
+    Returns:
+        {"results": [{"op", "entity", "id", "row"}], "refs": {имя: id}}
+    
+    Raises:
+        HTTPException: 404 если запись для update/delete не найдена,
+            409 при нарушении ограничений БД
+    """
+    refs: Dict[str, int] = {}
+    results = []
+    
+    for index, operation in enumerate(prepared):
+        entity = ENTITIES[operation.entity]
+        data = {
+            key: _resolve(value, refs) if key in REF_FIELDS else value
+            for key, value in operation.data.items()
+        }
+        
+        try:
+            if operation.op == "create":
+                target = entity.create(conn, data)
+                if operation.ref is not None:
+                    refs[operation.ref] = target
+            else:
+                target = _resolve(operation.id, refs)
+                if operation.op == "update":
+                    found = entity.update(conn, target, data)
+                else:
+                    found = entity.delete(conn, target)
+                if not found:
+                    raise _error(index, 404, f"{entity.name} not found")
+        except sqlite3.IntegrityError as exc:
+            raise _error(index, 409, f"Integrity error: {exc}")
+        
+        results.append({
+            "op": operation.op,
+            "entity": operation.entity,
+            "id": target,
+            "row": entity.get(conn, target) if operation.op != "delete" else None
+        })
+    
+    return {"results": results, "refs": refs}
@@ -0,0 +1,83 @@
+"""
+Кэш результатов чтения в памяти процесса.
+
+Ключ записи - ETag ответа: он уже содержит путь с нормализованными
+параметрами запроса (сущность и фильтры) и версию таблицы из
+table_versions. Любая запись в таблицу увеличивает версию, поэтому
+устаревшие записи кэша перестают находиться и вытесняются по LRU -
+отдельная инвалидация не нужна.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+# Ответы крупнее этого размера (например, списки без limit) не кэшируются
+QUERY_CACHE_MAX_ENTRY_KB = int(os.getenv("QUERY_CACHE_MAX_ENTRY_KB", "1024"))
+
+
+def _weight(value: Any) -> int:
+    """Размер отрендеренного тела в байтах (0 для словарей)."""
+    if isinstance(value, tuple):
+        return sum(len(part) for part in value if isinstance(part, bytes))
+    return 0
+
+
+class QueryCache:
+    """Ограниченный LRU-кэш результатов запросов."""
+    
+    def __init__(self, size: int = QUERY_CACHE_SIZE, max_entry_kb: int = QUERY_CACHE_MAX_ENTRY_KB):
+        self.size = size
+        self.max_entry_bytes = max_entry_kb * 1024
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_set(self, key: str, compute: Callable[[], T]) -> T:
+        """
+        Вернуть значение из кэша или вычислить и сохранить его.
+        
+        None (например, запись не найдена) не кэшируется.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        
+        value = compute()
+        if value is None or self.size <= 0 or _weight(value) > self.max_entry_bytes:
+            return value
+        
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+    
+    def clear(self):
+        """Очистить кэш и счётчики."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Счётчики попаданий и промахов."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.size
+            }
+
+
+query_cache = QueryCache()
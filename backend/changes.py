@@ -0,0 +1,98 @@
+"""
+Журнал изменений (таблица changes) для инкрементальной синхронизации.
+
+Строки журнала пишут триггеры в той же транзакции, что и изменение
+данных, поэтому seq монотонно растёт без пропусков зафиксированных
+изменений. Журнал периодически сокращается по возрасту и размеру.
+"""
+
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+# Сколько дней хранить изменения
+CHANGES_RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS", "7"))
+# Сколько последних изменений хранить в любом случае не больше
+CHANGES_MAX_ROWS = int(os.getenv("CHANGES_MAX_ROWS", "100000"))
+# Раз во сколько коммитов запускать сокращение журнала
+CHANGES_COMPACT_EVERY = int(os.getenv("CHANGES_COMPACT_EVERY", "1000"))
+
+
+def head_seq(conn: sqlite3.Connection) -> int:
+    """Номер последнего записанного изменения (0, если изменений не было)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+    return row[0] if row else 0
+
+
+def horizon_seq(conn: sqlite3.Connection) -> int:
+    """Номер последнего удалённого при сокращении изменения."""
+    row = conn.execute("SELECT MIN(seq) FROM changes").fetchone()
+    if row[0] is None:
+        return head_seq(conn)
+    return row[0] - 1
+
+
+def get_changes(
+    conn: sqlite3.Connection,
+    since: int = 0,
+    limit: int = 500,
+    entity: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Изменения с seq > since по возрастанию seq.
+    
+    Запрашивается limit + 1 строка, чтобы определить наличие следующей страницы.
+    """
+    query = "SELECT seq, entity, entity_id, op, changed_at FROM changes WHERE seq > ?"
+    params: List[Any] = [since]
+    if entity:
+        query += " AND entity = ?"
+        params.append(entity)
+    query += " ORDER BY seq LIMIT ?"
+    params.append(limit + 1)
+    
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(query, params)
+    return [
+        {"seq": seq, "entity": entity_name, "entity_id": entity_id, "op": op, "changed_at": changed_at}
+        for seq, entity_name, entity_id, op, changed_at in cursor
+    ]
+
+
+def compact_changes(
+    conn: sqlite3.Connection,
+    retention_days: int = CHANGES_RETENTION_DAYS,
+    max_rows: int = CHANGES_MAX_ROWS
+) -> int:
+    """
+    Удалить изменения старше retention_days и сверх max_rows последних.
+    
+    Returns:
+        Количество удалённых строк
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "DELETE FROM changes WHERE changed_at < strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime', ?)",
+        (f"-{retention_days} days",)
+    )
+    deleted = cursor.rowcount
+    cursor.execute(
+        "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?",
+        (max_rows,)
+    )
+    return deleted + cursor.rowcount
+
+
+def schedule_compaction(writer, every: int = CHANGES_COMPACT_EVERY):
+    """Запускать compact_changes через поток записи раз в every коммитов."""
+    commits = 0
+    
+    def on_commit():
+        nonlocal commits
+        commits += 1
+        if commits >= every:
+            commits = 0
+            writer.submit_async(compact_changes)
+    
+    writer.on_commit(on_commit)
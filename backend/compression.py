@@ -0,0 +1,176 @@
+"""
+Сжатие ответов по Accept-Encoding: brotli (если установлен пакет brotli)
+или gzip.
+
+Небольшие ответы (меньше порога) не сжимаются. Потоковые ответы
+(выгрузки) сжимаются по частям со сбросом буфера после каждой части,
+поток событий text/event-stream не сжимается вовсе, чтобы события не
+задерживались в буфере компрессора.
+"""
+
+import os
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - необязательная зависимость
+    brotli = None
+
+# Ответы меньше этого размера отдаются как есть
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Типы, которые не сжимаются
+SKIP_MEDIA_TYPES = ("text/event-stream",)
+
+
+class GzipEncoder:
+    """Потоковый gzip."""
+    
+    name = "gzip"
+    
+    def __init__(self, level: int = GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    
+    def compress(self, data: bytes) -> bytes:
+        """Сжать часть и сбросить буфер, чтобы клиент мог её разобрать."""
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self) -> bytes:
+        """Завершить поток."""
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    """Потоковый brotli."""
+    
+    name = "br"
+    
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+    
+    def compress(self, data: bytes) -> bytes:
+        """Сжать часть и сбросить буфер."""
+        return self._compressor.process(data) + self._compressor.flush()
+    
+    def finish(self) -> bytes:
+        """Завершить поток."""
+        return self._compressor.finish()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Выбрать кодировку из Accept-Encoding: br, затем gzip (q=0 - запрет)."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    for name in candidates:
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI-middleware сжатия ответов."""
+    
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    """Сжатие одного ответа."""
+    
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+    
+    def _start_encoding(self, streaming: bool):
+        """Поправить заголовки под сжатое тело."""
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # Сжатое тело - другое представление: сильный ETag становится слабым
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if streaming:
+            del headers["Content-Length"]
+        self.encoder = BrotliEncoder() if self.encoding == "br" else GzipEncoder()
+    
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or media_type.startswith(SKIP_MEDIA_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self.start_message is not None:
+            # Первая часть тела: решить, сжимать ли
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.start_message)
+                self.start_message = None
+                await self.send(message)
+                return
+            self._start_encoding(streaming=more_body)
+            if more_body:
+                data = self.encoder.compress(body)
+            else:
+                data = self.encoder.compress(body) + self.encoder.finish()
+                MutableHeaders(raw=self.start_message["headers"])["Content-Length"] = str(len(data))
+            await self.send(self.start_message)
+            self.start_message = None
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+        
+        data = self.encoder.compress(body)
+        if not more_body:
+            data += self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -2,9 +2,42 @@
 CRUD операции для работы с БД.
 """
 
+import re
 import sqlite3
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Sequence, Tuple
 from datetime import datetime
+from backend.database import transaction
+from backend.metrics import timed_query
+
+
+# Колонки таблиц в порядке выдачи API
+COLUMNS = {
+    "clients": ("id", "name", "email", "phone", "company", "status", "created_at"),
+    "deals": ("id", "title", "amount", "currency", "status", "client_id", "close_date", "created_at"),
+    "tasks": ("id", "title", "description", "due_date", "is_done", "client_id", "deal_id", "created_at"),
+}
+
+
+# Колонки, которые можно менять через update_* и bulk_*
+UPDATABLE = {
+    "clients": ("name", "email", "phone", "company", "status"),
+    "deals": ("title", "amount", "currency", "status", "client_id", "close_date"),
+    "tasks": ("title", "description", "due_date", "is_done", "client_id", "deal_id"),
+}
+
+
+# Колонки, которые хранятся как 0/1, а в API - логические значения
+BOOLEAN_COLUMNS = {"is_done"}
+
+
+# Связанные сущности для include=: имя -> (таблица, внешний ключ)
+RELATIONS = {
+    "deals": {"client": ("clients", "client_id")},
+    "tasks": {"client": ("clients", "client_id"), "deal": ("deals", "deal_id")},
+}
+
+# Сколько id подставлять в один IN (...)
+IN_CHUNK_SIZE = 500
 
 
 def dict_factory(cursor: sqlite3.Cursor, row: sqlite3.Row) -> Dict[str, Any]:
@@ -12,53 +45,423 @@ def dict_factory(cursor: sqlite3.Cursor, row: sqlite3.Row) -> Dict[str, Any]:
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
 
-# ===== КЛИЕНТЫ =====
+def fts_query(q: str) -> Optional[str]:
+    """
+    Преобразовать строку поиска в запрос FTS5.
+    
+    Каждое слово ищется как префикс ("иван" найдёт "Иванов"), слова
+    объединяются через AND. Возвращает None, если в строке нет слов.
+    """
+    tokens = re.findall(r"[^\W_]+", q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _from_where(
+    table: str,
+    q: Optional[str],
+    filters: List[str],
+    params: List[Any],
+    joins: str = ""
+) -> Tuple[str, List[Any]]:
+    """
+    Собрать FROM ... WHERE ... для списка сущности.
+    
+    Поиск q идёт через FTS5-таблицу {table}_fts (см. миграцию 3),
+    остальные фильтры - обычные условия по колонкам table. joins
+    подставляется перед WHERE.
+    """
+    if q:
+        fts = f"{table}_fts"
+        sql = f"FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid{joins} WHERE {fts} MATCH ?"
+        match = fts_query(q)
+        params = [match] + params
+        if match is None:
+            sql += " AND 0"
+    else:
+        sql = f"FROM {table}{joins} WHERE 1=1"
+    
+    for condition in filters:
+        sql += f" AND {condition}"
+    
+    return sql, params
 
-def create_client(conn: sqlite3.Connection, client: dict) -> int:
-    """Создать клиента."""
+
+def _select_list(table: str, columns: Optional[Sequence[str]] = None) -> str:
+    """Список колонок для SELECT."""
+    return ", ".join(f"{table}.{col}" for col in (columns or COLUMNS[table]))
+
+
+def _json_value(table: str, col: str) -> str:
+    """Колонка для json_object/json_array: логические приводятся к true/false."""
+    value = f"{table}.{col}"
+    if col in BOOLEAN_COLUMNS:
+        value = f"json(CASE WHEN {value} THEN 'true' ELSE 'false' END)"
+    return value
+
+
+def _json_object(table: str, columns: Optional[Sequence[str]] = None) -> str:
+    """Выражение json_object(...) для строки: SQLite сразу отдаёт готовый JSON."""
+    parts = [f"'{col}', {_json_value(table, col)}" for col in columns or COLUMNS[table]]
+    return f"json_object({', '.join(parts)})"
+
+
+def _json_array(table: str, columns: Optional[Sequence[str]] = None) -> str:
+    """Выражение json_array(...): значения строки без имён колонок."""
+    parts = [_json_value(table, col) for col in columns or COLUMNS[table]]
+    return f"json_array({', '.join(parts)})"
+
+
+def _include_joins(table: str, include: Sequence[str]) -> Tuple[str, List[str]]:
+    """
+    LEFT JOIN связанных таблиц и выражения вложенных объектов.
+    
+    Returns:
+        (текст JOIN, выражения json_object по одному на имя из include)
+    """
+    joins = ""
+    values = []
+    for name in include:
+        related, key = RELATIONS[table][name]
+        alias = f"inc_{name}"
+        joins += f" LEFT JOIN {related} AS {alias} ON {alias}.id = {table}.{key}"
+        parts = [f"'{col}', {_json_value(alias, col)}" for col in COLUMNS[related]]
+        values.append(f"json(CASE WHEN {alias}.id IS NULL THEN NULL ELSE json_object({', '.join(parts)}) END)")
+    return joins, values
+
+
+def _order_by(table: str, q: Optional[str]) -> str:
+    """Порядок строк списка: по релевантности при поиске, затем по id DESC."""
+    if q:
+        return f" ORDER BY bm25({table}_fts), {table}.id DESC"
+    return f" ORDER BY {table}.id DESC"
+
+
+def _fetch_list(
+    conn: sqlite3.Connection,
+    table: str,
+    q: Optional[str],
+    filters: List[str],
+    params: List[Any],
+    limit: Optional[int],
+    after: Optional[List[Any]],
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False,
+    as_array: bool = False,
+    include: Sequence[str] = ()
+) -> List[Any]:
+    """
+    Выполнить запрос списка с keyset-пагинацией.
+    
+    columns сужает проекцию SELECT (по умолчанию - все колонки).
+    При as_json вместо словарей возвращаются кортежи (json, *ключи курсора):
+    строка уже сериализована в SQL, ключи - [id] или [search_rank, id].
+    as_array меняет объект на массив значений: json_array в SQL, а без
+    as_json - кортежи (кортеж значений, *ключи курсора).
+    include (только с as_json) - имена из RELATIONS[table]: связанные
+    строки присоединяются LEFT JOIN и вкладываются объектами (или null)
+    после колонок строки.
+    
+    Без поиска строки идут по id DESC, с поиском - по релевантности bm25,
+    а при равной релевантности по id DESC; релевантность возвращается
+    в колонке search_rank. after - ключи последней строки предыдущей
+    страницы: [id] или [search_rank, id]. При заданном limit возвращает
+    до limit + 1 строк: лишняя строка показывает, что есть следующая страница.
+    """
+    tuple_rows = as_json or as_array
+    cursor = conn.cursor()
+    cursor.row_factory = None if tuple_rows else dict_factory
+    
+    joins, embedded = _include_joins(table, include) if as_json else ("", [])
+    from_where, params = _from_where(table, q, filters, params, joins)
+    if as_json and embedded:
+        values = [_json_value(table, col) for col in columns or COLUMNS[table]]
+        if as_array:
+            select = f"json_array({', '.join(values + embedded)})"
+        else:
+            parts = [f"'{col}', {value}" for col, value in zip(columns or COLUMNS[table], values)]
+            parts += [f"'{name}', {value}" for name, value in zip(include, embedded)]
+            select = f"json_object({', '.join(parts)})"
+    elif as_json:
+        select = _json_array(table, columns) if as_array else _json_object(table, columns)
+    else:
+        select = _select_list(table, columns)
+    
+    if q:
+        rank = f"bm25({table}_fts)"
+        if tuple_rows:
+            query = f"SELECT {select}, {rank}, {table}.id {from_where}"
+        else:
+            query = f"SELECT {select}, {rank} AS search_rank {from_where}"
+        if after is not None:
+            query += f" AND ({rank} > ? OR ({rank} = ? AND {table}.id < ?))"
+            params.extend([after[0], after[0], after[1]])
+    else:
+        if tuple_rows:
+            query = f"SELECT {select}, {table}.id {from_where}"
+        else:
+            query = f"SELECT {select} {from_where}"
+        if after is not None:
+            query += f" AND {table}.id < ?"
+            params.append(after[0])
+    
+    query += _order_by(table, q)
+    
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    if as_array and not as_json:
+        width = len(columns or COLUMNS[table])
+        rows = [(row[:width], *row[width:]) for row in rows]
+    return rows
+
+
+def _iter_rows(
+    conn: sqlite3.Connection,
+    table: str,
+    q: Optional[str],
+    filters: List[str],
+    params: List[Any],
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False
+) -> Iterator[tuple]:
+    """
+    Построчно отдавать кортежи (в порядке columns или COLUMNS[table]) без fetchall.
+    
+    При as_json каждая строка - кортеж из одного JSON-объекта.
+    SQLite выдаёт строки по мере чтения курсора, поэтому память
+    не зависит от размера таблицы.
+    """
+    from_where, params = _from_where(table, q, filters, params)
+    select = _json_object(table, columns) if as_json else _select_list(table, columns)
+    
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO clients (name, email, phone, company, status, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
+    cursor.row_factory = None
+    try:
+        cursor.execute(f"SELECT {select} {from_where}{_order_by(table, q)}", params)
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+@timed_query("select")
+def get_included(
+    conn: sqlite3.Connection,
+    table: str,
+    ids: Sequence[int],
+    include: Sequence[str]
+) -> Dict[str, List[str]]:
+    """
+    Связанные строки для страницы списка без повторов (sideload).
+    
+    Args:
+        table: Таблица списка
+        ids: id строк страницы
+        include: Имена из RELATIONS[table]
+    
+    Returns:
+        Таблица связанной сущности -> JSON-объекты её строк по id DESC
+    """
+    included: Dict[str, List[str]] = {}
+    for name in include:
+        related, key = RELATIONS[table][name]
+        found = {}
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            chunk = list(ids[start:start + IN_CHUNK_SIZE])
+            placeholders = ", ".join("?" * len(chunk))
+            rows = conn.execute(f"""
+                SELECT {related}.id, {_json_object(related)} FROM {related}
+                WHERE {related}.id IN (SELECT {key} FROM {table} WHERE id IN ({placeholders}))
+            """, chunk).fetchall()
+            found.update((row[0], row[1]) for row in rows)
+        included.setdefault(related, [])
+        included[related].extend(found[item_id] for item_id in sorted(found, reverse=True))
+    return included
+
+
+@timed_query("select")
+def get_rows_json(conn: sqlite3.Connection, table: str, ids: Sequence[int]) -> Dict[int, str]:
+    """
+    Строки по id одним запросом на IN_CHUNK_SIZE id.
+    
+    Returns:
+        id -> JSON-объект строки (удалённых строк в ответе нет)
+    """
+    found: Dict[int, str] = {}
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        chunk = list(ids[start:start + IN_CHUNK_SIZE])
+        placeholders = ", ".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT {table}.id, {_json_object(table)} FROM {table} WHERE {table}.id IN ({placeholders})",
+            chunk
+        ).fetchall()
+        found.update((row[0], row[1]) for row in rows)
+    return found
+
+
+def _bulk_apply(
+    conn: sqlite3.Connection,
+    table: str,
+    insert_sql: str,
+    inserts: List[tuple],
+    updates: List[dict],
+    deletes: List[int]
+) -> Dict[str, Any]:
+    """
+    Применить пакет операций в одной транзакции через executemany.
+    
+    Порядок: создание, обновление, удаление. id новых строк вычисляются
+    по sqlite_sequence: под блокировкой записи AUTOINCREMENT выдаёт их
+    подряд начиная с seq + 1.
+    
+    Returns:
+        {"created_ids": [...], "updated": int, "deleted": int}
+    """
+    cursor = conn.cursor()
+    created_ids = []
+    updated = 0
+    deleted = 0
+    
+    with transaction(conn):
+        if inserts:
+            row = cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)
+            ).fetchone()
+            start = row[0] if row else 0
+            cursor.executemany(insert_sql, inserts)
+            created_ids = list(range(start + 1, start + 1 + len(inserts)))
+        
+        # UPDATE с разным набором полей - разные запросы, группируем
+        groups: Dict[tuple, List[tuple]] = {}
+        for item in updates:
+            columns = tuple(col for col in UPDATABLE[table] if item.get(col) is not None)
+            if columns:
+                groups.setdefault(columns, []).append(
+                    tuple(item[col] for col in columns) + (item['id'],)
+                )
+        for columns, rows in groups.items():
+            assignments = ", ".join(f"{col} = ?" for col in columns)
+            cursor.executemany(f"UPDATE {table} SET {assignments} WHERE id = ?", rows)
+            updated += cursor.rowcount
+        
+        if deletes:
+            cursor.executemany(f"DELETE FROM {table} WHERE id = ?", [(item_id,) for item_id in deletes])
+            deleted = cursor.rowcount
+    
+    return {"created_ids": created_ids, "updated": updated, "deleted": deleted}
+
+
+# ===== КЛИЕНТЫ =====
+
+INSERT_CLIENT = """
+    INSERT INTO clients (name, email, phone, company, status, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _client_values(client: dict, created_at: str) -> tuple:
+    """Значения для INSERT_CLIENT."""
+    return (
         client['name'],
         client.get('email'),
         client.get('phone'),
         client.get('company'),
         client.get('status', 'active'),
-        datetime.now().isoformat()
-    ))
-    conn.commit()
-    return cursor.lastrowid
+        created_at
+    )
 
 
-def get_clients(
-    conn: sqlite3.Connection,
-    q: Optional[str] = None,
-    status: Optional[str] = None
-) -> List[Dict[str, Any]]:
-    """Получить список клиентов с фильтрацией."""
+@timed_query("insert")
+def create_client(conn: sqlite3.Connection, client: dict) -> int:
+    """Создать клиента."""
     cursor = conn.cursor()
-    cursor.row_factory = dict_factory
-    
-    query = "SELECT * FROM clients WHERE 1=1"
+    with transaction(conn):
+        cursor.execute(INSERT_CLIENT, _client_values(client, datetime.now().isoformat()))
+    return cursor.lastrowid
+
+
+def _client_filters(status: Optional[str] = None) -> Tuple[List[str], List[Any]]:
+    """Условия фильтрации клиентов."""
+    filters = []
     params = []
     
-    if q:
-        query += " AND (name LIKE ? OR email LIKE ? OR phone LIKE ? OR company LIKE ?)"
-        search = f"%{q}%"
-        params.extend([search] * 4)
-    
     if status:
-        query += " AND status = ?"
+        filters.append("clients.status = ?")
         params.append(status)
     
-    query += " ORDER BY id DESC"
-    
-    cursor.execute(query, params)
-    return cursor.fetchall()
+    return filters, params
 
 
+@timed_query("select")
+def get_clients(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = None,
+    after: Optional[List[Any]] = None,
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False,
+    as_array: bool = False
+) -> List[Any]:
+    """
+    Получить список клиентов с фильтрацией.
+    
+    q ищет по имени, email, телефону и компании; limit, after, columns,
+    as_json и as_array - см. _fetch_list.
+    """
+    filters, params = _client_filters(status)
+    return _fetch_list(conn, "clients", q, filters, params, limit, after, columns, as_json, as_array)
+
+
+@timed_query("select")
+def iter_clients(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False
+) -> Iterator[tuple]:
+    """Потоково выбрать клиентов с теми же фильтрами, что и get_clients."""
+    filters, params = _client_filters(status)
+    return _iter_rows(conn, "clients", q, filters, params, columns, as_json)
+
+
+@timed_query("select")
+def stats_clients(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    status: Optional[str] = None
+) -> Dict[str, Any]:
+    """Агрегаты по клиентам (фильтры как в get_clients), считаются в SQL."""
+    filters, params = _client_filters(status)
+    from_where, params = _from_where("clients", q, filters, params)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"""
+        SELECT clients.status, COUNT(*),
+               SUM(clients.company IS NOT NULL AND clients.company <> '')
+        {from_where}
+        GROUP BY clients.status
+    """, params)
+    
+    by_status = {}
+    with_company = 0
+    for row_status, count, company_count in cursor:
+        by_status[row_status] = count
+        with_company += company_count
+    
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "with_company": with_company
+    }
+
+
+@timed_query("select")
 def get_client(conn: sqlite3.Connection, client_id: int) -> Optional[Dict[str, Any]]:
     """Получить клиента по ID."""
     cursor = conn.cursor()
@@ -67,6 +470,7 @@ def get_client(conn: sqlite3.Connection, client_id: int) -> Optional[Dict[str, A
     return cursor.fetchone()
 
 
+@timed_query("update")
 def update_client(conn: sqlite3.Connection, client_id: int, client: dict) -> bool:
     """Обновить клиента."""
     cursor = conn.cursor()
@@ -84,71 +488,155 @@ def update_client(conn: sqlite3.Connection, client_id: int, client: dict) -> boo
     
     params.append(client_id)
     query = f"UPDATE clients SET {', '.join(updates)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
+    with transaction(conn):
+        cursor.execute(query, params)
     return cursor.rowcount > 0
 
 
+@timed_query("delete")
 def delete_client(conn: sqlite3.Connection, client_id: int) -> bool:
     """Удалить клиента."""
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM clients WHERE id = ?", (client_id,))
-    conn.commit()
+    with transaction(conn):
+        cursor.execute("DELETE FROM clients WHERE id = ?", (client_id,))
     return cursor.rowcount > 0
 
 
+@timed_query("bulk")
+def bulk_clients(
+    conn: sqlite3.Connection,
+    create: List[dict],
+    update: List[dict],
+    delete: List[int]
+) -> Dict[str, Any]:
+    """Массово создать, обновить и удалить клиентов в одной транзакции."""
+    now = datetime.now().isoformat()
+    inserts = [_client_values(client, now) for client in create]
+    return _bulk_apply(conn, "clients", INSERT_CLIENT, inserts, update, delete)
+
+
 # ===== СДЕЛКИ =====
 
-def create_deal(conn: sqlite3.Connection, deal: dict) -> int:
-    """Создать сделку."""
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO deals (title, amount, currency, status, client_id, close_date, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
+INSERT_DEAL = """
+    INSERT INTO deals (title, amount, currency, status, client_id, close_date, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _deal_values(deal: dict, created_at: str) -> tuple:
+    """Значения для INSERT_DEAL."""
+    return (
         deal['title'],
         deal.get('amount', 0.0),
         deal.get('currency', 'RUB'),
         deal.get('status', 'new'),
         deal.get('client_id'),
         deal.get('close_date'),
-        datetime.now().isoformat()
-    ))
-    conn.commit()
+        created_at
+    )
+
+
+@timed_query("insert")
+def create_deal(conn: sqlite3.Connection, deal: dict) -> int:
+    """Создать сделку."""
+    cursor = conn.cursor()
+    with transaction(conn):
+        cursor.execute(INSERT_DEAL, _deal_values(deal, datetime.now().isoformat()))
     return cursor.lastrowid
 
 
-def get_deals(
-    conn: sqlite3.Connection,
-    q: Optional[str] = None,
+def _deal_filters(
     status: Optional[str] = None,
     client_id: Optional[int] = None
-) -> List[Dict[str, Any]]:
-    """Получить список сделок с фильтрацией."""
-    cursor = conn.cursor()
-    cursor.row_factory = dict_factory
-    
-    query = "SELECT * FROM deals WHERE 1=1"
+) -> Tuple[List[str], List[Any]]:
+    """Условия фильтрации сделок."""
+    filters = []
     params = []
     
-    if q:
-        query += " AND (title LIKE ?)"
-        params.append(f"%{q}%")
-    
     if status:
-        query += " AND status = ?"
+        filters.append("deals.status = ?")
         params.append(status)
     
     if client_id:
-        query += " AND client_id = ?"
+        filters.append("deals.client_id = ?")
         params.append(client_id)
     
-    query += " ORDER BY id DESC"
-    
-    cursor.execute(query, params)
-    return cursor.fetchall()
+    return filters, params
+
 
+@timed_query("select")
+def get_deals(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    client_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    after: Optional[List[Any]] = None,
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False,
+    as_array: bool = False,
+    include: Sequence[str] = ()
+) -> List[Any]:
+    """Получить список сделок с фильтрацией (q ищет по названию; include: client)."""
+    filters, params = _deal_filters(status, client_id)
+    return _fetch_list(conn, "deals", q, filters, params, limit, after, columns, as_json, as_array, include)
+
+
+@timed_query("select")
+def iter_deals(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    client_id: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False
+) -> Iterator[tuple]:
+    """Потоково выбрать сделки с теми же фильтрами, что и get_deals."""
+    filters, params = _deal_filters(status, client_id)
+    return _iter_rows(conn, "deals", q, filters, params, columns, as_json)
 
+
+@timed_query("select")
+def stats_deals(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    client_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """Агрегаты по сделкам (фильтры как в get_deals), считаются в SQL."""
+    filters, params = _deal_filters(status, client_id)
+    from_where, params = _from_where("deals", q, filters, params)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"""
+        SELECT deals.status, deals.currency, COUNT(*), TOTAL(deals.amount)
+        {from_where}
+        GROUP BY deals.status, deals.currency
+    """, params)
+    
+    by_status = {}
+    amount_by_status = {}
+    amount_by_currency = {}
+    total = 0
+    total_amount = 0.0
+    for row_status, currency, count, amount in cursor:
+        by_status[row_status] = by_status.get(row_status, 0) + count
+        amount_by_status[row_status] = amount_by_status.get(row_status, 0.0) + amount
+        amount_by_currency[currency] = amount_by_currency.get(currency, 0.0) + amount
+        total += count
+        total_amount += amount
+    
+    return {
+        "total": total,
+        "total_amount": total_amount,
+        "avg_amount": total_amount / total if total else 0.0,
+        "by_status": by_status,
+        "amount_by_status": amount_by_status,
+        "amount_by_currency": amount_by_currency
+    }
+
+
+@timed_query("select")
 def get_deal(conn: sqlite3.Connection, deal_id: int) -> Optional[Dict[str, Any]]:
     """Получить сделку по ID."""
     cursor = conn.cursor()
@@ -157,6 +645,7 @@ def get_deal(conn: sqlite3.Connection, deal_id: int) -> Optional[Dict[str, Any]]
     return cursor.fetchone()
 
 
+@timed_query("update")
 def update_deal(conn: sqlite3.Connection, deal_id: int, deal: dict) -> bool:
     """Обновить сделку."""
     cursor = conn.cursor()
@@ -174,83 +663,168 @@ def update_deal(conn: sqlite3.Connection, deal_id: int, deal: dict) -> bool:
     
     params.append(deal_id)
     query = f"UPDATE deals SET {', '.join(updates)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
+    with transaction(conn):
+        cursor.execute(query, params)
     return cursor.rowcount > 0
 
 
+@timed_query("delete")
 def delete_deal(conn: sqlite3.Connection, deal_id: int) -> bool:
     """Удалить сделку."""
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM deals WHERE id = ?", (deal_id,))
-    conn.commit()
+    with transaction(conn):
+        cursor.execute("DELETE FROM deals WHERE id = ?", (deal_id,))
     return cursor.rowcount > 0
 
 
+@timed_query("bulk")
+def bulk_deals(
+    conn: sqlite3.Connection,
+    create: List[dict],
+    update: List[dict],
+    delete: List[int]
+) -> Dict[str, Any]:
+    """Массово создать, обновить и удалить сделки в одной транзакции."""
+    now = datetime.now().isoformat()
+    inserts = [_deal_values(deal, now) for deal in create]
+    return _bulk_apply(conn, "deals", INSERT_DEAL, inserts, update, delete)
+
+
 # ===== ЗАДАЧИ =====
 
-def create_task(conn: sqlite3.Connection, task: dict) -> int:
-    """Создать задачу."""
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO tasks (title, description, due_date, is_done, client_id, deal_id, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
+INSERT_TASK = """
+    INSERT INTO tasks (title, description, due_date, is_done, client_id, deal_id, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _task_values(task: dict, created_at: str) -> tuple:
+    """Значения для INSERT_TASK."""
+    return (
         task['title'],
         task.get('description'),
         task.get('due_date'),
         1 if task.get('is_done', False) else 0,
         task.get('client_id'),
         task.get('deal_id'),
-        datetime.now().isoformat()
-    ))
-    conn.commit()
+        created_at
+    )
+
+
+@timed_query("insert")
+def create_task(conn: sqlite3.Connection, task: dict) -> int:
+    """Создать задачу."""
+    cursor = conn.cursor()
+    with transaction(conn):
+        cursor.execute(INSERT_TASK, _task_values(task, datetime.now().isoformat()))
     return cursor.lastrowid
 
 
-def get_tasks(
-    conn: sqlite3.Connection,
-    q: Optional[str] = None,
+def _task_filters(
     is_done: Optional[bool] = None,
     client_id: Optional[int] = None,
     deal_id: Optional[int] = None
-) -> List[Dict[str, Any]]:
-    """Получить список задач с фильтрацией."""
-    cursor = conn.cursor()
-    cursor.row_factory = dict_factory
-    
-    query = "SELECT * FROM tasks WHERE 1=1"
+) -> Tuple[List[str], List[Any]]:
+    """Условия фильтрации задач."""
+    filters = []
     params = []
     
-    if q:
-        query += " AND (title LIKE ? OR description LIKE ?)"
-        search = f"%{q}%"
-        params.extend([search, search])
-    
     if is_done is not None:
-        query += " AND is_done = ?"
+        filters.append("tasks.is_done = ?")
         params.append(1 if is_done else 0)
     
     if client_id:
-        query += " AND client_id = ?"
+        filters.append("tasks.client_id = ?")
         params.append(client_id)
     
     if deal_id:
-        query += " AND deal_id = ?"
+        filters.append("tasks.deal_id = ?")
         params.append(deal_id)
     
-    query += " ORDER BY id DESC"
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    
-    # Преобразовать is_done из int в bool
-    for row in rows:
-        row['is_done'] = bool(row['is_done'])
+    return filters, params
+
+
+@timed_query("select")
+def get_tasks(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    client_id: Optional[int] = None,
+    deal_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    after: Optional[List[Any]] = None,
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False,
+    as_array: bool = False,
+    include: Sequence[str] = ()
+) -> List[Any]:
+    """Получить список задач с фильтрацией (q ищет по названию и описанию; include: client, deal)."""
+    filters, params = _task_filters(is_done, client_id, deal_id)
+    rows = _fetch_list(conn, "tasks", q, filters, params, limit, after, columns, as_json, as_array, include)
+    
+    # Преобразовать is_done из int в bool (в JSON это уже сделано в SQL,
+    # кортежи значений приводит вызывающий)
+    if not as_json and not as_array and (not columns or 'is_done' in columns):
+        for row in rows:
+            row['is_done'] = bool(row['is_done'])
     
     return rows
 
 
+@timed_query("select")
+def iter_tasks(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    client_id: Optional[int] = None,
+    deal_id: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None,
+    as_json: bool = False
+) -> Iterator[tuple]:
+    """Потоково выбрать задачи с теми же фильтрами, что и get_tasks."""
+    filters, params = _task_filters(is_done, client_id, deal_id)
+    return _iter_rows(conn, "tasks", q, filters, params, columns, as_json)
+
+
+@timed_query("select")
+def stats_tasks(
+    conn: sqlite3.Connection,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    client_id: Optional[int] = None,
+    deal_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """Агрегаты по задачам (фильтры как в get_tasks), считаются в SQL."""
+    filters, params = _task_filters(is_done, client_id, deal_id)
+    from_where, params = _from_where("tasks", q, filters, params)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"""
+        SELECT tasks.is_done, COUNT(*),
+               SUM(tasks.due_date IS NOT NULL AND tasks.due_date < date('now', 'localtime'))
+        {from_where}
+        GROUP BY tasks.is_done
+    """, params)
+    
+    done = 0
+    not_done = 0
+    overdue = 0
+    for row_is_done, count, overdue_count in cursor:
+        if row_is_done:
+            done += count
+        else:
+            not_done += count
+            overdue += overdue_count
+    
+    return {
+        "total": done + not_done,
+        "done": done,
+        "not_done": not_done,
+        "overdue": overdue
+    }
+
+
+@timed_query("select")
 def get_task(conn: sqlite3.Connection, task_id: int) -> Optional[Dict[str, Any]]:
     """Получить задачу по ID."""
     cursor = conn.cursor()
@@ -262,6 +836,7 @@ def get_task(conn: sqlite3.Connection, task_id: int) -> Optional[Dict[str, Any]]
     return row
 
 
+@timed_query("update")
 def update_task(conn: sqlite3.Connection, task_id: int, task: dict) -> bool:
     """Обновить задачу."""
     cursor = conn.cursor()
@@ -283,15 +858,28 @@ def update_task(conn: sqlite3.Connection, task_id: int, task: dict) -> bool:
     
     params.append(task_id)
     query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
+    with transaction(conn):
+        cursor.execute(query, params)
     return cursor.rowcount > 0
 
 
+@timed_query("delete")
 def delete_task(conn: sqlite3.Connection, task_id: int) -> bool:
     """Удалить задачу."""
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-    conn.commit()
+    with transaction(conn):
+        cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
     return cursor.rowcount > 0
 
+
+@timed_query("bulk")
+def bulk_tasks(
+    conn: sqlite3.Connection,
+    create: List[dict],
+    update: List[dict],
+    delete: List[int]
+) -> Dict[str, Any]:
+    """Массово создать, обновить и удалить задачи в одной транзакции."""
+    now = datetime.now().isoformat()
+    inserts = [_task_values(task, now) for task in create]
+    return _bulk_apply(conn, "tasks", INSERT_TASK, inserts, update, delete)
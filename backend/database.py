@@ -2,75 +2,168 @@
 Модуль для работы с базой данных SQLite.
 """
 
+import itertools
 import sqlite3
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from backend.metrics import pool_wait
+from backend.migrations import migrate
 
 
-DATABASE_DIR = Path("data")
-DATABASE_DIR.mkdir(exist_ok=True)
-DATABASE_PATH = DATABASE_DIR / "crm.db"
+def _path_from_url(url: str) -> Path:
+    """Получить путь к файлу БД из DATABASE_URL (sqlite:///./data/crm.db)."""
+    prefix = "sqlite:///"
+    if url.startswith(prefix):
+        url = url[len(prefix):]
+    return Path(url)
 
 
-def get_db():
-    """Получить подключение к БД."""
-    conn = sqlite3.connect(str(DATABASE_PATH))
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/crm.db")
+DATABASE_PATH = _path_from_url(DATABASE_URL)
+DATABASE_DIR = DATABASE_PATH.parent
+DATABASE_DIR.mkdir(parents=True, exist_ok=True)
+
+# Настройки пула и соединений
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "32768"))
+
+
+def connect(path: Path = DATABASE_PATH) -> sqlite3.Connection:
+    """Открыть соединение и один раз настроить его прагмы."""
+    conn = sqlite3.connect(
+        str(path),
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False
+    )
     conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    # Отрицательное значение - размер кэша в КиБ, а не в страницах
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
 
 
-def init_db():
-    """Инициализировать БД (создать таблицы)."""
-    conn = sqlite3.connect(str(DATABASE_PATH))
-    cursor = conn.cursor()
+class ConnectionPool:
+    """Пул долгоживущих соединений с SQLite."""
+    
+    def __init__(self, path: Path = DATABASE_PATH, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
     
-    # Клиенты
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS clients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT,
-            phone TEXT,
-            company TEXT,
-            status TEXT NOT NULL DEFAULT 'active',
-            created_at TEXT NOT NULL
-        )
-    """)
+    def acquire(self) -> sqlite3.Connection:
+        """Взять соединение из пула (создаётся лениво, не больше size)."""
+        try:
+            conn = self._idle.get_nowait()
+            pool_wait.observe(0)
+            return conn
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    conn = connect(self.path)
+                except Exception:
+                    self._created -= 1
+                    raise
+                pool_wait.observe(0)
+                return conn
+        
+        # Все соединения заняты: ожидание попадает в метрику
+        started = time.perf_counter()
+        conn = self._idle.get()
+        pool_wait.observe(time.perf_counter() - started)
+        return conn
     
-    # Сделки
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS deals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            amount REAL NOT NULL DEFAULT 0,
-            currency TEXT NOT NULL DEFAULT 'RUB',
-            status TEXT NOT NULL DEFAULT 'new',
-            client_id INTEGER,
-            close_date TEXT,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (client_id) REFERENCES clients(id)
-        )
-    """)
+    @property
+    def opened(self) -> int:
+        """Сколько соединений открыто пулом."""
+        return self._created
     
-    # Задачи
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            due_date TEXT,
-            is_done INTEGER NOT NULL DEFAULT 0,
-            client_id INTEGER,
-            deal_id INTEGER,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (client_id) REFERENCES clients(id),
-            FOREIGN KEY (deal_id) REFERENCES deals(id)
-        )
-    """)
+    def release(self, conn: sqlite3.Connection):
+        """Вернуть соединение в пул."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
     
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер: взять соединение и вернуть его в пул."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+    
+    def close(self):
+        """Закрыть все свободные соединения."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+pool = ConnectionPool()
+
+_savepoint_ids = itertools.count(1)
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """
+    Выполнить блок в одной транзакции.
+    
+    Снаружи транзакции открывает BEGIN IMMEDIATE (блокировка записи
+    берётся сразу) и делает COMMIT/ROLLBACK; внутри уже открытой -
+    SAVEPOINT, откатывающий только этот блок.
+    """
+    if conn.in_transaction:
+        name = f"sp_{next(_savepoint_ids)}"
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            raise
+        conn.execute(f"RELEASE {name}")
+        return
+    
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
     conn.commit()
-    conn.close()
 
+
+def get_db():
+    """Получить подключение к БД из пула."""
+    with pool.connection() as conn:
+        yield conn
+
+
+def init_db():
+    """Инициализировать БД (применить миграции схемы)."""
+    conn = connect()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
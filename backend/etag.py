@@ -0,0 +1,82 @@
+"""
+ETag и условные GET-запросы.
+
+ETag строится из версии таблицы (table_versions, увеличивается триггерами
+при каждой записи) и хэша пути с параметрами запроса. Совпадение
+If-None-Match проверяется до выполнения самого запроса: ответ 304 стоит
+одного чтения по первичному ключу.
+"""
+
+import hashlib
+from datetime import date
+from sqlite3 import Connection
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from backend.crud import RELATIONS
+from backend.database import get_db
+from backend.formats import wants_msgpack
+
+ETAG_HEADER = "ETag"
+
+
+def table_version(conn: Connection, table: str) -> int:
+    """Текущая версия таблицы."""
+    row = conn.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def make_etag(version: str, request: Request) -> str:
+    """ETag ответа на запрос при данной версии таблиц (и представлении по Accept)."""
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}"
+    if wants_msgpack(request.headers.get("accept")):
+        key += "#msgpack"
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (слабое сравнение)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def etag_for(table: str, by_date: bool = False):
+    """
+    Зависимость FastAPI: вычислить ETag ответа по таблице.
+    
+    Если запрос вкладывает связанные сущности (include=), в ETag входят
+    и версии их таблиц. С by_date в ETag входит текущая локальная дата:
+    для ответов, зависящих от date('now', 'localtime') (просроченные
+    задачи), которые меняются без записи в таблицу. ETag служит и ключом
+    кэша запросов, поэтому кэш тоже сбрасывается со сменой даты.
+    
+    Если клиент прислал совпадающий If-None-Match, запрос завершается
+    ответом 304 до обращения к данным.
+    
+    Returns:
+        Функция-зависимость, возвращающая ETag
+    """
+    relations = RELATIONS.get(table, {})
+    
+    def dependency(request: Request, db: Connection = Depends(get_db)) -> str:
+        version = str(table_version(db, table))
+        include = request.query_params.get("include")
+        if include:
+            # Неизвестные имена отклонит обработчик (parse_include)
+            names = {name.strip() for name in include.split(",")}
+            for name in sorted(names & relations.keys()):
+                version += f".{table_version(db, relations[name][0])}"
+        if by_date:
+            version += f"@{date.today().isoformat()}"
+        etag = make_etag(version, request)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers={ETAG_HEADER: etag})
+        return etag
+    
+    return dependency
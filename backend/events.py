@@ -0,0 +1,206 @@
+"""
+Рассылка изменений данных подписчикам (Server-Sent Events).
+
+Источник событий - журнал changes. После каждого COMMIT поток записи
+будит рассыльщик, тот дочитывает новые строки журнала и раскладывает их
+по очередям подписчиков. В событие вставляется текущая строка записи
+(row; null для удаления или уже удалённой записи): строки порции журнала
+читаются одним запросом на таблицу, и клиентам не нужно запрашивать
+каждую изменённую запись отдельно. Очереди ограничены: подписчик, который не
+успевает их разбирать, отключается и при переподключении с
+Last-Event-ID догоняет пропущенное по журналу.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from starlette.concurrency import run_in_threadpool
+from backend.changes import get_changes, head_seq, horizon_seq
+from backend.crud import get_rows_json
+from backend.database import pool
+
+logger = logging.getLogger(__name__)
+
+# Размер очереди одного подписчика
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+# Интервал комментариев-пингов, чтобы прокси не закрывали соединение
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+# Сколько строк журнала читать за раз
+EVENTS_READ_BATCH = 500
+
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> bytes:
+    """Сообщение в формате text/event-stream."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def _read_changes(since: int, entity: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Прочитать порцию журнала после since вместе с текущими строками записей."""
+    with pool.connection() as conn:
+        changes = get_changes(conn, since=since, limit=EVENTS_READ_BATCH, entity=entity)
+        ids: Dict[str, Set[int]] = {}
+        for change in changes:
+            if change["op"] != "delete":
+                ids.setdefault(change["entity"], set()).add(change["entity_id"])
+        rows = {table: get_rows_json(conn, table, sorted(table_ids)) for table, table_ids in ids.items()}
+    for change in changes:
+        row = rows.get(change["entity"], {}).get(change["entity_id"])
+        change["row"] = json.loads(row) if row is not None else None
+    return changes
+
+
+def _read_positions() -> tuple:
+    """(horizon, head) журнала."""
+    with pool.connection() as conn:
+        return horizon_seq(conn), head_seq(conn)
+
+
+class Subscriber:
+    """Подписчик: ограниченная очередь событий и фильтр по сущности."""
+    
+    def __init__(self, entity: Optional[str] = None, size: int = EVENTS_QUEUE_SIZE):
+        self.entity = entity
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=size)
+
+
+class EventBroker:
+    """Раздача изменений из журнала подписчикам в памяти процесса."""
+    
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_seq = 0
+        self.dropped = 0
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Запустить рассыльщик в цикле событий приложения."""
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._last_seq = _read_positions()[1]
+        self._task = loop.create_task(self._pump())
+    
+    def stop(self):
+        """Остановить рассыльщик и закрыть потоки подписчиков (в цикле событий)."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for subscriber in list(self._subscribers):
+            self._drop(subscriber)
+        self._loop = None
+    
+    def notify(self):
+        """Сообщить о новом COMMIT (вызывается из потока записи)."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop and wakeup and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+    
+    def subscribe(self, entity: Optional[str] = None) -> Subscriber:
+        """Добавить подписчика."""
+        subscriber = Subscriber(entity, self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: Subscriber):
+        """Убрать подписчика."""
+        self._subscribers.discard(subscriber)
+    
+    @property
+    def subscribers(self) -> int:
+        """Количество подписчиков."""
+        return len(self._subscribers)
+    
+    def _drop(self, subscriber: Subscriber):
+        """Отключить подписчика: очистить очередь и положить признак конца."""
+        self._subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+    
+    def _publish(self, change: Dict[str, Any]):
+        """Разложить изменение по очередям; переполненных подписчиков отключить."""
+        for subscriber in list(self._subscribers):
+            if subscriber.entity and subscriber.entity != change["entity"]:
+                continue
+            try:
+                subscriber.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._drop(subscriber)
+    
+    async def _pump(self):
+        """Дочитывать журнал после каждого пробуждения."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._subscribers:
+                self._last_seq = (await run_in_threadpool(_read_positions))[1]
+                continue
+            try:
+                while True:
+                    changes = await run_in_threadpool(_read_changes, self._last_seq)
+                    for change in changes:
+                        self._last_seq = change["seq"]
+                        self._publish(change)
+                    if len(changes) <= EVENTS_READ_BATCH:
+                        break
+            except Exception:
+                # Следующий коммит разбудит рассыльщик и чтение повторится
+                logger.exception("Failed to read change log")
+
+
+broker = EventBroker()
+
+
+async def event_stream(
+    subscriber: Subscriber,
+    since: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Поток SSE для подписчика.
+    
+    Если задан since, сначала отдаются изменения из журнала после него,
+    затем живые события (повторы по seq отбрасываются). Если журнал уже
+    сокращён дальше since, отправляется событие resync с текущим seq,
+    после которого клиенту нужно перечитать данные целиком.
+    """
+    try:
+        last_seq = -1
+        if since is not None:
+            horizon, head = await run_in_threadpool(_read_positions)
+            if since < horizon:
+                yield format_event("resync", {"last_seq": head}, head)
+                return
+            last_seq = since
+            while True:
+                changes = await run_in_threadpool(_read_changes, last_seq, subscriber.entity)
+                for change in changes:
+                    last_seq = change["seq"]
+                    yield format_event("change", change, last_seq)
+                if len(changes) <= EVENTS_READ_BATCH:
+                    break
+        
+        while True:
+            try:
+                change = await asyncio.wait_for(subscriber.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if change is None:
+                # Подписчик отстал или сервер останавливается
+                return
+            if change["seq"] <= last_seq:
+                continue
+            last_seq = change["seq"]
+            yield format_event("change", change, last_seq)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,96 @@
+"""
+Потоковая выгрузка списков в NDJSON и CSV.
+
+Строки читаются курсором SQLite и сразу отдаются клиенту порциями,
+таблица целиком в памяти не собирается.
+"""
+
+import csv
+import io
+import sqlite3
+from typing import Callable, Iterator, Literal, Optional, Sequence
+from fastapi.responses import StreamingResponse
+from backend.crud import BOOLEAN_COLUMNS, COLUMNS
+from backend.database import pool
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Примерный размер порции, отправляемой клиенту
+CHUNK_SIZE = 64 * 1024
+
+
+def _bool_indexes(columns: Sequence[str]) -> list:
+    """Позиции логических колонок."""
+    return [idx for idx, col in enumerate(columns) if col in BOOLEAN_COLUMNS]
+
+
+def iter_ndjson(columns: Sequence[str], rows: Iterator[tuple]) -> Iterator[bytes]:
+    """Склеить в NDJSON строки, уже сериализованные в SQL (as_json=True)."""
+    buffer = []
+    size = 0
+    for row in rows:
+        line = row[0] + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode()
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def iter_csv(columns: Sequence[str], rows: Iterator[tuple]) -> Iterator[bytes]:
+    """Сериализовать строки в CSV с заголовком."""
+    bool_indexes = _bool_indexes(columns)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    for row in rows:
+        if bool_indexes:
+            row = list(row)
+            for idx in bool_indexes:
+                row[idx] = "true" if row[idx] else "false"
+        writer.writerow(row)
+        if output.tell() >= CHUNK_SIZE:
+            yield output.getvalue().encode()
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue().encode()
+
+
+def export_response(
+    table: str,
+    query: Callable[[sqlite3.Connection, bool], Iterator[tuple]],
+    format: ExportFormat,
+    columns: Optional[Sequence[str]] = None
+) -> StreamingResponse:
+    """
+    Ответ с потоковой выгрузкой.
+    
+    Args:
+        table: Таблица
+        query: Функция (соединение, as_json) -> итератор строк
+        format: "ndjson" или "csv"
+        columns: Колонки строк (по умолчанию все колонки таблицы)
+    """
+    columns = columns or COLUMNS[table]
+    serialize = iter_csv if format == "csv" else iter_ndjson
+    
+    def generate() -> Iterator[bytes]:
+        # Соединение берётся внутри генератора: зависимость get_db
+        # закрывается до того, как начнётся отправка тела ответа
+        with pool.connection() as conn:
+            yield from serialize(columns, query(conn, format == "ndjson"))
+    
+    return StreamingResponse(
+        generate(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    )
@@ -0,0 +1,66 @@
+"""
+Разреженные наборы полей (параметр fields=) и связанные сущности
+(параметр include=).
+
+Запрошенные поля сужают SQL-проекцию, а значит и объект в ответе:
+JSON строк собирается в SQL только из этих колонок.
+"""
+
+from typing import Literal, Optional, Tuple
+from fastapi import HTTPException
+from backend.crud import COLUMNS, RELATIONS
+
+# embed - объект внутри каждой строки, sideload - отдельным списком без повторов
+IncludeMode = Literal["embed", "sideload"]
+
+
+def parse_fields(table: str, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Разобрать fields=id,title,status.
+    
+    id добавляется всегда: по нему строится курсор пагинации.
+    
+    Returns:
+        Кортеж колонок или None, если нужны все поля
+    
+    Raises:
+        HTTPException: 400 при неизвестном поле
+    """
+    if not fields:
+        return None
+    
+    columns = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in columns:
+            continue
+        if name not in COLUMNS[table]:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {name}")
+        columns.append(name)
+    
+    return tuple(columns)
+
+
+def parse_include(table: str, include: Optional[str]) -> Tuple[str, ...]:
+    """
+    Разобрать include=client,deal.
+    
+    Returns:
+        Кортеж имён связанных сущностей (пустой, если не заданы)
+    
+    Raises:
+        HTTPException: 400 при неизвестной связи
+    """
+    if not include:
+        return ()
+    
+    names = []
+    for name in include.split(","):
+        name = name.strip()
+        if not name or name in names:
+            continue
+        if name not in RELATIONS.get(table, {}):
+            raise HTTPException(status_code=400, detail=f"Unknown include: {name}")
+        names.append(name)
+    
+    return tuple(names)
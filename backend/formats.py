@@ -0,0 +1,43 @@
+"""
+Форматы ответа для списков.
+
+- objects (по умолчанию): JSON-массив объектов;
+- columns: {"columns": [...], "rows": [[...], ...]} - имена колонок
+  один раз, значения массивами (json_array в SQL);
+- msgpack: то же колоночное представление в MessagePack, выбирается
+  заголовком Accept: application/msgpack. Нужен пакет msgpack; без него
+  сервер отвечает JSON.
+"""
+
+from typing import Literal, Optional
+from fastapi import Request
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - необязательная зависимость
+    msgpack = None
+
+ListFormat = Literal["objects", "columns"]
+Representation = Literal["objects", "columns", "msgpack"]
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+MSGPACK_MEDIA_TYPE = MSGPACK_MEDIA_TYPES[0]
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """Просит ли клиент MessagePack (и умеет ли сервер его отдать)."""
+    if msgpack is None or not accept:
+        return False
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def negotiate(request: Request, format: ListFormat = "objects", include: bool = False) -> Representation:
+    """
+    Выбрать представление списка по параметру format и заголовку Accept.
+    
+    Вложенные связанные объекты (include) собираются в SQL как JSON,
+    поэтому с ними ответ всегда JSON.
+    """
+    if not include and wants_msgpack(request.headers.get("accept")):
+        return "msgpack"
+    return format
@@ -2,10 +2,21 @@
 Главный файл FastAPI приложения.
 """
 
-from fastapi import FastAPI
+import asyncio
+import sqlite3
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from backend.database import init_db
-from backend.routers import clients, deals, tasks
+from fastapi.responses import JSONResponse
+from backend.changes import compact_changes, schedule_compaction
+from backend.compression import CompressionMiddleware
+from backend.database import init_db, pool
+from backend.etag import ETAG_HEADER
+from backend.events import broker
+from backend.metrics import MetricsMiddleware
+from backend.pagination import NEXT_CURSOR_HEADER
+from backend.reports import report_queue
+from backend.routers import batch, changes, clients, deals, events, metrics, reports, stats, tasks
+from backend.writer import writer
 
 app = FastAPI(title="Mini-CRM API", version="1.0.0")
 
@@ -16,18 +27,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],
 )
+# Сжатие ответов (gzip, brotli при наличии пакета)
+app.add_middleware(CompressionMiddleware)
+# Метрики запросов (внешний слой: время учитывает и сжатие)
+app.add_middleware(MetricsMiddleware)
 
 # Подключить роутеры
 app.include_router(clients.router)
 app.include_router(deals.router)
 app.include_router(tasks.router)
+app.include_router(stats.router)
+app.include_router(batch.router)
+app.include_router(changes.router)
+app.include_router(events.router)
+app.include_router(metrics.router)
+app.include_router(reports.router)
+
+# Периодически сокращать журнал изменений
+schedule_compaction(writer)
+# Рассылать подписчикам /api/events изменения после каждого коммита
+writer.on_commit(broker.notify)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Инициализация БД при старте."""
     init_db()
+    writer.start()
+    writer.submit_async(compact_changes)
+    broker.start(asyncio.get_running_loop())
+    report_queue.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Дописать очередь записи, закрыть потоки событий и соединения пула при остановке."""
+    report_queue.stop()
+    writer.stop()
+    broker.stop()
+    pool.close()
+
+
+@app.exception_handler(sqlite3.IntegrityError)
+async def integrity_error_handler(request: Request, exc: sqlite3.IntegrityError):
+    """Нарушение ограничений БД (например, внешнего ключа) - ошибка клиента."""
+    return JSONResponse(status_code=409, content={"detail": f"Integrity error: {exc}"})
 
 
 @app.get("/health")
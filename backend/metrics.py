@@ -0,0 +1,312 @@
+"""
+Метрики приложения в текстовом формате Prometheus (GET /metrics).
+
+Без внешних зависимостей: счётчики и гистограммы хранятся в памяти
+процесса, наблюдение - одна блокировка и прибавление к корзине.
+Собираются:
+
+- длительность HTTP-запросов по маршруту, методу и статусу, число
+  запросов в обработке (middleware);
+- длительность и число строк запросов к SQLite по функции crud и типу
+  оператора (декоратор timed_query);
+- ожидание соединения в пуле, длительность COMMIT и размер пачки
+  потока записи;
+- счётчики кэша запросов и число подписчиков событий (читаются в момент
+  выдачи метрик).
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин по умолчанию, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROWS_BUCKETS = (0, 1, 10, 100, 500, 1000, 5000, 10000, 100000)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _escape(value: str) -> str:
+    """Экранировать значение метки."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Метки в виде {a="1",b="2"}."""
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    """Число в формате экспозиции."""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Общая часть метрик: имя, описание, метки."""
+    
+    type = "untyped"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def samples(self) -> List[str]:
+        """Строки значений."""
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        """Блок метрики с HELP и TYPE."""
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + self.samples()
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+    
+    type = "counter"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1):
+        """Увеличить счётчик."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и убывать."""
+    
+    type = "gauge"
+    
+    def dec(self, *labels: str, amount: float = 1):
+        """Уменьшить значение."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными корзинами."""
+    
+    type = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # Метки -> [счётчики по корзинам (не накопленные, последняя - +Inf), сумма]
+        self._series: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, *labels: str):
+        """Учесть наблюдение."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _labels(self.labelnames, key, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Метрика, значения которой читаются функцией в момент выдачи."""
+    
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        read: Callable[[], float],
+        type: str = "gauge"
+    ):
+        super().__init__(name, help)
+        self.read = read
+        self.type = type
+    
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_number(self.read())}"]
+
+
+class Registry:
+    """Набор метрик процесса."""
+    
+    def __init__(self):
+        self._metrics: List[Metric] = []
+    
+    def register(self, metric: Metric) -> Metric:
+        """Добавить метрику."""
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_in_flight = registry.register(Gauge(
+    "crm_http_requests_in_flight", "HTTP requests being processed"
+))
+request_duration = registry.register(Histogram(
+    "crm_http_request_duration_seconds", "HTTP request latency",
+    ("method", "route", "status")
+))
+query_duration = registry.register(Histogram(
+    "crm_db_query_duration_seconds", "SQLite query latency by crud function and statement type",
+    ("query", "statement")
+))
+query_rows = registry.register(Histogram(
+    "crm_db_query_rows", "Rows returned or affected by crud function",
+    ("query", "statement"), ROWS_BUCKETS
+))
+pool_wait = registry.register(Histogram(
+    "crm_db_pool_wait_seconds", "Time spent waiting for a pooled connection"
+))
+commit_duration = registry.register(Histogram(
+    "crm_db_commit_duration_seconds", "Duration of writer transaction COMMIT"
+))
+write_batch_size = registry.register(Histogram(
+    "crm_db_write_batch_size", "Operations per writer transaction", buckets=BATCH_BUCKETS
+))
+
+
+def _count_rows(result: Any) -> int:
+    """Число строк в результате функции crud."""
+    if result is None or result is False:
+        return 0
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    if isinstance(result, dict) and "created_ids" in result:
+        return len(result["created_ids"]) + result.get("updated", 0) + result.get("deleted", 0)
+    return 1
+
+
+def _timed_rows(rows: Iterator, started: float, name: str, statement: str) -> Iterator:
+    """Пропустить строки итератора, учитывая время до конца выдачи."""
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        query_duration.observe(time.perf_counter() - started, name, statement)
+        query_rows.observe(count, name, statement)
+
+
+def timed_query(statement: str) -> Callable:
+    """
+    Декоратор функции crud: длительность и число строк.
+    
+    Для потоковых функций (iter_*) время считается до конца выдачи строк.
+    
+    Args:
+        statement: Тип оператора для метки (select, insert, update, delete, bulk)
+    """
+    def decorator(func: Callable) -> Callable:
+        name = func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            if inspect.isgenerator(result):
+                return _timed_rows(result, started, name, statement)
+            query_duration.observe(time.perf_counter() - started, name, statement)
+            query_rows.observe(_count_rows(result), name, statement)
+            return result
+        return wrapper
+    
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запросов и число запросов в обработке."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Функция-обработчик -> шаблон пути маршрута
+        self._routes: Dict[Any, str] = {}
+    
+    def _route(self, scope: Scope) -> str:
+        """Шаблон пути маршрута (/api/clients/{client_id}), а не сам путь."""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            for candidate in scope["app"].routes:
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = "unmatched"
+            self._routes[endpoint] = route
+        return route
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status: Optional[int] = None
+        
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            requests_in_flight.dec()
+            request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"], self._route(scope), str(status or 500)
+            )
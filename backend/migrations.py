@@ -0,0 +1,330 @@
+"""
+Версионированные миграции схемы БД.
+
+Текущая версия схемы хранится в PRAGMA user_version. При старте
+применяются по порядку все миграции с номером больше текущей версии,
+каждая - в своей транзакции вместе с обновлением версии.
+"""
+
+import sqlite3
+from typing import List, Tuple
+
+
+# Токенизатор полнотекстового поиска
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# (версия, описание, список SQL-команд)
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Базовые таблицы", [
+        """
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            company TEXT,
+            status TEXT NOT NULL DEFAULT 'active',
+            created_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS deals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            currency TEXT NOT NULL DEFAULT 'RUB',
+            status TEXT NOT NULL DEFAULT 'new',
+            client_id INTEGER,
+            close_date TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (client_id) REFERENCES clients(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            due_date TEXT,
+            is_done INTEGER NOT NULL DEFAULT 0,
+            client_id INTEGER,
+            deal_id INTEGER,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (client_id) REFERENCES clients(id),
+            FOREIGN KEY (deal_id) REFERENCES deals(id)
+        )
+        """,
+    ]),
+    # Индексы под фильтры роутеров; id в конце обслуживает ORDER BY id DESC
+    (2, "Индексы для фильтров списков", [
+        "CREATE INDEX IF NOT EXISTS idx_clients_status_id ON clients (status, id)",
+        "CREATE INDEX IF NOT EXISTS idx_deals_status_id ON deals (status, id)",
+        "CREATE INDEX IF NOT EXISTS idx_deals_client_id_id ON deals (client_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_is_done_id ON tasks (is_done, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_client_id_id ON tasks (client_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_deal_id_id ON tasks (deal_id, id)",
+    ]),
+    # Полнотекстовый поиск для параметра q: внешние FTS5-индексы
+    # поверх таблиц, синхронизируемые триггерами. unicode61 приводит
+    # к нижнему регистру и кириллицу ("иванов" найдёт "Иванов").
+    (3, "FTS5-индексы для поиска", [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+            name, email, phone, company,
+            content='clients', content_rowid='id', tokenize='{FTS_TOKENIZER}'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_fts_ai AFTER INSERT ON clients BEGIN
+            INSERT INTO clients_fts (rowid, name, email, phone, company)
+            VALUES (new.id, new.name, new.email, new.phone, new.company);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_fts_ad AFTER DELETE ON clients BEGIN
+            INSERT INTO clients_fts (clients_fts, rowid, name, email, phone, company)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.company);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_fts_au AFTER UPDATE OF name, email, phone, company ON clients BEGIN
+            INSERT INTO clients_fts (clients_fts, rowid, name, email, phone, company)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.company);
+            INSERT INTO clients_fts (rowid, name, email, phone, company)
+            VALUES (new.id, new.name, new.email, new.phone, new.company);
+        END
+        """,
+        "INSERT INTO clients_fts (clients_fts) VALUES ('rebuild')",
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS deals_fts USING fts5(
+            title,
+            content='deals', content_rowid='id', tokenize='{FTS_TOKENIZER}'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_fts_ai AFTER INSERT ON deals BEGIN
+            INSERT INTO deals_fts (rowid, title)
+            VALUES (new.id, new.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_fts_ad AFTER DELETE ON deals BEGIN
+            INSERT INTO deals_fts (deals_fts, rowid, title)
+            VALUES ('delete', old.id, old.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_fts_au AFTER UPDATE OF title ON deals BEGIN
+            INSERT INTO deals_fts (deals_fts, rowid, title)
+            VALUES ('delete', old.id, old.title);
+            INSERT INTO deals_fts (rowid, title)
+            VALUES (new.id, new.title);
+        END
+        """,
+        "INSERT INTO deals_fts (deals_fts) VALUES ('rebuild')",
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description,
+            content='tasks', content_rowid='id', tokenize='{FTS_TOKENIZER}'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """,
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    ]),
+    # Счётчики изменений таблиц для ETag: триггеры увеличивают версию
+    # при любой записи. Начальное значение случайное, чтобы ETag не
+    # совпадали после пересоздания файла БД.
+    (4, "Счётчики версий таблиц", [
+        """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "INSERT OR IGNORE INTO table_versions (name, version) VALUES ('clients', abs(random() % 1000000000000))",
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_version_ai AFTER INSERT ON clients BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'clients';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_version_au AFTER UPDATE ON clients BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'clients';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_version_ad AFTER DELETE ON clients BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'clients';
+        END
+        """,
+        "INSERT OR IGNORE INTO table_versions (name, version) VALUES ('deals', abs(random() % 1000000000000))",
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_version_ai AFTER INSERT ON deals BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'deals';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_version_au AFTER UPDATE ON deals BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'deals';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_version_ad AFTER DELETE ON deals BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'deals';
+        END
+        """,
+        "INSERT OR IGNORE INTO table_versions (name, version) VALUES ('tasks', abs(random() % 1000000000000))",
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_version_ai AFTER INSERT ON tasks BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_version_au AFTER UPDATE ON tasks BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_version_ad AFTER DELETE ON tasks BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'tasks';
+        END
+        """,
+    ]),
+    # Журнал изменений для инкрементальной синхронизации (GET /api/changes):
+    # триггеры пишут его в той же транзакции, что и саму запись
+    (5, "Журнал изменений", [
+        """
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_changes_ai AFTER INSERT ON clients BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('clients', new.id, 'create');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_changes_au AFTER UPDATE ON clients BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('clients', new.id, 'update');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS clients_changes_ad AFTER DELETE ON clients BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('clients', old.id, 'delete');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_changes_ai AFTER INSERT ON deals BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('deals', new.id, 'create');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_changes_au AFTER UPDATE ON deals BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('deals', new.id, 'update');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS deals_changes_ad AFTER DELETE ON deals BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('deals', old.id, 'delete');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_changes_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('tasks', new.id, 'create');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_changes_au AFTER UPDATE ON tasks BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('tasks', new.id, 'update');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_changes_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO changes (entity, entity_id, op) VALUES ('tasks', old.id, 'delete');
+        END
+        """,
+    ]),
+    # Задания на формирование отчётов (POST /api/reports/...): хранятся в
+    # БД, чтобы незавершённые задания подхватывались после перезапуска
+    (6, "Очередь заданий отчётов", [
+        """
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            link TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_report_jobs_status_id ON report_jobs (status, id)",
+    ]),
+]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Применить недостающие миграции.
+    
+    Returns:
+        Версия схемы после миграции
+    """
+    current = get_version(conn)
+    
+    for version, description, statements in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version <= current:
+            continue
+        
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Другой процесс мог успеть применить миграцию
+            if get_version(conn) >= version:
+                conn.rollback()
+                current = get_version(conn)
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        current = version
+    
+    conn.execute("PRAGMA optimize")
+    
+    return current
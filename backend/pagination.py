@@ -0,0 +1,73 @@
+"""
+Keyset-пагинация списков (по id DESC или по релевантности поиска).
+
+Курсор - непрозрачная для клиента строка: base64 от JSON-списка ключей
+последней строки страницы ([id], а для поиска - [релевантность, id]). Следующая страница продолжается строго после
+этих ключей, поэтому стоимость запроса не зависит от глубины пролистывания.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+
+MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*keys) -> str:
+    """Упаковать ключи последней строки в курсор."""
+    raw = json.dumps(list(keys), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], ranked: bool = False) -> Optional[List[Any]]:
+    """
+    Распаковать курсор.
+    
+    Args:
+        cursor: Курсор из X-Next-Cursor
+        ranked: Список отсортирован по релевантности поиска (ключи [rank, id])
+    
+    Returns:
+        Ключи последней строки предыдущей страницы ([id] или [rank, id]) или None
+    
+    Raises:
+        HTTPException: 400 если курсор повреждён или от другого запроса
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        keys = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(keys, list) or len(keys) != (2 if ranked else 1):
+            raise ValueError(cursor)
+        if type(keys[-1]) is not int:
+            raise ValueError(cursor)
+        if ranked and type(keys[0]) not in (int, float):
+            raise ValueError(cursor)
+        return keys
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def split_page(
+    rows: List[Any],
+    limit: Optional[int]
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Отрезать лишнюю строку, запрошенную через LIMIT limit + 1.
+    
+    Returns:
+        (строки страницы, курсор следующей страницы или None)
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    if isinstance(last, tuple):
+        # Строки быстрого пути: (json, *ключи курсора)
+        return rows, encode_cursor(*last[1:])
+    if 'search_rank' in last:
+        return rows, encode_cursor(last['search_rank'], last['id'])
+    return rows, encode_cursor(last['id'])
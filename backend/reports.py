@@ -0,0 +1,324 @@
+"""
+Очередь заданий на формирование отчётов.
+
+POST /api/reports/{entity} записывает задание в таблицу report_jobs и
+ставит его в очередь; ограниченный пул потоков выполняет задания через
+ReportGenerator, читая строки страницами по keyset-курсору - каждая
+страница берёт соединение из пула ненадолго, поэтому выгрузка в сеть не
+держит соединение и снимок WAL. Отчёт пишется в
+Google Sheets (формат sheets) или в локальный файл xlsx/csv в
+REPORTS_DIR, который отдаёт GET /api/reports/jobs/{id}/file. Статус,
+прогресс (записанные строки) и ссылка пишутся в то же задание через
+поток записи. Незавершённые задания после перезапуска
+сервера ставятся в очередь заново (отчёт создаётся с начала).
+
+Настройки Google берутся из переменных окружения, а если их нет - из
+файла настроек GUI (data/google_settings.json).
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import backend.crud as crud
+from backend.database import ConnectionPool, pool
+from backend.writer import writer
+
+logger = logging.getLogger(__name__)
+
+# Сколько отчётов формируется одновременно
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# Сколько заданий может ждать в очереди
+REPORT_QUEUE_SIZE = int(os.getenv("REPORT_QUEUE_SIZE", "100"))
+# Файл настроек Google, который сохраняет GUI
+GOOGLE_SETTINGS_PATH = Path(os.getenv("GOOGLE_SETTINGS_PATH", "data/google_settings.json"))
+# Каталог файлов отчётов xlsx/csv
+REPORTS_DIR = Path(os.getenv("REPORTS_DIR", "data/reports"))
+# Строк отчёта, читаемых за одно взятие соединения из пула
+REPORT_PAGE_ROWS = int(os.getenv("REPORT_PAGE_ROWS", "5000"))
+
+# Локальные форматы отчётов -> MIME-тип файла
+FILE_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+
+# Фильтры отчёта по сущностям (как у списков)
+REPORT_FILTERS = {
+    "clients": ("q", "status"),
+    "deals": ("q", "status", "client_id"),
+    "tasks": ("q", "is_done", "client_id", "deal_id"),
+}
+
+STATS = {"clients": crud.stats_clients, "deals": crud.stats_deals, "tasks": crud.stats_tasks}
+LISTS = {"clients": crud.get_clients, "deals": crud.get_deals, "tasks": crud.get_tasks}
+
+JOB_COLUMNS = (
+    "id", "entity", "params", "status", "progress", "total",
+    "link", "error", "created_at", "started_at", "finished_at"
+)
+
+
+def google_settings() -> Dict[str, Optional[str]]:
+    """Путь к client_secret.json, папка Drive и файл токена."""
+    settings = {}
+    if GOOGLE_SETTINGS_PATH.exists():
+        with open(GOOGLE_SETTINGS_PATH, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    return {
+        "client_secret_path": os.getenv("GOOGLE_CLIENT_SECRET_PATH") or settings.get("client_secret_path") or None,
+        "folder_id": os.getenv("GOOGLE_DRIVE_FOLDER_ID") or settings.get("folder_id") or None,
+        "token_path": os.getenv("GOOGLE_TOKEN_PATH", "token.pickle"),
+    }
+
+
+def google_token_ready(token_path: str) -> bool:
+    """
+    Есть токен OAuth, с которым отчёт сформируется без входа в браузере.
+    
+    Вход выполняет GUI; сервер токен только читает и обновляет.
+    """
+    try:
+        from google_integration.services import has_usable_token
+    except ImportError:
+        return False
+    return has_usable_token(token_path)
+
+
+def store_google_token(token_path: str, info: Dict[str, Any]):
+    """
+    Сохранить токен OAuth, полученный входом в GUI.
+    
+    Нужен, когда GUI и сервер не видят общий файл токена (Docker,
+    другая машина).
+    
+    Raises:
+        ImportError: Не установлены клиентские библиотеки Google
+        ValueError: Неполный токен
+    """
+    from google_integration.services import store_token
+    
+    store_token(token_path, info)
+
+
+def iter_report_rows(
+    entity: str,
+    filters: Dict[str, Any],
+    page_rows: int = REPORT_PAGE_ROWS,
+    connections: ConnectionPool = pool
+) -> Iterator[Dict[str, Any]]:
+    """
+    Строки отчёта страницами по keyset-курсору (after, как у списков).
+    
+    Соединение берётся из пула только на чтение страницы: между
+    страницами, пока приёмник пишет строки в сеть или файл, задание не
+    занимает слот пула, курсор и снимок WAL. Строки, изменённые во время
+    выгрузки, попадают в отчёт в том виде, в каком их застала страница.
+    """
+    columns = crud.COLUMNS[entity]
+    fetch = LISTS[entity]
+    after = None
+    while True:
+        with connections.connection() as conn:
+            rows = fetch(conn, **filters, limit=page_rows, after=after, as_array=True)
+        for values, *_ in rows[:page_rows]:
+            yield dict(zip(columns, values))
+        if len(rows) <= page_rows:
+            return
+        after = list(rows[page_rows - 1][1:])
+
+
+def report_file(job_id: int, report_format: str) -> Path:
+    """Путь к файлу отчёта задания."""
+    return REPORTS_DIR / f"report_{job_id}.{report_format}"
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _job_row(row: tuple) -> Dict[str, Any]:
+    """Строка report_jobs в словарь (params разобран из JSON)."""
+    job = dict(zip(JOB_COLUMNS, row))
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+def create_job(conn: sqlite3.Connection, entity: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Создать задание в статусе queued."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO report_jobs (entity, params, created_at) VALUES (?, ?, ?)",
+        (entity, json.dumps(params, ensure_ascii=False), _now())
+    )
+    return get_job(conn, cursor.lastrowid)
+
+
+def get_job(conn: sqlite3.Connection, job_id: int) -> Optional[Dict[str, Any]]:
+    """Задание по id."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM report_jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+    return _job_row(row) if row else None
+
+
+def update_job(conn: sqlite3.Connection, job_id: int, **fields):
+    """Обновить поля задания."""
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn.execute(f"UPDATE report_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def requeue_unfinished(conn: sqlite3.Connection) -> List[int]:
+    """
+    Вернуть в очередь задания, прерванные остановкой сервера.
+    
+    Returns:
+        id заданий queued по порядку создания
+    """
+    conn.execute("""
+        UPDATE report_jobs SET status = 'queued', progress = 0, started_at = NULL
+        WHERE status = 'running'
+    """)
+    return [row[0] for row in conn.execute("SELECT id FROM report_jobs WHERE status = 'queued' ORDER BY id")]
+
+
+class ReportQueue:
+    """Ограниченный пул потоков, выполняющий задания отчётов по порядку."""
+    
+    def __init__(self, workers: int = REPORT_WORKERS, max_pending: int = REPORT_QUEUE_SIZE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._running = 0
+        self._lock = threading.Lock()
+        # Генератор отчётов на поток: клиенты Google API не потокобезопасны
+        self._local = threading.local()
+    
+    @property
+    def pending(self) -> int:
+        """Заданий в очереди и в работе."""
+        return self._queue.qsize() + self._running
+    
+    @property
+    def full(self) -> bool:
+        """Очередь заполнена: новые задания не принимаются."""
+        return self.pending >= self.max_pending
+    
+    def start(self):
+        """Запустить потоки и вернуть в очередь незавершённые задания."""
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._run, name=f"report-worker-{index}", daemon=True)
+                for index in range(self.workers)
+            ]
+        for job_id in writer.submit(requeue_unfinished):
+            self._queue.put(job_id)
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self):
+        """
+        Не брать новые задания.
+        
+        Отчёты в работе не дожидаются: они останутся running и будут
+        сформированы заново при следующем старте.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+    
+    def submit(self, job_id: int):
+        """Поставить созданное задание в очередь."""
+        self._queue.put(job_id)
+    
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                self._running += 1
+            try:
+                self._execute(job_id)
+            finally:
+                with self._lock:
+                    self._running -= 1
+    
+    def _generator(self, job: Dict[str, Any]):
+        """ReportGenerator для задания: в файл или в Google Sheets этого потока."""
+        from google_integration.report_generator import ReportGenerator
+        from google_integration.report_sinks import CsvSink, XlsxSink
+        
+        report_format = job["params"].get("format", "sheets")
+        if report_format in FILE_FORMATS:
+            sink = XlsxSink if report_format == "xlsx" else CsvSink
+            path = report_file(job["id"], report_format)
+            return ReportGenerator(sink(path.parent, path.name))
+        
+        settings = google_settings()
+        folder_id = job["params"].get("folder_id") or settings["folder_id"]
+        if not settings["client_secret_path"] or not folder_id:
+            raise RuntimeError("Google integration is not configured")
+        from google_integration.services import registry
+        
+        key = (settings["client_secret_path"], folder_id, settings["token_path"])
+        cached = getattr(self._local, "generator", None)
+        # Новый токен из GUI (PUT /api/reports/google-token) заменяет credentials
+        if cached is None or cached[0] != key or cached[1] is not registry.cached_credentials(key[2]):
+            # Только токен с диска или его обновление: вход в браузере
+            # заблокировал бы обработчик навсегда
+            generator = ReportGenerator.for_google(*key, interactive=False)
+            cached = (key, registry.cached_credentials(key[2]), generator)
+            self._local.generator = cached
+        return cached[2]
+    
+    def _execute(self, job_id: int):
+        """Сформировать отчёт задания и записать результат."""
+        with pool.connection() as conn:
+            job = get_job(conn, job_id)
+        if job is None or job["status"] != "queued":
+            return
+        writer.submit(lambda conn: update_job(conn, job_id, status="running", started_at=_now()))
+        try:
+            link = self._export(job, self._progress(job_id))
+            if job["params"].get("format", "sheets") in FILE_FORMATS:
+                link = f"/api/reports/jobs/{job_id}/file"
+        except Exception as exc:
+            logger.exception("Report job %s failed", job_id)
+            writer.submit(lambda conn: update_job(
+                conn, job_id, status="failed", error=str(exc), finished_at=_now()
+            ))
+            return
+        writer.submit(lambda conn: update_job(conn, job_id, status="done", link=link, finished_at=_now()))
+    
+    @staticmethod
+    def _progress(job_id: int) -> Callable[[int], None]:
+        """Записывать прогресс, не дожидаясь коммита."""
+        def progress(rows: int):
+            writer.submit_async(lambda conn: update_job(conn, job_id, progress=rows))
+        return progress
+    
+    def _export(self, job: Dict[str, Any], progress: Callable[[int], None]) -> str:
+        """Выгрузить строки задания через ReportGenerator; ссылка на таблицу или путь к файлу."""
+        generator = self._generator(job)
+        
+        entity = job["entity"]
+        filters = job["params"].get("filters", {})
+        with pool.connection() as conn:
+            stats = STATS[entity](conn, **filters)
+        writer.submit_async(lambda conn: update_job(conn, job["id"], total=stats["total"]))
+        export = getattr(generator, f"export_{entity}_report")
+        return export(iter_report_rows(entity, filters), stats, progress=progress)
+
+
+report_queue = ReportQueue()
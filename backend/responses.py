@@ -0,0 +1,112 @@
+"""
+Быстрый путь ответа для списков.
+
+Строки приходят из SQLite уже сериализованными (json_object или
+json_array в SELECT), поэтому тело ответа собирается склейкой строк -
+без словарей на каждую строку и без повторной валидации pydantic. Схема
+в OpenAPI остаётся прежней: response_model по-прежнему указан у маршрутов.
+"""
+
+import json
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+from fastapi.responses import Response
+from backend.crud import BOOLEAN_COLUMNS
+from backend.etag import ETAG_HEADER
+from backend.formats import MSGPACK_MEDIA_TYPE, Representation, msgpack
+from backend.pagination import NEXT_CURSOR_HEADER, split_page
+
+
+class RenderedPage(NamedTuple):
+    """Готовое тело страницы и курсор следующей страницы."""
+    body: bytes
+    next_cursor: Optional[str]
+    media_type: str = "application/json"
+
+
+def render_page(rows: List[tuple], limit: Optional[int] = None) -> RenderedPage:
+    """
+    Собрать JSON-массив страницы из строк вида (json, ...).
+    
+    Args:
+        rows: Строки crud.get_*(..., as_json=True), запрошенные с LIMIT limit + 1
+        limit: Размер страницы
+    """
+    rows, next_cursor = split_page(rows, limit)
+    body = ("[" + ",".join(row[0] for row in rows) + "]").encode()
+    return RenderedPage(body, next_cursor)
+
+
+def render_columns_page(rows: List[tuple], limit: Optional[int], columns: Sequence[str]) -> RenderedPage:
+    """Колоночный JSON из строк crud.get_*(..., as_json=True, as_array=True)."""
+    rows, next_cursor = split_page(rows, limit)
+    body = (
+        '{"columns":' + json.dumps(list(columns), separators=(",", ":")) +
+        ',"rows":[' + ",".join(row[0] for row in rows) + "]}"
+    ).encode()
+    return RenderedPage(body, next_cursor)
+
+
+def render_msgpack_page(rows: List[tuple], limit: Optional[int], columns: Sequence[str]) -> RenderedPage:
+    """Колоночный MessagePack из строк crud.get_*(..., as_array=True)."""
+    rows, next_cursor = split_page(rows, limit)
+    bool_indexes = [idx for idx, col in enumerate(columns) if col in BOOLEAN_COLUMNS]
+    values = [row[0] for row in rows]
+    if bool_indexes:
+        values = [
+            [bool(value) if idx in bool_indexes else value for idx, value in enumerate(row)]
+            for row in values
+        ]
+    body = msgpack.packb({"columns": list(columns), "rows": values})
+    return RenderedPage(body, next_cursor, MSGPACK_MEDIA_TYPE)
+
+
+def with_included(page: RenderedPage, included: Dict[str, List[str]]) -> RenderedPage:
+    """Обернуть страницу: {"data": страница, "included": {таблица: [объекты]}}."""
+    parts = ",".join(
+        json.dumps(table) + ":[" + ",".join(items) + "]"
+        for table, items in included.items()
+    )
+    body = b'{"data":' + page.body + b',"included":{' + parts.encode() + b"}}"
+    return RenderedPage(body, page.next_cursor, page.media_type)
+
+
+def render_list(
+    representation: Representation,
+    columns: Sequence[str],
+    limit: Optional[int],
+    fetch: Callable[[bool, bool], List[tuple]],
+    included: Optional[Callable[[List[int]], Dict[str, List[str]]]] = None
+) -> RenderedPage:
+    """
+    Выбрать форму строк под представление и отрендерить страницу.
+    
+    Args:
+        representation: objects, columns или msgpack
+        columns: Колонки строк
+        limit: Размер страницы
+        fetch: Функция (as_json, as_array) -> строки crud.get_*
+        included: Функция (id строк страницы) -> связанные строки для
+            sideload (crud.get_included); ответ оборачивается в with_included
+    """
+    if representation == "msgpack":
+        return render_msgpack_page(fetch(False, True), limit, columns)
+    rows = fetch(True, representation == "columns")
+    if representation == "columns":
+        page = render_columns_page(rows, limit, columns)
+    else:
+        page = render_page(rows, limit)
+    if included is None:
+        return page
+    # id - последний ключ курсора в каждой строке
+    ids = [row[-1] for row in rows[:limit]]
+    return with_included(page, included(ids))
+
+
+def page_response(page: RenderedPage, etag: Optional[str] = None) -> Response:
+    """Ответ со страницей, курсором в X-Next-Cursor и ETag."""
+    headers = {"Vary": "Accept"}
+    if page.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    if etag:
+        headers[ETAG_HEADER] = etag
+    return Response(content=page.body, media_type=page.media_type, headers=headers)
@@ -0,0 +1,23 @@
+"""
+Роутер пакета разнородных операций.
+"""
+
+from fastapi import APIRouter
+from backend.batch import execute_batch, prepare_batch
+from backend.schemas import BatchRequest, BatchResponse
+from backend.writer import writer
+
+router = APIRouter(prefix="/api/batch", tags=["batch"])
+
+
+@router.post("", response_model=BatchResponse)
+def run_batch(batch: BatchRequest):
+    """
+    Выполнить операции над клиентами, сделками и задачами в одной транзакции.
+    
+    Созданную запись можно указать в следующих операциях как "$ref"
+    (в id или в client_id/deal_id). При ошибке любой операции пакет
+    откатывается целиком; в ответе - итоговые строки всех записей.
+    """
+    prepared = prepare_batch(batch.operations)
+    return writer.submit(lambda conn: execute_batch(conn, prepared))
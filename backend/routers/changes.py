@@ -0,0 +1,42 @@
+"""
+Роутер журнала изменений для инкрементальной синхронизации.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlite3 import Connection
+from typing import Literal, Optional
+from backend.changes import get_changes, head_seq, horizon_seq
+from backend.database import get_db
+from backend.pagination import MAX_LIMIT
+from backend.schemas import ChangePage
+
+router = APIRouter(prefix="/api/changes", tags=["changes"])
+
+
+@router.get("", response_model=ChangePage)
+def list_changes(
+    since: int = Query(0, ge=0, description="Последний уже обработанный seq"),
+    limit: int = Query(500, ge=1, le=MAX_LIMIT, description="Размер страницы"),
+    entity: Optional[Literal["clients", "deals", "tasks"]] = Query(None, description="Только изменения этой сущности"),
+    db: Connection = Depends(get_db)
+):
+    """
+    Изменения после since по возрастанию seq.
+    
+    Следующую страницу запрашивать с since=last_seq. Если журнал уже
+    сокращён дальше since, возвращается 410: нужна полная перечитка.
+    """
+    if since < horizon_seq(db):
+        raise HTTPException(status_code=410, detail="Change log compacted past since, full resync required")
+    
+    # head читается до выборки: если выборка пуста, все изменения до head
+    # уже учтены и клиент может сразу продвинуться к нему
+    head = head_seq(db)
+    changes = get_changes(db, since=since, limit=limit, entity=entity)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        "changes": changes,
+        "last_seq": changes[-1]["seq"] if changes else max(since, head),
+        "has_more": has_more
+    }
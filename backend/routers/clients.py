@@ -2,12 +2,20 @@
 Роутер для работы с клиентами.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlite3 import Connection
 from typing import List, Optional
 import backend.crud as crud
+from backend.cache import query_cache
 from backend.database import get_db
-from backend.schemas import Client, ClientCreate, ClientUpdate
+from backend.etag import ETAG_HEADER, etag_for
+from backend.export import ExportFormat, export_response
+from backend.fields import parse_fields
+from backend.formats import ListFormat, negotiate
+from backend.pagination import MAX_LIMIT, decode_cursor
+from backend.responses import page_response, render_list
+from backend.schemas import BulkResult, Client, ClientBulk, ClientCreate, ClientUpdate
+from backend.writer import writer
 
 router = APIRouter(prefix="/api/clients", tags=["clients"])
 
@@ -16,29 +24,70 @@ router = APIRouter(prefix="/api/clients", tags=["clients"])
 def create_client(client: ClientCreate, db: Connection = Depends(get_db)):
     """Создать клиента."""
     client_dict = client.model_dump()
-    client_id = crud.create_client(db, client_dict)
+    client_id = writer.submit(lambda conn: crud.create_client(conn, client_dict))
     created = crud.get_client(db, client_id)
     if not created:
         raise HTTPException(status_code=500, detail="Failed to create client")
     return created
 
 
+@router.post("/bulk", response_model=BulkResult)
+def bulk_clients(bulk: ClientBulk):
+    """Массово создать, обновить и удалить клиентов в одной транзакции."""
+    create = [item.model_dump() for item in bulk.create]
+    update = [item.model_dump(exclude_unset=True) for item in bulk.update]
+    return writer.submit(lambda conn: crud.bulk_clients(conn, create, update, bulk.delete))
+
+
 @router.get("", response_model=List[Client])
 def get_clients(
+    request: Request,
+    q: Optional[str] = Query(None, description="Поиск по имени, email, телефону, компании"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,name,status"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    format: ListFormat = Query("objects", description="objects или columns (имена колонок один раз, строки массивами)"),
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("clients"))
+):
+    """Получить список клиентов. Следующая страница - в заголовке X-Next-Cursor."""
+    after = decode_cursor(cursor, ranked=bool(q))
+    columns = parse_fields("clients", fields)
+    page = query_cache.get_or_set(etag, lambda: render_list(
+        negotiate(request, format), columns or crud.COLUMNS["clients"], limit,
+        lambda as_json, as_array: crud.get_clients(
+            db, q=q, status=status,
+            limit=limit, after=after, columns=columns, as_json=as_json, as_array=as_array
+        )
+    ))
+    return page_response(page, etag)
+
+
+@router.get("/export")
+def export_clients(
+    format: ExportFormat = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
     q: Optional[str] = Query(None, description="Поиск по имени, email, телефону, компании"),
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
-    db: Connection = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,name,status")
 ):
-    """Получить список клиентов."""
-    return crud.get_clients(db, q=q, status=status)
+    """Потоковая выгрузка клиентов с теми же фильтрами, что и у списка."""
+    columns = parse_fields("clients", fields)
+    return export_response("clients", lambda conn, as_json: crud.iter_clients(conn, q=q, status=status, columns=columns, as_json=as_json), format, columns)
 
 
 @router.get("/{client_id}", response_model=Client)
-def get_client(client_id: int, db: Connection = Depends(get_db)):
+def get_client(
+    client_id: int,
+    response: Response,
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("clients"))
+):
     """Получить клиента по ID."""
-    client = crud.get_client(db, client_id)
+    client = query_cache.get_or_set(etag, lambda: crud.get_client(db, client_id))
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
+    response.headers[ETAG_HEADER] = etag
     return client
 
 
@@ -46,7 +95,7 @@ def get_client(client_id: int, db: Connection = Depends(get_db)):
 def update_client(client_id: int, client: ClientUpdate, db: Connection = Depends(get_db)):
     """Обновить клиента."""
     client_dict = client.model_dump(exclude_unset=True)
-    if not crud.update_client(db, client_id, client_dict):
+    if not writer.submit(lambda conn: crud.update_client(conn, client_id, client_dict)):
         raise HTTPException(status_code=404, detail="Client not found")
     updated = crud.get_client(db, client_id)
     if not updated:
@@ -55,8 +104,8 @@ def update_client(client_id: int, client: ClientUpdate, db: Connection = Depends
 
 
 @router.delete("/{client_id}", status_code=204)
-def delete_client(client_id: int, db: Connection = Depends(get_db)):
+def delete_client(client_id: int):
     """Удалить клиента."""
-    if not crud.delete_client(db, client_id):
+    if not writer.submit(lambda conn: crud.delete_client(conn, client_id)):
         raise HTTPException(status_code=404, detail="Client not found")
 
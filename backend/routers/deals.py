@@ -2,12 +2,20 @@
 Роутер для работы со сделками.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlite3 import Connection
 from typing import List, Optional
 import backend.crud as crud
+from backend.cache import query_cache
 from backend.database import get_db
-from backend.schemas import Deal, DealCreate, DealUpdate
+from backend.etag import ETAG_HEADER, etag_for
+from backend.export import ExportFormat, export_response
+from backend.fields import IncludeMode, parse_fields, parse_include
+from backend.formats import ListFormat, negotiate
+from backend.pagination import MAX_LIMIT, decode_cursor
+from backend.responses import page_response, render_list
+from backend.schemas import BulkResult, Deal, DealBulk, DealCreate, DealUpdate
+from backend.writer import writer
 
 router = APIRouter(prefix="/api/deals", tags=["deals"])
 
@@ -16,30 +24,84 @@ router = APIRouter(prefix="/api/deals", tags=["deals"])
 def create_deal(deal: DealCreate, db: Connection = Depends(get_db)):
     """Создать сделку."""
     deal_dict = deal.model_dump()
-    deal_id = crud.create_deal(db, deal_dict)
+    deal_id = writer.submit(lambda conn: crud.create_deal(conn, deal_dict))
     created = crud.get_deal(db, deal_id)
     if not created:
         raise HTTPException(status_code=500, detail="Failed to create deal")
     return created
 
 
+@router.post("/bulk", response_model=BulkResult)
+def bulk_deals(bulk: DealBulk):
+    """Массово создать, обновить и удалить сделки в одной транзакции."""
+    create = [item.model_dump() for item in bulk.create]
+    update = [item.model_dump(exclude_unset=True) for item in bulk.update]
+    return writer.submit(lambda conn: crud.bulk_deals(conn, create, update, bulk.delete))
+
+
 @router.get("", response_model=List[Deal])
 def get_deals(
+    request: Request,
     q: Optional[str] = Query(None, description="Поиск по названию"),
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
     client_id: Optional[int] = Query(None, description="Фильтр по клиенту"),
-    db: Connection = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,title,amount"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    format: ListFormat = Query("objects", description="objects или columns (имена колонок один раз, строки массивами)"),
+    include: Optional[str] = Query(None, description="Связанные записи через запятую: client"),
+    include_mode: IncludeMode = Query("embed", description="embed - объект в каждой строке, sideload - отдельный список included без повторов"),
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("deals"))
 ):
-    """Получить список сделок."""
-    return crud.get_deals(db, q=q, status=status, client_id=client_id)
+    """
+    Получить список сделок. Следующая страница - в заголовке X-Next-Cursor.
+    
+    include=client вкладывает клиента в каждую сделку (один JOIN);
+    с include_mode=sideload ответ - {"data": [...], "included": {"clients": [...]}}.
+    """
+    after = decode_cursor(cursor, ranked=bool(q))
+    columns = parse_fields("deals", fields)
+    relations = parse_include("deals", include)
+    sideload = bool(relations) and include_mode == "sideload"
+    embed = () if sideload else relations
+    included = (lambda ids: crud.get_included(db, "deals", ids, relations)) if sideload else None
+    page = query_cache.get_or_set(etag, lambda: render_list(
+        negotiate(request, format, include=bool(relations)), (columns or crud.COLUMNS["deals"]) + embed, limit,
+        lambda as_json, as_array: crud.get_deals(
+            db, q=q, status=status, client_id=client_id,
+            limit=limit, after=after, columns=columns, as_json=as_json, as_array=as_array, include=embed
+        ),
+        included
+    ))
+    return page_response(page, etag)
+
+
+@router.get("/export")
+def export_deals(
+    format: ExportFormat = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+    q: Optional[str] = Query(None, description="Поиск по названию"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    client_id: Optional[int] = Query(None, description="Фильтр по клиенту"),
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,title,amount")
+):
+    """Потоковая выгрузка сделок с теми же фильтрами, что и у списка."""
+    columns = parse_fields("deals", fields)
+    return export_response("deals", lambda conn, as_json: crud.iter_deals(conn, q=q, status=status, client_id=client_id, columns=columns, as_json=as_json), format, columns)
 
 
 @router.get("/{deal_id}", response_model=Deal)
-def get_deal(deal_id: int, db: Connection = Depends(get_db)):
+def get_deal(
+    deal_id: int,
+    response: Response,
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("deals"))
+):
     """Получить сделку по ID."""
-    deal = crud.get_deal(db, deal_id)
+    deal = query_cache.get_or_set(etag, lambda: crud.get_deal(db, deal_id))
     if not deal:
         raise HTTPException(status_code=404, detail="Deal not found")
+    response.headers[ETAG_HEADER] = etag
     return deal
 
 
@@ -47,7 +109,7 @@ def get_deal(deal_id: int, db: Connection = Depends(get_db)):
 def update_deal(deal_id: int, deal: DealUpdate, db: Connection = Depends(get_db)):
     """Обновить сделку."""
     deal_dict = deal.model_dump(exclude_unset=True)
-    if not crud.update_deal(db, deal_id, deal_dict):
+    if not writer.submit(lambda conn: crud.update_deal(conn, deal_id, deal_dict)):
         raise HTTPException(status_code=404, detail="Deal not found")
     updated = crud.get_deal(db, deal_id)
     if not updated:
@@ -56,8 +118,8 @@ def update_deal(deal_id: int, deal: DealUpdate, db: Connection = Depends(get_db)
 
 
 @router.delete("/{deal_id}", status_code=204)
-def delete_deal(deal_id: int, db: Connection = Depends(get_db)):
+def delete_deal(deal_id: int):
     """Удалить сделку."""
-    if not crud.delete_deal(db, deal_id):
+    if not writer.submit(lambda conn: crud.delete_deal(conn, deal_id)):
         raise HTTPException(status_code=404, detail="Deal not found")
 
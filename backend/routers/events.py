@@ -0,0 +1,36 @@
+"""
+Роутер push-уведомлений об изменениях (Server-Sent Events).
+"""
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from backend.events import broker, event_stream
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+@router.get("")
+async def events(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Отдать сначала изменения после этого seq"),
+    entity: Optional[Literal["clients", "deals", "tasks"]] = Query(None, description="Только изменения этой сущности")
+):
+    """
+    Поток событий create/update/delete (text/event-stream).
+    
+    id события - seq журнала изменений; при переподключении заголовок
+    Last-Event-ID заменяет since.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    # Подписка до чтения журнала: события, пришедшие во время догонки,
+    # не теряются (повторы отбрасываются по seq)
+    subscriber = broker.subscribe(entity)
+    return StreamingResponse(
+        event_stream(subscriber, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,54 @@
+"""
+Роутер метрик в текстовом формате Prometheus.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from backend.cache import query_cache
+from backend.database import pool
+from backend.events import broker
+from backend.metrics import CONTENT_TYPE, CallbackMetric, registry
+from backend.reports import report_queue
+from backend.writer import writer
+
+router = APIRouter(tags=["metrics"])
+
+# Значения, которые уже считаются в своих объектах, читаются при выдаче
+registry.register(CallbackMetric(
+    "crm_query_cache_hits_total", "Query cache hits",
+    lambda: query_cache.hits, type="counter"
+))
+registry.register(CallbackMetric(
+    "crm_query_cache_misses_total", "Query cache misses",
+    lambda: query_cache.misses, type="counter"
+))
+registry.register(CallbackMetric(
+    "crm_query_cache_entries", "Entries in the query cache",
+    lambda: query_cache.stats()["size"]
+))
+registry.register(CallbackMetric(
+    "crm_db_pool_connections", "Connections opened by the pool",
+    lambda: pool.opened
+))
+registry.register(CallbackMetric(
+    "crm_db_write_queue_depth", "Write operations waiting for the writer thread",
+    lambda: writer.pending
+))
+registry.register(CallbackMetric(
+    "crm_events_subscribers", "Connected Server-Sent Events subscribers",
+    lambda: broker.subscribers
+))
+registry.register(CallbackMetric(
+    "crm_events_dropped_total", "Subscribers disconnected for falling behind",
+    lambda: broker.dropped, type="counter"
+))
+registry.register(CallbackMetric(
+    "crm_report_jobs_pending", "Report jobs queued or running",
+    lambda: report_queue.pending
+))
+
+
+@router.get("/metrics")
+def metrics():
+    """Метрики процесса (Prometheus text format 0.0.4)."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
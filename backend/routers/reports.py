@@ -0,0 +1,92 @@
+"""
+Роутер заданий на формирование отчётов (Google Sheets или файл XLSX/CSV).
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import FileResponse
+from sqlite3 import Connection
+from typing import Literal
+from backend.database import get_db
+from backend.reports import (
+    FILE_FORMATS, REPORT_FILTERS, create_job, get_job, google_settings, google_token_ready, report_file, report_queue,
+    store_google_token
+)
+from backend.schemas import GoogleToken, ReportJob, ReportRequest
+from backend.writer import writer
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+
+@router.post("/{entity}", response_model=ReportJob, status_code=202)
+def create_report(
+    entity: Literal["clients", "deals", "tasks"],
+    request: ReportRequest,
+    response: Response
+):
+    """
+    Поставить отчёт в очередь.
+    
+    Возвращает задание; статус, прогресс и ссылку на таблицу или файл -
+    по GET /api/reports/jobs/{id} (адрес в заголовке Location).
+    """
+    body = request.model_dump(exclude_none=True)
+    report_format = body.pop("format")
+    folder_id = body.pop("folder_id", None)
+    unsupported = sorted(set(body) - set(REPORT_FILTERS[entity]))
+    if unsupported:
+        raise HTTPException(status_code=422, detail=f"Unsupported filters for {entity}: {', '.join(unsupported)}")
+    
+    if report_format == "sheets":
+        settings = google_settings()
+        if not settings["client_secret_path"] or not (folder_id or settings["folder_id"]):
+            raise HTTPException(status_code=400, detail="Google integration is not configured")
+        if not google_token_ready(settings["token_path"]):
+            raise HTTPException(status_code=400, detail="Google sign-in required")
+    if report_queue.full:
+        raise HTTPException(status_code=503, detail="Report queue is full", headers={"Retry-After": "30"})
+    
+    params = {"filters": body, "format": report_format}
+    if folder_id:
+        params["folder_id"] = folder_id
+    job = writer.submit(lambda conn: create_job(conn, entity, params))
+    report_queue.submit(job["id"])
+    response.headers["Location"] = f"/api/reports/jobs/{job['id']}"
+    return job
+
+
+@router.put("/google-token", status_code=204)
+def upload_google_token(token: GoogleToken):
+    """
+    Сохранить токен Google, полученный входом в GUI, в GOOGLE_TOKEN_PATH сервера.
+    
+    Сервер сам вход в браузере не открывает; так GUI передаёт токен,
+    когда не видит файл токена сервера (Docker, другая машина).
+    """
+    try:
+        store_google_token(google_settings()["token_path"], token.model_dump(exclude_none=True))
+    except ImportError:
+        raise HTTPException(status_code=400, detail="Google client libraries are not installed on the server")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/jobs/{job_id}", response_model=ReportJob)
+def read_report_job(job_id: int, db: Connection = Depends(get_db)):
+    """Статус задания: queued, running, done (есть link) или failed (есть error)."""
+    job = get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/file")
+def download_report_file(job_id: int, db: Connection = Depends(get_db)):
+    """Файл готового отчёта в формате xlsx или csv."""
+    job = get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    report_format = job["params"].get("format", "sheets")
+    path = report_file(job_id, report_format)
+    if report_format not in FILE_FORMATS or job["status"] != "done" or not path.exists():
+        raise HTTPException(status_code=404, detail="Report file not found")
+    return FileResponse(path, media_type=FILE_FORMATS[report_format], filename=f"{job['entity']}_{job_id}.{report_format}")
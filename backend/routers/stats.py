@@ -0,0 +1,63 @@
+"""
+Роутер агрегированной статистики (считается в SQL, без выгрузки строк).
+"""
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlite3 import Connection
+from typing import Optional
+import backend.crud as crud
+from backend.cache import query_cache
+from backend.database import get_db
+from backend.etag import ETAG_HEADER, etag_for
+from backend.schemas import ClientStats, DealStats, TaskStats
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+
+
+@router.get("/clients", response_model=ClientStats)
+def clients_stats(
+    response: Response,
+    q: Optional[str] = Query(None, description="Поиск по имени, email, телефону, компании"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("clients"))
+):
+    """Статистика по клиентам: всего, по статусам, с компанией."""
+    response.headers[ETAG_HEADER] = etag
+    return query_cache.get_or_set(etag, lambda: crud.stats_clients(db, q=q, status=status))
+
+
+@router.get("/deals", response_model=DealStats)
+def deals_stats(
+    response: Response,
+    q: Optional[str] = Query(None, description="Поиск по названию"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    client_id: Optional[int] = Query(None, description="Фильтр по клиенту"),
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("deals"))
+):
+    """Статистика по сделкам: количество, суммы, средняя сумма, разбивки."""
+    response.headers[ETAG_HEADER] = etag
+    return query_cache.get_or_set(etag, lambda: crud.stats_deals(db, q=q, status=status, client_id=client_id))
+
+
+@router.get("/tasks", response_model=TaskStats)
+def tasks_stats(
+    response: Response,
+    q: Optional[str] = Query(None, description="Поиск по названию и описанию"),
+    is_done: Optional[bool] = Query(None, description="Фильтр по статусу выполнения"),
+    client_id: Optional[int] = Query(None, description="Фильтр по клиенту"),
+    deal_id: Optional[int] = Query(None, description="Фильтр по сделке"),
+    db: Connection = Depends(get_db),
+    # overdue зависит от текущей даты, а не только от версии таблицы
+    etag: str = Depends(etag_for("tasks", by_date=True))
+):
+    """Статистика по задачам: выполнено, не выполнено, просрочено."""
+    response.headers[ETAG_HEADER] = etag
+    return query_cache.get_or_set(etag, lambda: crud.stats_tasks(db, q=q, is_done=is_done, client_id=client_id, deal_id=deal_id))
+
+
+@router.get("/cache")
+def cache_stats():
+    """Счётчики кэша результатов запросов (попадания, промахи, размер)."""
+    return query_cache.stats()
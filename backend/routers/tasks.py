@@ -2,12 +2,20 @@
 Роутер для работы с задачами.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlite3 import Connection
 from typing import List, Optional
 import backend.crud as crud
+from backend.cache import query_cache
 from backend.database import get_db
-from backend.schemas import Task, TaskCreate, TaskUpdate
+from backend.etag import ETAG_HEADER, etag_for
+from backend.export import ExportFormat, export_response
+from backend.fields import IncludeMode, parse_fields, parse_include
+from backend.formats import ListFormat, negotiate
+from backend.pagination import MAX_LIMIT, decode_cursor
+from backend.responses import page_response, render_list
+from backend.schemas import BulkResult, Task, TaskBulk, TaskCreate, TaskUpdate
+from backend.writer import writer
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
@@ -16,31 +24,86 @@ router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 def create_task(task: TaskCreate, db: Connection = Depends(get_db)):
     """Создать задачу."""
     task_dict = task.model_dump()
-    task_id = crud.create_task(db, task_dict)
+    task_id = writer.submit(lambda conn: crud.create_task(conn, task_dict))
     created = crud.get_task(db, task_id)
     if not created:
         raise HTTPException(status_code=500, detail="Failed to create task")
     return created
 
 
+@router.post("/bulk", response_model=BulkResult)
+def bulk_tasks(bulk: TaskBulk):
+    """Массово создать, обновить и удалить задачи в одной транзакции."""
+    create = [item.model_dump() for item in bulk.create]
+    update = [item.model_dump(exclude_unset=True) for item in bulk.update]
+    return writer.submit(lambda conn: crud.bulk_tasks(conn, create, update, bulk.delete))
+
+
 @router.get("", response_model=List[Task])
 def get_tasks(
+    request: Request,
+    q: Optional[str] = Query(None, description="Поиск по названию и описанию"),
+    is_done: Optional[bool] = Query(None, description="Фильтр по статусу выполнения"),
+    client_id: Optional[int] = Query(None, description="Фильтр по клиенту"),
+    deal_id: Optional[int] = Query(None, description="Фильтр по сделке"),
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,title,is_done"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    format: ListFormat = Query("objects", description="objects или columns (имена колонок один раз, строки массивами)"),
+    include: Optional[str] = Query(None, description="Связанные записи через запятую: client,deal"),
+    include_mode: IncludeMode = Query("embed", description="embed - объект в каждой строке, sideload - отдельный список included без повторов"),
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("tasks"))
+):
+    """
+    Получить список задач. Следующая страница - в заголовке X-Next-Cursor.
+    
+    include=client,deal вкладывает клиента и сделку в каждую задачу (JOIN);
+    с include_mode=sideload ответ - {"data": [...], "included": {"clients": [...], "deals": [...]}}.
+    """
+    after = decode_cursor(cursor, ranked=bool(q))
+    columns = parse_fields("tasks", fields)
+    relations = parse_include("tasks", include)
+    sideload = bool(relations) and include_mode == "sideload"
+    embed = () if sideload else relations
+    included = (lambda ids: crud.get_included(db, "tasks", ids, relations)) if sideload else None
+    page = query_cache.get_or_set(etag, lambda: render_list(
+        negotiate(request, format, include=bool(relations)), (columns or crud.COLUMNS["tasks"]) + embed, limit,
+        lambda as_json, as_array: crud.get_tasks(
+            db, q=q, is_done=is_done, client_id=client_id, deal_id=deal_id,
+            limit=limit, after=after, columns=columns, as_json=as_json, as_array=as_array, include=embed
+        ),
+        included
+    ))
+    return page_response(page, etag)
+
+
+@router.get("/export")
+def export_tasks(
+    format: ExportFormat = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
     q: Optional[str] = Query(None, description="Поиск по названию и описанию"),
     is_done: Optional[bool] = Query(None, description="Фильтр по статусу выполнения"),
     client_id: Optional[int] = Query(None, description="Фильтр по клиенту"),
     deal_id: Optional[int] = Query(None, description="Фильтр по сделке"),
-    db: Connection = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,title,is_done")
 ):
-    """Получить список задач."""
-    return crud.get_tasks(db, q=q, is_done=is_done, client_id=client_id, deal_id=deal_id)
+    """Потоковая выгрузка задач с теми же фильтрами, что и у списка."""
+    columns = parse_fields("tasks", fields)
+    return export_response("tasks", lambda conn, as_json: crud.iter_tasks(conn, q=q, is_done=is_done, client_id=client_id, deal_id=deal_id, columns=columns, as_json=as_json), format, columns)
 
 
 @router.get("/{task_id}", response_model=Task)
-def get_task(task_id: int, db: Connection = Depends(get_db)):
+def get_task(
+    task_id: int,
+    response: Response,
+    db: Connection = Depends(get_db),
+    etag: str = Depends(etag_for("tasks"))
+):
     """Получить задачу по ID."""
-    task = crud.get_task(db, task_id)
+    task = query_cache.get_or_set(etag, lambda: crud.get_task(db, task_id))
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    response.headers[ETAG_HEADER] = etag
     return task
 
 
@@ -48,7 +111,7 @@ def get_task(task_id: int, db: Connection = Depends(get_db)):
 def update_task(task_id: int, task: TaskUpdate, db: Connection = Depends(get_db)):
     """Обновить задачу."""
     task_dict = task.model_dump(exclude_unset=True)
-    if not crud.update_task(db, task_id, task_dict):
+    if not writer.submit(lambda conn: crud.update_task(conn, task_id, task_dict)):
         raise HTTPException(status_code=404, detail="Task not found")
     updated = crud.get_task(db, task_id)
     if not updated:
@@ -57,8 +120,8 @@ def update_task(task_id: int, task: TaskUpdate, db: Connection = Depends(get_db)
 
 
 @router.delete("/{task_id}", status_code=204)
-def delete_task(task_id: int, db: Connection = Depends(get_db)):
+def delete_task(task_id: int):
     """Удалить задачу."""
-    if not crud.delete_task(db, task_id):
+    if not writer.submit(lambda conn: crud.delete_task(conn, task_id)):
         raise HTTPException(status_code=404, detail="Task not found")
 
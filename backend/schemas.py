@@ -2,8 +2,8 @@
 Pydantic схемы для валидации данных.
 """
 
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, List, Literal, Optional, Union
 from datetime import datetime
 
 
@@ -36,6 +36,17 @@ class Client(ClientBase):
         from_attributes = True
 
 
+class ClientBulkUpdate(ClientUpdate):
+    id: int
+
+
+class ClientBulk(BaseModel):
+    """Пакет операций над клиентами."""
+    create: List[ClientCreate] = []
+    update: List[ClientBulkUpdate] = []
+    delete: List[int] = []
+
+
 # Сделки
 class DealBase(BaseModel):
     title: str
@@ -67,6 +78,17 @@ class Deal(DealBase):
         from_attributes = True
 
 
+class DealBulkUpdate(DealUpdate):
+    id: int
+
+
+class DealBulk(BaseModel):
+    """Пакет операций над сделками."""
+    create: List[DealCreate] = []
+    update: List[DealBulkUpdate] = []
+    delete: List[int] = []
+
+
 # Задачи
 class TaskBase(BaseModel):
     title: str
@@ -97,3 +119,132 @@ class Task(TaskBase):
     class Config:
         from_attributes = True
 
+
+class TaskBulkUpdate(TaskUpdate):
+    id: int
+
+
+class TaskBulk(BaseModel):
+    """Пакет операций над задачами."""
+    create: List[TaskCreate] = []
+    update: List[TaskBulkUpdate] = []
+    delete: List[int] = []
+
+
+# Массовые операции
+class BulkResult(BaseModel):
+    created_ids: List[int]
+    updated: int
+    deleted: int
+
+
+# Статистика
+class ClientStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    with_company: int
+
+
+class DealStats(BaseModel):
+    total: int
+    total_amount: float
+    avg_amount: float
+    by_status: Dict[str, int]
+    amount_by_status: Dict[str, float]
+    amount_by_currency: Dict[str, float]
+
+
+class TaskStats(BaseModel):
+    total: int
+    done: int
+    not_done: int
+    overdue: int
+
+
+# Журнал изменений
+class Change(BaseModel):
+    seq: int
+    entity: str
+    entity_id: int
+    op: Literal["create", "update", "delete"]
+    changed_at: str
+
+
+class ChangePage(BaseModel):
+    changes: List[Change]
+    last_seq: int
+    has_more: bool
+
+
+# Пакет разнородных операций
+MAX_BATCH_OPERATIONS = 1000
+
+
+class BatchOperation(BaseModel):
+    """
+    Операция пакета.
+    
+    id (для update/delete) и поля client_id/deal_id в data могут быть
+    ссылкой "$имя" на запись, созданную ранее в этом же пакете с ref="имя".
+    """
+    op: Literal["create", "update", "delete"]
+    entity: Literal["clients", "deals", "tasks"]
+    id: Optional[Union[int, str]] = None
+    ref: Optional[str] = None
+    data: Dict[str, Any] = {}
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
+
+class BatchOperationResult(BaseModel):
+    op: str
+    entity: str
+    id: int
+    row: Optional[Dict[str, Any]] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
+    refs: Dict[str, int]
+
+
+# Отчёты
+class ReportRequest(BaseModel):
+    """
+    Фильтры отчёта (как у списка сущности), формат и папка Drive вместо
+    настроенной (только для sheets).
+    """
+    q: Optional[str] = None
+    status: Optional[str] = None
+    is_done: Optional[bool] = None
+    client_id: Optional[int] = None
+    deal_id: Optional[int] = None
+    format: Literal["sheets", "xlsx", "csv"] = "sheets"
+    folder_id: Optional[str] = None
+
+
+class GoogleToken(BaseModel):
+    """Токен OAuth после входа в GUI (authorized user JSON, Credentials.to_json)."""
+    token: Optional[str] = None
+    refresh_token: str
+    token_uri: str = "https://oauth2.googleapis.com/token"
+    client_id: str
+    client_secret: str
+    scopes: Optional[List[str]] = None
+    expiry: Optional[str] = None
+
+
+class ReportJob(BaseModel):
+    id: int
+    entity: str
+    params: Dict[str, Any]
+    status: Literal["queued", "running", "done", "failed"]
+    progress: int
+    total: Optional[int] = None
+    link: Optional[str] = None
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
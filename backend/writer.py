@@ -0,0 +1,176 @@
+"""
+Единственный поток записи в БД с групповыми коммитами.
+
+SQLite допускает одного писателя одновременно, поэтому запись из
+обработчиков FastAPI (пул потоков) не конкурирует за блокировку, а
+ставится в очередь. Поток записи забирает из очереди всё, что пришло
+за короткое окно, и выполняет пачку в одной транзакции BEGIN IMMEDIATE:
+каждая операция - в своём SAVEPOINT, так что ошибка одной операции
+откатывает только её. После COMMIT каждый вызывающий получает свой
+результат (или своё исключение).
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, TypeVar
+from backend.database import DATABASE_PATH, connect, transaction
+from backend.metrics import commit_duration, write_batch_size
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать попутные операции после первой в пачке
+WRITE_WINDOW_MS = float(os.getenv("DB_WRITE_WINDOW_MS", "2"))
+# Максимум операций в одной транзакции
+WRITE_MAX_BATCH = int(os.getenv("DB_WRITE_MAX_BATCH", "256"))
+
+Operation = Tuple[Callable[[sqlite3.Connection], object], Future]
+
+
+class Writer:
+    """Поток записи: очередь операций и групповой коммит."""
+    
+    def __init__(
+        self,
+        path: Path = DATABASE_PATH,
+        window_ms: float = WRITE_WINDOW_MS,
+        max_batch: int = WRITE_MAX_BATCH
+    ):
+        self.path = path
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Operation]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._commit_hooks: List[Callable[[], None]] = []
+    
+    def start(self):
+        """Запустить поток записи (повторный вызов ничего не делает)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Дописать очередь и остановить поток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+    
+    def on_commit(self, callback: Callable[[], None]):
+        """Зарегистрировать функцию, вызываемую в потоке записи после каждого COMMIT."""
+        self._commit_hooks.append(callback)
+    
+    def submit_async(self, operation: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+        """
+        Поставить операцию в очередь.
+        
+        Args:
+            operation: Функция (соединение) -> результат; выполняется
+                внутри транзакции, сама COMMIT не делает
+        
+        Returns:
+            Future, завершаемый после COMMIT пачки
+        """
+        self.start()
+        future: "Future[T]" = Future()
+        self._queue.put((operation, future))
+        return future
+    
+    def submit(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        """Выполнить операцию записи и дождаться коммита."""
+        return self.submit_async(operation).result()
+    
+    def _collect(self, first: Operation) -> Tuple[List[Operation], bool]:
+        """
+        Собрать пачку: первая операция и всё, что пришло за окно.
+        
+        Returns:
+            (операции, получен ли сигнал остановки)
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+    
+    @property
+    def pending(self) -> int:
+        """Операций в очереди (примерно)."""
+        return self._queue.qsize()
+    
+    def _execute(self, conn: sqlite3.Connection, batch: List[Operation]):
+        """Выполнить пачку в одной транзакции и завершить Future."""
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    results.append(None)
+                    continue
+                try:
+                    with transaction(conn):
+                        results.append((True, operation(conn)))
+                except Exception as exc:
+                    results.append((False, exc))
+            started = time.perf_counter()
+            conn.commit()
+            commit_duration.observe(time.perf_counter() - started)
+            write_batch_size.observe(len(batch))
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(exc)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if result is None:
+                continue
+            ok, value = result
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        
+        for callback in self._commit_hooks:
+            try:
+                callback()
+            except Exception:
+                # Ошибка подписчика не должна останавливать поток записи
+                logger.exception("Commit hook failed")
+    
+    def _run(self):
+        """Цикл потока записи."""
+        conn = connect(self.path)
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch, stopping = self._collect(first)
+                self._execute(conn, batch)
+        finally:
+            conn.close()
+
+
+writer = Writer()
@@ -0,0 +1,117 @@
+"""
+Бенчмарк локальной выгрузки отчётов.
+
+Создаёт свежую БД заданного размера (benchmarks.seed) и формирует
+отчёты по сделкам в локальные файлы XLSX и CSV тем же путём, что и
+очередь отчётов: строки читаются курсором SQLite и сразу пишутся
+приёмником, без сети и OAuth. Результат - JSON со временем, скоростью
+(строк/с) и размером файла по форматам и пиковым RSS процесса.
+
+Пример:
+    python -m benchmarks.report --rows 1000000 --output report-bench.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import backend.crud as crud
+from backend.database import connect
+from benchmarks.run import git_commit
+from benchmarks.seed import seed, table_counts
+from google_integration.report_generator import ReportGenerator
+from google_integration.report_sinks import CsvSink, XlsxSink
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SINKS = {"xlsx": XlsxSink, "csv": CsvSink}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS текущего процесса, МиБ."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КиБ, macOS - байты
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def render(db: Path, report_format: str, directory: Path) -> dict:
+    """Сформировать отчёт по всем сделкам в файл; время, скорость и размер."""
+    conn = connect(db)
+    try:
+        stats = crud.stats_deals(conn)
+        rows = (dict(zip(crud.COLUMNS["deals"], row)) for row in crud.iter_deals(conn))
+        sink = SINKS[report_format](directory, f"deals.{report_format}")
+        started = time.perf_counter()
+        path = ReportGenerator(sink).export_deals_report(rows, stats)
+        seconds = time.perf_counter() - started
+    finally:
+        conn.close()
+    return {
+        "rows": stats["total"],
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(stats["total"] / seconds) if seconds else 0,
+        "file_mb": round(Path(path).stat().st_size / (1024 * 1024), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк локальной выгрузки отчётов")
+    parser.add_argument('--rows', type=int, default=100000, help='Всего строк в БД (сделок - 40%%)')
+    parser.add_argument('--db', type=Path, help='Файл БД (по умолчанию - временный)')
+    parser.add_argument('--reuse-db', action='store_true', help='Не пересоздавать существующую БД --db (размеры таблиц берутся из неё)')
+    parser.add_argument('--formats', default="xlsx,csv", help='Форматы через запятую: xlsx, csv')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генератора данных')
+    parser.add_argument('--output', type=Path, help='Сохранить JSON в файл')
+    
+    args = parser.parse_args()
+    formats = [name.strip() for name in args.formats.split(",")]
+    unknown = [name for name in formats if name not in SINKS]
+    if unknown:
+        parser.error(f"Неизвестный формат: {', '.join(unknown)}")
+    
+    tmpdir = tempfile.TemporaryDirectory(prefix="crm-report-bench-")
+    db = args.db or Path(tmpdir.name) / "bench.db"
+    try:
+        if args.reuse_db and db.exists():
+            counts = table_counts(db)
+            print(f"БД {db} используется повторно: {counts}", file=sys.stderr)
+        else:
+            print(f"Заполнение БД ({args.rows} строк)...", file=sys.stderr)
+            counts = seed(db, args.rows, args.seed)
+        
+        results = {}
+        for report_format in formats:
+            print(f"Отчёт {report_format}...", file=sys.stderr)
+            results[report_format] = render(db, report_format, Path(tmpdir.name))
+    finally:
+        tmpdir.cleanup()
+    
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"rows": sum(counts.values()), "tables": counts, "seed": args.seed},
+        "formats": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Нагрузочный тест API.
+
+Создаёт свежую БД заданного размера (benchmarks.seed), поднимает
+локальный uvicorn с backend.main:app в отдельном процессе и гоняет
+смесь запросов из нескольких потоков: списки с фильтрами, поиск q,
+получение по id, создание и обновление. Результат - JSON с
+пропускной способностью, p50/p95/p99 задержек по типам запросов и
+пиковым RSS сервера.
+
+Пример:
+    python -m benchmarks.run --rows 1000000 --duration 30 --output bench.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import requests
+from benchmarks.seed import DEAL_STATUSES, LAST_NAMES, seed, table_counts
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Смесь по умолчанию: тип запроса -> вес
+DEFAULT_MIX = {"list": 25, "filter": 20, "search": 15, "get": 25, "create": 10, "update": 5}
+PAGE_SIZE = 50
+
+# Запрос: (метод, путь, параметры, тело)
+Request = Tuple[str, str, Optional[dict], Optional[dict]]
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Разобрать смесь вида list=30,get=50,create=20."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Неизвестный тип запроса: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+def make_workload(counts: Dict[str, int]) -> Dict[str, Callable[[random.Random], Request]]:
+    """Генераторы запросов каждого типа для БД с данными размерами таблиц."""
+    def list_(rnd: random.Random) -> Request:
+        entity = rnd.choice(["clients", "deals", "tasks"])
+        return "GET", f"/api/{entity}", {"limit": PAGE_SIZE}, None
+    
+    def filter_(rnd: random.Random) -> Request:
+        choice = rnd.randrange(3)
+        if choice == 0:
+            return "GET", "/api/deals", {"status": rnd.choice(DEAL_STATUSES), "limit": PAGE_SIZE}, None
+        if choice == 1:
+            params = {"is_done": rnd.choice(["true", "false"]), "client_id": rnd.randint(1, counts["clients"])}
+            return "GET", "/api/tasks", dict(params, limit=PAGE_SIZE), None
+        return "GET", "/api/deals", {"client_id": rnd.randint(1, counts["clients"]), "limit": PAGE_SIZE}, None
+    
+    def search(rnd: random.Random) -> Request:
+        entity = rnd.choice(["clients", "tasks"])
+        return "GET", f"/api/{entity}", {"q": rnd.choice(LAST_NAMES), "limit": PAGE_SIZE}, None
+    
+    def get(rnd: random.Random) -> Request:
+        entity = rnd.choice(["clients", "deals", "tasks"])
+        return "GET", f"/api/{entity}/{rnd.randint(1, counts[entity])}", None, None
+    
+    def create(rnd: random.Random) -> Request:
+        body = {
+            "title": f"Нагрузка {rnd.choice(LAST_NAMES)}",
+            "client_id": rnd.randint(1, counts["clients"]),
+        }
+        return "POST", "/api/tasks", None, body
+    
+    def update(rnd: random.Random) -> Request:
+        body = {"amount": round(rnd.uniform(10000, 1000000), 2)}
+        return "PUT", f"/api/deals/{rnd.randint(1, counts['deals'])}", None, body
+    
+    return {"list": list_, "filter": filter_, "search": search, "get": get, "create": create, "update": update}
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Перцентиль методом ближайшего ранга."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(p / 100 * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> dict:
+    """Пропускная способность и перцентили задержек (мс)."""
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / duration, 1) if duration else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+class LoadRunner:
+    """Закрытый цикл: каждый поток шлёт следующий запрос после ответа на предыдущий."""
+    
+    def __init__(self, base_url: str, workload: Dict[str, Callable], mix: Dict[str, int], seed: int = 42):
+        self.base_url = base_url
+        self.workload = workload
+        self.kinds = [kind for kind, weight in mix.items() if weight > 0]
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {kind: [] for kind in self.kinds}
+        self.errors: Dict[str, int] = {kind: 0 for kind in self.kinds}
+        self._recording = False
+        self._stop = threading.Event()
+    
+    def _worker(self, index: int):
+        rnd = random.Random(self.seed * 1000 + index)
+        session = requests.Session()
+        latencies = {kind: [] for kind in self.kinds}
+        errors = {kind: 0 for kind in self.kinds}
+        while not self._stop.is_set():
+            kind = rnd.choices(self.kinds, self.weights)[0]
+            method, path, params, body = self.workload[kind](rnd)
+            started = time.perf_counter()
+            try:
+                response = session.request(method, self.base_url + path, params=params, json=body)
+                response.content
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if not self._recording:
+                continue
+            if ok:
+                latencies[kind].append(elapsed)
+            else:
+                errors[kind] += 1
+        with self._lock:
+            for kind in self.kinds:
+                self.latencies[kind].extend(latencies[kind])
+                self.errors[kind] += errors[kind]
+    
+    def run(self, concurrency: int, duration: float, warmup: float) -> float:
+        """
+        Прогнать нагрузку.
+        
+        Returns:
+            Длительность измеряемого интервала, секунды
+        """
+        threads = [
+            threading.Thread(target=self._worker, args=(index,), daemon=True)
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(warmup)
+        self._recording = True
+        started = time.perf_counter()
+        time.sleep(duration)
+        self._stop.set()
+        measured = time.perf_counter() - started
+        for thread in threads:
+            thread.join()
+        return measured
+
+
+def start_server(db: Path, port: int) -> subprocess.Popen:
+    """Запустить uvicorn с приложением и дождаться /health."""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db}")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Сервер завершился при запуске")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Сервер не ответил на /health за 30 с")
+
+
+def stop_server(process: subprocess.Popen) -> Optional[float]:
+    """Остановить сервер; пиковый RSS дочерних процессов, МиБ."""
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux отдаёт КиБ, macOS - байты
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def git_commit() -> Optional[str]:
+    """Текущий коммит, если это git-репозиторий."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument('--rows', type=int, default=10000, help='Всего строк в БД (10000, 1000000, 10000000)')
+    parser.add_argument('--db', type=Path, help='Файл БД (по умолчанию - временный)')
+    parser.add_argument('--reuse-db', action='store_true', help='Не пересоздавать существующую БД --db (размеры таблиц берутся из неё)')
+    parser.add_argument('--duration', type=float, default=30, help='Длительность измерения, секунды')
+    parser.add_argument('--warmup', type=float, default=5, help='Прогрев до начала измерения, секунды')
+    parser.add_argument('--concurrency', type=int, default=8, help='Количество потоков-клиентов')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='Смесь запросов, например list=30,get=50,create=20')
+    parser.add_argument('--port', type=int, default=8765, help='Порт сервера')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генераторов данных и запросов')
+    parser.add_argument('--output', type=Path, help='Сохранить JSON в файл')
+    
+    args = parser.parse_args()
+    
+    tmpdir = None
+    db = args.db
+    if db is None:
+        tmpdir = tempfile.TemporaryDirectory(prefix="crm-bench-")
+        db = Path(tmpdir.name) / "bench.db"
+    
+    seed_seconds = None
+    if args.reuse_db and db.exists():
+        counts = table_counts(db)
+        print(f"БД {db} используется повторно: {counts}", file=sys.stderr)
+    else:
+        print(f"Заполнение БД ({args.rows} строк)...", file=sys.stderr)
+        started = time.perf_counter()
+        counts = seed(db, args.rows, args.seed)
+        seed_seconds = round(time.perf_counter() - started, 1)
+    
+    process = start_server(db, args.port)
+    try:
+        runner = LoadRunner(f"http://127.0.0.1:{args.port}", make_workload(counts), args.mix, args.seed)
+        print(f"Нагрузка: {args.concurrency} потоков, {args.duration} с...", file=sys.stderr)
+        measured = runner.run(args.concurrency, args.duration, args.warmup)
+    finally:
+        peak_rss = stop_server(process)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    
+    all_latencies = [value for values in runner.latencies.values() for value in values]
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "rows": sum(counts.values()),
+            "tables": counts,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "seed_seconds": seed_seconds,
+        "total": summarize(all_latencies, sum(runner.errors.values()), measured),
+        "operations": {
+            kind: summarize(runner.latencies[kind], runner.errors[kind], measured)
+            for kind in runner.kinds
+        },
+        "server_peak_rss_mb": peak_rss,
+    }
+    
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Заполнение свежей БД для нагрузочных тестов.
+
+Данные детерминированы (зависят только от --rows и --seed), поэтому
+результаты разных коммитов сравнимы. Схема создаётся теми же
+миграциями, что и у приложения; строки пишутся напрямую в SQLite
+пачками executemany, по транзакции на пачку.
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator
+from backend.migrations import migrate
+
+# Словари для имён и заголовков: поиск q в нагрузке берёт слова отсюда
+FIRST_NAMES = ["Иван", "Пётр", "Анна", "Мария", "Олег", "Елена", "Сергей", "Ольга", "Дмитрий", "Наталья"]
+LAST_NAMES = [
+    "Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов",
+    "Новиков", "Морозов", "Волков", "Алексеев", "Фёдоров", "Семенов", "Егоров", "Павлов",
+]
+COMPANY_WORDS = ["Альфа", "Вектор", "Гранит", "Интех", "Орбита", "Прогресс", "Сигма", "Техно"]
+DEAL_WORDS = ["поставка", "внедрение", "аудит", "поддержка", "лицензия", "обучение", "аренда", "монтаж"]
+
+CLIENT_STATUSES = ["active", "archived"]
+DEAL_STATUSES = ["new", "in_progress", "closed", "cancelled"]
+CURRENCIES = ["RUB", "USD", "EUR"]
+
+BASE_TIME = datetime(2025, 1, 1)
+BATCH_SIZE = 50000
+
+
+def split_rows(rows: int) -> Dict[str, int]:
+    """Разбить общее число строк: 20% клиентов, 40% сделок, 40% задач."""
+    clients = max(1, rows // 5)
+    deals = max(1, rows * 2 // 5)
+    return {"clients": clients, "deals": deals, "tasks": max(1, rows - clients - deals)}
+
+
+def table_counts(path: Path) -> Dict[str, int]:
+    """
+    Размеры таблиц существующей БД: наибольший id по таблицам.
+    
+    Нагрузка выбирает id из 1..N, поэтому для повторно используемой БД
+    берутся её реальные границы, а не split_rows от текущего --rows.
+    """
+    conn = sqlite3.connect(str(path))
+    try:
+        return {
+            table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            for table in ("clients", "deals", "tasks")
+        }
+    finally:
+        conn.close()
+
+
+def _clients(rnd: random.Random, n: int) -> Iterator[tuple]:
+    for i in range(1, n + 1):
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        yield (
+            f"{last} {first}",
+            f"client{i}@example.com",
+            f"+7 9{rnd.randrange(10 ** 9):09d}",
+            f"{rnd.choice(COMPANY_WORDS)} {rnd.choice(COMPANY_WORDS)}" if rnd.random() > 0.3 else None,
+            rnd.choice(CLIENT_STATUSES),
+            (BASE_TIME + timedelta(seconds=i)).isoformat(),
+        )
+
+
+def _deals(rnd: random.Random, n: int, clients: int) -> Iterator[tuple]:
+    for i in range(1, n + 1):
+        yield (
+            f"{rnd.choice(DEAL_WORDS).capitalize()} {rnd.choice(COMPANY_WORDS)} {i}",
+            round(rnd.uniform(10000, 1000000), 2),
+            rnd.choice(CURRENCIES),
+            rnd.choice(DEAL_STATUSES),
+            rnd.randint(1, clients) if rnd.random() > 0.2 else None,
+            (BASE_TIME + timedelta(days=rnd.randint(0, 365))).strftime("%Y-%m-%d") if rnd.random() > 0.5 else None,
+            (BASE_TIME + timedelta(seconds=i)).isoformat(),
+        )
+
+
+def _tasks(rnd: random.Random, n: int, clients: int, deals: int) -> Iterator[tuple]:
+    for i in range(1, n + 1):
+        yield (
+            f"Позвонить {rnd.choice(LAST_NAMES)} про {rnd.choice(DEAL_WORDS)}",
+            f"Задача {i}" if rnd.random() > 0.3 else None,
+            (BASE_TIME + timedelta(days=rnd.randint(0, 365))).strftime("%Y-%m-%d") if rnd.random() > 0.3 else None,
+            int(rnd.random() > 0.5),
+            rnd.randint(1, clients) if rnd.random() > 0.3 else None,
+            rnd.randint(1, deals) if rnd.random() > 0.5 else None,
+            (BASE_TIME + timedelta(seconds=i)).isoformat(),
+        )
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterator[tuple], total: int, title: str):
+    """Вставить строки пачками по BATCH_SIZE, по транзакции на пачку."""
+    done = 0
+    while done < total:
+        batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+        with conn:
+            conn.executemany(sql, batch)
+        done += len(batch)
+        # Прогресс - в stderr: stdout benchmarks.run отдан под JSON
+        print(f"  {title}: {done}/{total}", file=sys.stderr, flush=True)
+
+
+def seed(path: Path, rows: int, seed: int = 42) -> Dict[str, int]:
+    """
+    Создать БД с нуля и заполнить её.
+    
+    Args:
+        path: Файл БД (существующий удаляется)
+        rows: Всего строк во всех таблицах
+        seed: Зерно генератора
+    
+    Returns:
+        Количество строк по таблицам
+    """
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    counts = split_rows(rows)
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")
+        migrate(conn)
+        
+        _insert(conn, """
+            INSERT INTO clients (name, email, phone, company, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, _clients(rnd, counts["clients"]), counts["clients"], "clients")
+        _insert(conn, """
+            INSERT INTO deals (title, amount, currency, status, client_id, close_date, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, _deals(rnd, counts["deals"], counts["clients"]), counts["deals"], "deals")
+        _insert(conn, """
+            INSERT INTO tasks (title, description, due_date, is_done, client_id, deal_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, _tasks(rnd, counts["tasks"], counts["clients"], counts["deals"]), counts["tasks"], "tasks")
+        
+        # Начальное заполнение - не изменения: журнал начинается с пустого
+        with conn:
+            conn.execute("DELETE FROM changes")
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Создать БД для нагрузочных тестов")
+    parser.add_argument('--db', type=Path, default=Path('data/bench.db'), help='Файл БД')
+    parser.add_argument('--rows', type=int, default=10000, help='Всего строк (например 10000, 1000000, 10000000)')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генератора')
+    
+    args = parser.parse_args()
+    
+    started = time.perf_counter()
+    counts = seed(args.db, args.rows, args.seed)
+    print(f"Готово за {time.perf_counter() - started:.1f} с: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,7 @@
 Создание файлов от имени пользователя.
 """
 
-import os
-import pickle
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-
-SCOPES = [
-    'https://www.googleapis.com/auth/drive',
-    'https://www.googleapis.com/auth/spreadsheets'
-]
+from google_integration.services import SCOPES, registry
 
 
 class GoogleDrive:
@@ -21,41 +12,21 @@ class GoogleDrive:
     def __init__(
         self,
         client_secret_path: str,
-        token_path: str = "token.pickle"
+        token_path: str = "token.pickle",
+        interactive: bool = True
     ):
         """
         Args:
             client_secret_path: Путь к client_secret.json (OAuth Desktop)
             token_path: Путь для сохранения токена
+            interactive: Разрешить вход в браузере, если токена нет
         """
         self.client_secret_path = client_secret_path
         self.token_path = token_path
-        self.credentials = None
-        self._authenticate()
-        
-        self.drive_service = build('drive', 'v3', credentials=self.credentials)
-    
-    def _authenticate(self):
-        """OAuth2 аутентификация с сохранением токена."""
-        # Загрузить существующий токен
-        if os.path.exists(self.token_path):
-            with open(self.token_path, 'rb') as token:
-                self.credentials = pickle.load(token)
-        
-        # Если токена нет или он невалиден
-        if not self.credentials or not self.credentials.valid:
-            if self.credentials and self.credentials.expired and self.credentials.refresh_token:
-                self.credentials.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.client_secret_path,
-                    SCOPES
-                )
-                self.credentials = flow.run_local_server(port=0)
-            
-            # Сохранить токен
-            with open(self.token_path, 'wb') as token:
-                pickle.dump(self.credentials, token)
+        # Токен и клиент drive общие на процесс: повторное создание
+        # GoogleDrive не читает токен с диска и не строит клиента заново
+        self.credentials = registry.credentials(client_secret_path, token_path, interactive)
+        self.drive_service = registry.service('drive', 'v3', self.credentials)
     
     def create_spreadsheet(self, name: str, folder_id: str) -> dict:
         """
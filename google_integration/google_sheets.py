@@ -4,10 +4,12 @@
 """
 
 import os
-from typing import Optional, List, Tuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from google.oauth2.credentials import Credentials
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from google_integration.services import build_service, registry
 from googleapiclient.errors import HttpError
 
 
@@ -25,6 +27,226 @@ def sanitize_value(value) -> str:
     return str_value
 
 
+Color = Tuple[float, float, float]
+
+# Строк в первом листе новой таблицы
+DEFAULT_ROW_COUNT = 1000
+# Предел одного запроса записи: строк и примерный размер значений
+WRITE_CHUNK_ROWS = int(os.getenv("GSHEETS_WRITE_CHUNK_ROWS", "5000"))
+WRITE_CHUNK_BYTES = int(os.getenv("GSHEETS_WRITE_CHUNK_BYTES", str(2 * 1024 * 1024)))
+# Сколько запросов записи выполняется одновременно
+WRITE_CONCURRENCY = int(os.getenv("GSHEETS_WRITE_CONCURRENCY", "4"))
+
+
+def _grid_range(sheet_id: int, start_row: int, end_row: int, start_col: int, end_col: int) -> dict:
+    """GridRange (индексы 0-based, конец не включительно)."""
+    return {
+        'sheetId': sheet_id,
+        'startRowIndex': start_row,
+        'endRowIndex': end_row,
+        'startColumnIndex': start_col,
+        'endColumnIndex': end_col
+    }
+
+
+def _color(rgb: Color) -> dict:
+    """Цвет в формате API (компоненты 0.0-1.0)."""
+    return {'red': rgb[0], 'green': rgb[1], 'blue': rgb[2]}
+
+
+def cell_value(value) -> dict:
+    """
+    CellData для updateCells.
+    
+    Числа передаются как numberValue, bool - как boolValue, остальное -
+    как stringValue. Строка
+    в stringValue не разбирается как формула, поэтому экранирование
+    sanitize_value здесь не нужно.
+    """
+    if value is None or value == "":
+        return {}
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, (int, float)):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+
+def raw_value(value):
+    """Значение для valueInputOption=RAW: числа и bool как есть, остальное строкой."""
+    if value is None:
+        return ""
+    if isinstance(value, (bool, int, float)):
+        return value
+    return str(value)
+
+
+def chunk_rows(
+    rows: Iterable[Sequence],
+    max_rows: int = WRITE_CHUNK_ROWS,
+    max_bytes: int = WRITE_CHUNK_BYTES
+) -> Iterator[List[List]]:
+    """
+    Разбить поток строк на пачки для записи.
+    
+    Пачка закрывается по числу строк или по примерному размеру значений
+    (длина строкового представления плюс разделители JSON), в памяти
+    держится только текущая пачка.
+    
+    Args:
+        rows: Итератор строк (например, прямо из выгрузки API)
+        max_rows: Максимум строк в пачке
+        max_bytes: Примерный максимум байт значений в пачке
+    """
+    chunk = []
+    size = 0
+    for row in rows:
+        values = [raw_value(value) for value in row]
+        row_size = sum(len(str(value)) + 4 for value in values)
+        if chunk and (len(chunk) >= max_rows or size + row_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(values)
+        size += row_size
+    if chunk:
+        yield chunk
+
+
+class SheetsBatch:
+    """
+    Накопитель запросов spreadsheets.batchUpdate.
+    
+    Значения, форматирование, объединения и границы собираются в список
+    и отправляются одним HTTP-запросом в flush().
+    """
+    
+    def __init__(self, client: "GoogleSheetsClient"):
+        self.client = client
+        self.requests: List[Dict[str, Any]] = []
+    
+    def __len__(self) -> int:
+        return len(self.requests)
+    
+    def resize_sheet(self, sheet_id: int, rows: int):
+        """Задать число строк листа (у нового листа их 1000)."""
+        self.requests.append({
+            'updateSheetProperties': {
+                'properties': {'sheetId': sheet_id, 'gridProperties': {'rowCount': rows}},
+                'fields': 'gridProperties.rowCount'
+            }
+        })
+        return self
+    
+    def update_cells(self, sheet_id: int, start_row: int, start_col: int, values: List[List]):
+        """Записать значения начиная с ячейки (start_row, start_col)."""
+        self.requests.append({
+            'updateCells': {
+                'start': {'sheetId': sheet_id, 'rowIndex': start_row, 'columnIndex': start_col},
+                'rows': [{'values': [cell_value(cell) for cell in row]} for row in values],
+                'fields': 'userEnteredValue'
+            }
+        })
+        return self
+    
+    def repeat_cell(
+        self,
+        sheet_id: int,
+        start_row: int,
+        end_row: int,
+        start_col: int,
+        end_col: int,
+        bg_color: Optional[Color] = None,
+        text_color: Optional[Color] = None,
+        text_bold: bool = False,
+        text_size: Optional[int] = None,
+        h_align: Optional[str] = None
+    ):
+        """Форматирование диапазона (параметры - как у GoogleSheetsClient.format_cells)."""
+        cell_format = {}
+        
+        if bg_color:
+            cell_format['backgroundColor'] = _color(bg_color)
+        
+        text_format = {}
+        if text_color:
+            text_format['foregroundColor'] = _color(text_color)
+        if text_bold:
+            text_format['bold'] = True
+        if text_size:
+            text_format['fontSize'] = text_size
+        
+        if text_format:
+            cell_format['textFormat'] = text_format
+        
+        if h_align:
+            cell_format['horizontalAlignment'] = h_align
+        
+        if cell_format:
+            self.requests.append({
+                'repeatCell': {
+                    'range': _grid_range(sheet_id, start_row, end_row, start_col, end_col),
+                    'cell': {'userEnteredFormat': cell_format},
+                    'fields': 'userEnteredFormat(backgroundColor,textFormat,horizontalAlignment)'
+                }
+            })
+        return self
+    
+    def merge_cells(self, sheet_id: int, start_row: int, end_row: int, start_col: int, end_col: int):
+        """Объединить ячейки."""
+        self.requests.append({
+            'mergeCells': {
+                'range': _grid_range(sheet_id, start_row, end_row, start_col, end_col),
+                'mergeType': 'MERGE_ALL'
+            }
+        })
+        return self
+    
+    def update_borders(
+        self,
+        sheet_id: int,
+        start_row: int,
+        end_row: int,
+        start_col: int,
+        end_col: int,
+        style: str = "SOLID",
+        width: int = 1,
+        color: Color = (0, 0, 0)
+    ):
+        """Границы всех ячеек диапазона."""
+        border = {'style': style, 'width': width, 'color': _color(color)}
+        self.requests.append({
+            'updateBorders': {
+                'range': _grid_range(sheet_id, start_row, end_row, start_col, end_col),
+                'top': border,
+                'bottom': border,
+                'left': border,
+                'right': border,
+                'innerHorizontal': border,
+                'innerVertical': border
+            }
+        })
+        return self
+    
+    def flush(self) -> List[dict]:
+        """
+        Отправить накопленные запросы одним batchUpdate.
+        
+        Returns:
+            replies ответа (пустой список, если запросов не было)
+        """
+        if not self.requests:
+            return []
+        requests, self.requests = self.requests, []
+        try:
+            response = self.client.sheets.batchUpdate(
+                spreadsheetId=self.client.spreadsheet_id,
+                body={'requests': requests}
+            ).execute()
+        except HttpError as error:
+            raise Exception(f"Ошибка при обновлении таблицы: {error}")
+        return response.get('replies', [])
+
+
 class GoogleSheetsClient:
     """Клиент для работы с Google Sheets API."""
     
@@ -54,8 +276,10 @@ class GoogleSheetsClient:
         else:
             raise ValueError("Нужны credentials: oauth_credentials или credentials_path")
         
-        self.service = build('sheets', 'v4', credentials=self.credentials)
+        self.service = registry.service('sheets', 'v4', self.credentials)
         self.sheets = self.service.spreadsheets()
+        # Свой service на поток записи: HTTP-транспорт клиента не потокобезопасен
+        self._local = threading.local()
     
     def set_spreadsheet_id(self, spreadsheet_id: str):
         """Установить ID таблицы (для работы с только что созданной)."""
@@ -121,6 +345,95 @@ class GoogleSheetsClient:
         except HttpError as error:
             raise Exception(f"Ошибка при записи данных: {error}")
     
+    def _thread_sheets(self):
+        """Ресурс spreadsheets для текущего потока."""
+        sheets = getattr(self._local, 'sheets', None)
+        if sheets is None:
+            sheets = build_service('sheets', 'v4', self.credentials).spreadsheets()
+            self._local.sheets = sheets
+        return sheets
+    
+    def _write_chunk(self, range_name: str, values: List[List]) -> int:
+        """Записать одну пачку строк (выполняется в потоке пула)."""
+        try:
+            self._thread_sheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={
+                    'valueInputOption': 'RAW',
+                    'data': [{'range': range_name, 'values': values}]
+                }
+            ).execute()
+        except HttpError as error:
+            raise Exception(f"Ошибка при записи данных: {error}")
+        return len(values)
+    
+    def write_rows(
+        self,
+        rows: Iterable[Sequence],
+        start_row: int = 0,
+        sheet_id: int = 0,
+        sheet_title: Optional[str] = None,
+        grid_rows: int = DEFAULT_ROW_COUNT,
+        progress: Optional[Callable[[int], None]] = None,
+        max_workers: int = WRITE_CONCURRENCY
+    ) -> int:
+        """
+        Потоково записать строки, начиная со строки start_row.
+        
+        Строки читаются из итератора пачками (chunk_rows) и отправляются
+        через values().batchUpdate, не более max_workers запросов
+        одновременно. Пока все потоки заняты, следующая пачка не
+        читается, поэтому память не зависит от размера отчёта. Значения
+        пишутся как RAW: строки не разбираются как формулы, числа остаются
+        числами. Лист заранее расширяется, если строки не помещаются в сетку.
+        
+        Args:
+            rows: Итератор строк
+            start_row: Индекс первой строки (0-based)
+            sheet_id: ID листа (для расширения сетки)
+            sheet_title: Название листа; по умолчанию - первый лист
+            grid_rows: Текущее число строк в листе
+            progress: Вызывается с числом записанных строк после каждой пачки
+            max_workers: Одновременных запросов записи
+        
+        Returns:
+            Количество записанных строк
+        """
+        prefix = f"'{sheet_title}'!" if sheet_title else ""
+        written = 0
+        pending = set()
+        
+        def collect(futures):
+            nonlocal written
+            for future in futures:
+                written += future.result()
+            if futures and progress:
+                progress(written)
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            row = start_row
+            for chunk in chunk_rows(rows):
+                end = row + len(chunk)
+                if end > grid_rows:
+                    # Расширять с запасом, чтобы не делать запрос на каждую пачку
+                    grid_rows = max(end, grid_rows * 2)
+                    self.batch().resize_sheet(sheet_id, grid_rows).flush()
+                if len(pending) >= max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(self._write_chunk, f"{prefix}A{row + 1}", chunk))
+                row = end
+            done, pending = wait(pending)
+            collect(done)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return written
+    
+    def batch(self) -> SheetsBatch:
+        """Начать пакет запросов batchUpdate к текущей таблице."""
+        return SheetsBatch(self)
+    
     def format_cells(
         self,
         sheet_id: int,
@@ -128,14 +441,15 @@ class GoogleSheetsClient:
         end_row: int,
         start_col: int,
         end_col: int,
-        bg_color: Optional[Tuple[float, float, float]] = None,
-        text_color: Optional[Tuple[float, float, float]] = None,
+        bg_color: Optional[Color] = None,
+        text_color: Optional[Color] = None,
         text_bold: bool = False,
         text_size: Optional[int] = None,
         h_align: Optional[str] = None
     ):
         """
-        Форматировать ячейки.
+        Форматировать ячейки (отдельный batchUpdate; для нескольких
+        операций подряд выгоднее batch()).
         
         Args:
             sheet_id: ID листа
@@ -149,61 +463,10 @@ class GoogleSheetsClient:
             text_size: Размер шрифта
             h_align: Горизонтальное выравнивание ("LEFT", "CENTER", "RIGHT")
         """
-        try:
-            requests = []
-            
-            # Форматирование ячеек
-            cell_format = {}
-            
-            if bg_color:
-                cell_format['backgroundColor'] = {
-                    'red': bg_color[0],
-                    'green': bg_color[1],
-                    'blue': bg_color[2]
-                }
-            
-            text_format = {}
-            if text_color:
-                text_format['foregroundColor'] = {
-                    'red': text_color[0],
-                    'green': text_color[1],
-                    'blue': text_color[2]
-                }
-            if text_bold:
-                text_format['bold'] = True
-            if text_size:
-                text_format['fontSize'] = text_size
-            
-            if text_format:
-                cell_format['textFormat'] = text_format
-            
-            if h_align:
-                cell_format['horizontalAlignment'] = h_align
-            
-            if cell_format:
-                requests.append({
-                    'repeatCell': {
-                        'range': {
-                            'sheetId': sheet_id,
-                            'startRowIndex': start_row,
-                            'endRowIndex': end_row,
-                            'startColumnIndex': start_col,
-                            'endColumnIndex': end_col
-                        },
-                        'cell': {
-                            'userEnteredFormat': cell_format
-                        },
-                        'fields': 'userEnteredFormat(backgroundColor,textFormat,horizontalAlignment)'
-                    }
-                })
-            
-            if requests:
-                self.sheets.batchUpdate(
-                    spreadsheetId=self.spreadsheet_id,
-                    body={'requests': requests}
-                ).execute()
-        except HttpError as error:
-            raise Exception(f"Ошибка при форматировании ячеек: {error}")
+        self.batch().repeat_cell(
+            sheet_id, start_row, end_row, start_col, end_col,
+            bg_color, text_color, text_bold, text_size, h_align
+        ).flush()
     
     def merge_cells(
         self,
@@ -214,26 +477,7 @@ class GoogleSheetsClient:
         end_col: int
     ):
         """Объединить ячейки."""
-        try:
-            self.sheets.batchUpdate(
-                spreadsheetId=self.spreadsheet_id,
-                body={
-                    'requests': [{
-                        'mergeCells': {
-                            'range': {
-                                'sheetId': sheet_id,
-                                'startRowIndex': start_row,
-                                'endRowIndex': end_row,
-                                'startColumnIndex': start_col,
-                                'endColumnIndex': end_col
-                            },
-                            'mergeType': 'MERGE_ALL'
-                        }
-                    }]
-                }
-            ).execute()
-        except HttpError as error:
-            raise Exception(f"Ошибка при объединении ячеек: {error}")
+        self.batch().merge_cells(sheet_id, start_row, end_row, start_col, end_col).flush()
     
     def set_borders(
         self,
@@ -244,7 +488,7 @@ class GoogleSheetsClient:
         end_col: int,
         style: str = "SOLID",
         width: int = 1,
-        color: Tuple[float, float, float] = (0, 0, 0)
+        color: Color = (0, 0, 0)
     ):
         """
         Установить границы для диапазона ячеек.
@@ -259,39 +503,6 @@ class GoogleSheetsClient:
             width: Толщина границы
             color: RGB цвет границы (0.0-1.0)
         """
-        try:
-            border = {
-                'style': style,
-                'width': width,
-                'color': {
-                    'red': color[0],
-                    'green': color[1],
-                    'blue': color[2]
-                }
-            }
-            
-            self.sheets.batchUpdate(
-                spreadsheetId=self.spreadsheet_id,
-                body={
-                    'requests': [{
-                        'updateBorders': {
-                            'range': {
-                                'sheetId': sheet_id,
-                                'startRowIndex': start_row,
-                                'endRowIndex': end_row,
-                                'startColumnIndex': start_col,
-                                'endColumnIndex': end_col
-                            },
-                            'top': border,
-                            'bottom': border,
-                            'left': border,
-                            'right': border,
-                            'innerHorizontal': border,
-                            'innerVertical': border
-                        }
-                    }]
-                }
-            ).execute()
-        except HttpError as error:
-            raise Exception(f"Ошибка при установке границ: {error}")
-
+        self.batch().update_borders(
+            sheet_id, start_row, end_row, start_col, end_col, style, width, color
+        ).flush()
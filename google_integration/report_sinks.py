@@ -0,0 +1,139 @@
+"""
+Приёмники отчётов: куда записывается раскладка отчёта.
+
+Раскладка (ReportLayout) описывает, что в отчёте: заголовок, блок
+анализа, шапку таблицы и поток строк. Приёмник решает, как это
+записать: в Google Sheets (google_integration.sheets_sink.SheetsSink)
+или в локальный файл XLSX/CSV. Локальные приёмники работают без сети и
+OAuth и пишут строки потоком, не держа отчёт в памяти.
+"""
+
+import csv
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Union
+from google_integration.xlsx import STYLE_CELL, STYLE_HEADER, STYLE_TITLE, XlsxWriter
+
+# Как часто сообщать о прогрессе при записи в файл, строк
+PROGRESS_EVERY = 5000
+
+# Начало строки, с которого Excel/LibreOffice читают ячейку CSV как формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+Progress = Optional[Callable[[int], None]]
+
+
+def csv_value(value):
+    """
+    Значение ячейки CSV с защитой от formula injection (как sanitize_value
+    в google_sheets): строки, начинающиеся с '=', '+', '-', '@', табуляции
+    или CR, получают префикс "'". Числа остаются числами.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_rows(rows: Iterable[Sequence]) -> Iterator[list]:
+    """Строки CSV с экранированными значениями."""
+    for row in rows:
+        yield [csv_value(value) for value in row]
+
+
+class ReportLayout(NamedTuple):
+    """
+    Раскладка отчёта.
+    
+    head - строки от заголовка (первая строка) до шапки таблицы
+    (последняя строка) включительно; rows - строки таблицы.
+    """
+    name: str
+    head: List[list]
+    rows: Iterable[list]
+    columns: int
+    
+    @property
+    def header_row(self) -> int:
+        """Индекс строки шапки таблицы (0-based)."""
+        return len(self.head) - 1
+
+
+class ReportSink:
+    """Приёмник отчёта."""
+    
+    def write(self, layout: ReportLayout, progress: Progress = None) -> str:
+        """
+        Записать отчёт.
+        
+        Args:
+            layout: Раскладка отчёта
+            progress: Вызывается с числом записанных строк таблицы
+        
+        Returns:
+            Ссылка на отчёт или путь к файлу
+        """
+        raise NotImplementedError
+
+
+class FileSink(ReportSink):
+    """Общая часть локальных приёмников: каталог и имя файла."""
+    
+    extension = ""
+    
+    def __init__(self, directory: Union[str, Path] = "reports", filename: Optional[str] = None):
+        """
+        Args:
+            directory: Каталог для файлов отчётов
+            filename: Имя файла; по умолчанию - название отчёта и время
+        """
+        self.directory = Path(directory)
+        self.filename = filename
+    
+    def path_for(self, layout: ReportLayout) -> Path:
+        """Путь к файлу отчёта (каталог создаётся при необходимости)."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename = self.filename or f"{layout.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{self.extension}"
+        return self.directory / filename
+    
+    @staticmethod
+    def _counted(rows: Iterable[list], progress: Progress) -> Iterable[list]:
+        """Пропустить строки, сообщая о прогрессе каждые PROGRESS_EVERY строк."""
+        count = 0
+        for row in rows:
+            yield row
+            count += 1
+            if progress and count % PROGRESS_EVERY == 0:
+                progress(count)
+        if progress:
+            progress(count)
+
+
+class CsvSink(FileSink):
+    """CSV без оформления (UTF-8 с BOM для Excel), формулы в ячейках экранированы."""
+    
+    extension = "csv"
+    
+    def write(self, layout: ReportLayout, progress: Progress = None) -> str:
+        path = self.path_for(layout)
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerows(csv_rows(layout.head))
+            writer.writerows(csv_rows(self._counted(layout.rows, progress)))
+        return str(path)
+
+
+class XlsxSink(FileSink):
+    """XLSX с тем же оформлением, что и в Google Sheets: заголовок, шапка, рамки."""
+    
+    extension = "xlsx"
+    
+    def write(self, layout: ReportLayout, progress: Progress = None) -> str:
+        path = self.path_for(layout)
+        with XlsxWriter(path, layout.name, layout.columns) as book:
+            book.write_row(layout.head[0], STYLE_TITLE)
+            book.write_rows(layout.head[1:-1])
+            book.write_row(layout.head[-1], STYLE_HEADER)
+            book.write_rows(self._counted(layout.rows, progress), STYLE_CELL)
+        return str(path)
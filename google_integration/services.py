@@ -0,0 +1,238 @@
+"""
+Общие на процесс credentials и клиенты Google API.
+
+Токен OAuth читается с диска один раз и дальше живёт в памяти, клиенты
+drive/sheets строятся один раз на credentials по встроенным в
+google-api-python-client документам discovery (без запроса к сети).
+Фоновый поток обновляет токен заранее, до истечения срока, чтобы
+выгрузка отчёта не ждала обновления.
+"""
+
+import logging
+import os
+import pickle
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/spreadsheets'
+]
+
+# За сколько секунд до истечения обновлять токен
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", "300"))
+# Как часто фоновый поток проверяет сроки токенов, секунды
+TOKEN_CHECK_INTERVAL_SECONDS = int(os.getenv("GOOGLE_TOKEN_CHECK_INTERVAL", "60"))
+
+
+def build_service(api: str, version: str, credentials):
+    """
+    Построить клиент API по встроенному документу discovery.
+    
+    Клиент не потокобезопасен: для работы из нескольких потоков каждому
+    нужен свой.
+    """
+    return build(api, version, credentials=credentials, static_discovery=True, cache_discovery=False)
+
+
+def _save_token(credentials, token_path: str):
+    """Сохранить токен на диск."""
+    with open(token_path, 'wb') as token:
+        pickle.dump(credentials, token)
+
+
+class TokenMissingError(RuntimeError):
+    """Нет пригодного токена, а вход в браузере запрещён (сервер без GUI)."""
+
+
+def _read_token(token_path: str):
+    """Токен с диска (None - файла нет)."""
+    if not os.path.exists(token_path):
+        return None
+    with open(token_path, 'rb') as token:
+        return pickle.load(token)
+
+
+def has_usable_token(token_path: str) -> bool:
+    """Токен есть и действителен или может быть обновлён без входа в браузере."""
+    credentials = registry.cached_credentials(token_path) or _read_token(token_path)
+    return bool(credentials and (credentials.valid or credentials.refresh_token))
+
+
+def store_token(token_path: str, info: Dict[str, Any]):
+    """
+    Сохранить токен, полученный входом на другой машине (GUI).
+    
+    info - authorized user JSON (Credentials.to_json); файл токена
+    пишется сервером, а не принимается готовым pickle. Credentials в
+    памяти процесса заменяются новыми.
+    
+    Raises:
+        ValueError: В info нет refresh_token, client_id или client_secret
+    """
+    credentials = Credentials.from_authorized_user_info(info, SCOPES)
+    registry.replace_credentials(token_path, credentials)
+
+
+def _load_credentials(client_secret_path: str, token_path: str, interactive: bool = True):
+    """
+    OAuth2 аутентификация: токен с диска, обновление или вход в браузере.
+    
+    Raises:
+        TokenMissingError: Нужен вход в браузере, а interactive=False
+    """
+    credentials = _read_token(token_path)
+    
+    # Если токена нет или он невалиден
+    if not credentials or not credentials.valid:
+        if credentials and credentials.refresh_token:
+            credentials.refresh(Request())
+        elif not interactive:
+            raise TokenMissingError(f"Google token {token_path} is missing or cannot be refreshed; sign in from the GUI")
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(client_secret_path, SCOPES)
+            credentials = flow.run_local_server(port=0)
+        _save_token(credentials, token_path)
+    return credentials
+
+
+def _expires_in(credentials) -> Optional[float]:
+    """Секунд до истечения токена (None - срок неизвестен)."""
+    if credentials.expiry is None:
+        return None
+    # google-auth хранит expiry как наивное время UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (credentials.expiry - now).total_seconds()
+
+
+class GoogleServices:
+    """
+    Кэш OAuth credentials (по файлу токена) и клиентов API (по credentials).
+    
+    Общий замок защищает только словари кэша. Загрузка токена (вход в
+    браузере, обновление по сети) и его обновление идут под замком этого
+    файла токена, поэтому не блокируют service() и cached_credentials()
+    в других потоках.
+    """
+    
+    def __init__(
+        self,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN_SECONDS,
+        check_interval: float = TOKEN_CHECK_INTERVAL_SECONDS
+    ):
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        # Путь к токену -> credentials
+        self._credentials: Dict[str, Any] = {}
+        # Путь к токену -> замок загрузки/обновления этого токена
+        self._token_locks: Dict[str, threading.Lock] = {}
+        # (api, версия, id(credentials), поток) -> (credentials, клиент)
+        self._services: Dict[Tuple[str, str, int, int], Tuple[Any, Any]] = {}
+        self._refresher: Optional[threading.Thread] = None
+    
+    def credentials(self, client_secret_path: str, token_path: str = "token.pickle", interactive: bool = True):
+        """
+        OAuth credentials для файла токена.
+        
+        Первый вызов читает токен (при необходимости обновляет его или
+        открывает вход в браузере) и запускает фоновое обновление,
+        следующие возвращают тот же объект из памяти. С interactive=False
+        (обработчики очереди отчётов на сервере) вход в браузере не
+        открывается: вместо него TokenMissingError.
+        """
+        key = os.path.abspath(token_path)
+        with self._lock:
+            credentials = self._credentials.get(key)
+        if credentials is not None:
+            return credentials
+        
+        with self._token_lock(key):
+            # Другой поток мог загрузить токен, пока этот ждал замка
+            with self._lock:
+                credentials = self._credentials.get(key)
+            if credentials is None:
+                credentials = _load_credentials(client_secret_path, token_path, interactive)
+                with self._lock:
+                    self._credentials[key] = credentials
+                    self._start_refresher()
+            return credentials
+    
+    def replace_credentials(self, token_path: str, credentials):
+        """Сохранить на диск и подставить новые credentials файла токена (после нового входа)."""
+        key = os.path.abspath(token_path)
+        with self._token_lock(key):
+            _save_token(credentials, token_path)
+            with self._lock:
+                self._credentials[key] = credentials
+                self._start_refresher()
+    
+    def cached_credentials(self, token_path: str):
+        """Уже загруженные credentials для файла токена (None - ещё не загружены)."""
+        with self._lock:
+            return self._credentials.get(os.path.abspath(token_path))
+    
+    def service(self, api: str, version: str, credentials):
+        """
+        Клиент API (например, 'drive', 'v3') для этих credentials.
+        
+        Клиенты не потокобезопасны, поэтому кэшируются отдельно для
+        каждого потока: GUI и каждый обработчик очереди отчётов строят
+        свой клиент один раз.
+        """
+        key = (api, version, id(credentials), threading.get_ident())
+        with self._lock:
+            cached = self._services.get(key)
+        # Ключ включает поток: клиента для него строит только этот поток
+        if cached is None or cached[0] is not credentials:
+            cached = (credentials, build_service(api, version, credentials))
+            with self._lock:
+                self._services[key] = cached
+        return cached[1]
+    
+    def refresh_expiring(self):
+        """Обновить токены, срок которых истекает в пределах refresh_margin."""
+        with self._lock:
+            tokens = list(self._credentials.items())
+        for token_path, credentials in tokens:
+            expires_in = _expires_in(credentials)
+            if expires_in is None or expires_in > self.refresh_margin or not credentials.refresh_token:
+                continue
+            try:
+                with self._token_lock(token_path):
+                    # Пока ждали замка, токен могли заменить новым входом
+                    if self.cached_credentials(token_path) is not credentials:
+                        continue
+                    credentials.refresh(Request())
+                    _save_token(credentials, token_path)
+            except Exception:
+                # Повторится на следующей проверке; запрос к API обновит токен сам
+                logger.exception("Failed to refresh Google token %s", token_path)
+    
+    def _token_lock(self, key: str) -> threading.Lock:
+        """Замок загрузки и обновления одного файла токена (key - абсолютный путь)."""
+        with self._lock:
+            return self._token_locks.setdefault(key, threading.Lock())
+    
+    def _start_refresher(self):
+        """Запустить фоновый поток обновления токенов (один на процесс)."""
+        if self._refresher is not None:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name="google-token-refresh", daemon=True)
+        self._refresher.start()
+    
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.refresh_expiring()
+
+
+registry = GoogleServices()
@@ -0,0 +1,74 @@
+"""
+Приёмник отчётов в Google Sheets: файл создаётся через Drive, заполняется через Sheets.
+"""
+
+from datetime import datetime
+from itertools import chain, islice
+from google_integration.google_drive import GoogleDrive
+from google_integration.google_sheets import DEFAULT_ROW_COUNT, WRITE_CHUNK_ROWS, GoogleSheetsClient
+from google_integration.report_sinks import Progress, ReportLayout, ReportSink
+
+
+class SheetsSink(ReportSink):
+    """Отчёт - новая таблица в папке Google Drive."""
+    
+    def __init__(
+        self,
+        client_secret_path: str,
+        folder_id: str,
+        token_path: str = "token.pickle",
+        interactive: bool = True
+    ):
+        self.folder_id = folder_id
+        self.drive = GoogleDrive(client_secret_path, token_path, interactive)
+        # Sheets клиент с OAuth credentials от Drive
+        self.sheets = GoogleSheetsClient(oauth_credentials=self.drive.get_credentials())
+    
+    def write(self, layout: ReportLayout, progress: Progress = None) -> str:
+        """
+        Создать таблицу и записать отчёт: заголовок, анализ и шапку, затем строки.
+        
+        Если строк меньше одной пачки записи, значения уходят в том же
+        batchUpdate, что и оформление. Иначе строки потоково пишутся
+        GoogleSheetsClient.write_rows, а оформление отправляется следом,
+        когда известно число строк.
+        
+        Returns:
+            webViewLink (ссылка для открытия)
+        """
+        name = f"{layout.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        file = self.drive.create_spreadsheet(name, self.folder_id)
+        self.sheets.set_spreadsheet_id(file['id'])
+        # Первый лист новой таблицы
+        sheet_id = 0
+        head = layout.head
+        header_row = layout.header_row
+        rows = iter(layout.rows)
+        first = list(islice(rows, WRITE_CHUNK_ROWS))
+        
+        batch = self.sheets.batch()
+        if len(first) < WRITE_CHUNK_ROWS:
+            count = len(first)
+            total = len(head) + count
+            if total > DEFAULT_ROW_COUNT:
+                batch.resize_sheet(sheet_id, total)
+            batch.update_cells(sheet_id, 0, 0, head + first)
+        else:
+            count = self.sheets.write_rows(chain(first, rows), start_row=len(head), sheet_id=sheet_id, progress=progress)
+            total = len(head) + count
+            # Убрать запас строк, добавленный при расширении листа
+            batch.resize_sheet(sheet_id, total)
+            batch.update_cells(sheet_id, 0, 0, head)
+        # Заголовок
+        batch.repeat_cell(sheet_id, 0, 1, 0, layout.columns,
+            bg_color=(0.2, 0.4, 0.8), text_color=(1, 1, 1), text_bold=True, text_size=14, h_align="CENTER")
+        # Шапка таблицы
+        batch.repeat_cell(sheet_id, header_row, header_row + 1, 0, layout.columns,
+            bg_color=(0.9, 0.9, 0.9), text_bold=True, h_align="CENTER")
+        # Границы
+        batch.update_borders(sheet_id, header_row, total, 0, layout.columns)
+        batch.flush()
+        if progress:
+            progress(count)
+        
+        return file['webViewLink']
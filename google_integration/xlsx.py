@@ -0,0 +1,183 @@
+"""
+Потоковая запись XLSX без внешних зависимостей.
+
+Книга из одного листа пишется в zip по мере поступления строк: XML
+листа сжимается потоком, строки хранятся в ячейках как inline-строки
+(без таблицы sharedStrings), поэтому память не зависит от числа строк.
+Стили - фиксированный набор под оформление отчётов.
+"""
+
+import math
+import re
+import zipfile
+from pathlib import Path
+from typing import Iterable, List, Sequence, Union
+from xml.sax.saxutils import escape
+
+# Индексы стилей ячеек (cellXfs в styles.xml)
+STYLE_DEFAULT = 0
+STYLE_TITLE = 1
+STYLE_HEADER = 2
+STYLE_CELL = 3
+
+# Сколько строк XML копить перед записью в zip
+FLUSH_ROWS = 1000
+
+# Символы, недопустимые в XML 1.0
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Символы, недопустимые в названии листа
+_INVALID_SHEET_NAME = re.compile(r"[\[\]:*?/\\]")
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# Заголовок: жирный 14 белым на синем; шапка: жирный на сером с рамкой;
+# ячейки таблицы: рамка (как оформление отчёта в Google Sheets)
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="3">
+<font><sz val="11"/><name val="Calibri"/></font>
+<font><b/><sz val="14"/><color rgb="FFFFFFFF"/><name val="Calibri"/></font>
+<font><b/><sz val="11"/><name val="Calibri"/></font>
+</fonts>
+<fills count="4">
+<fill><patternFill patternType="none"/></fill>
+<fill><patternFill patternType="gray125"/></fill>
+<fill><patternFill patternType="solid"><fgColor rgb="FF3366CC"/></patternFill></fill>
+<fill><patternFill patternType="solid"><fgColor rgb="FFE6E6E6"/></patternFill></fill>
+</fills>
+<borders count="2">
+<border><left/><right/><top/><bottom/><diagonal/></border>
+<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>
+</borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1" applyAlignment="1"><alignment horizontal="center"/></xf>
+<xf numFmtId="0" fontId="2" fillId="3" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center"/></xf>
+<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1"/>
+</cellXfs>
+</styleSheet>"""
+
+SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<cols><col min="1" max="{columns}" width="{width}" customWidth="1"/></cols>
+<sheetData>"""
+
+SHEET_END = "</sheetData></worksheet>"
+
+
+def column_letter(index: int) -> str:
+    """Буква колонки по индексу (0 -> A, 26 -> AA)."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cell(ref: str, value, style: int) -> str:
+    """XML одной ячейки: числа и bool - значениями, остальное - inline-строкой."""
+    style_attr = f' s="{style}"' if style else ""
+    if value is None or value == "":
+        return f'<c r="{ref}"{style_attr}/>' if style else ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+        return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+    text = _INVALID_XML.sub("", str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+class XlsxWriter:
+    """
+    Книга XLSX из одного листа, строки пишутся по одной.
+    
+    Пример:
+        with XlsxWriter(path, "Отчёт", columns=7) as book:
+            book.write_row(["Заголовок"], style=STYLE_TITLE)
+    """
+    
+    def __init__(self, path: Union[str, Path], sheet_name: str, columns: int, width: float = 18):
+        self.path = Path(path)
+        self.sheet_name = _INVALID_SHEET_NAME.sub("_", sheet_name)[:31]
+        self.columns = columns
+        self.letters = [column_letter(index) for index in range(columns)]
+        self.rows = 0
+        self._zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED)
+        # force_zip64: размер листа заранее неизвестен и может превысить 2 ГиБ
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._buffer: List[str] = [SHEET_START.format(columns=columns, width=width)]
+    
+    def write_row(self, values: Sequence, style: int = STYLE_DEFAULT):
+        """
+        Добавить строку.
+        
+        Со стилем строка дополняется до ширины листа пустыми
+        оформленными ячейками (заливка заголовка на всю ширину).
+        """
+        self.rows += 1
+        row = self.rows
+        count = max(len(values), self.columns) if style else len(values)
+        cells = "".join(
+            _cell(f"{column_letter(index) if index >= self.columns else self.letters[index]}{row}",
+                  values[index] if index < len(values) else None, style)
+            for index in range(count)
+        )
+        self._buffer.append(f'<row r="{row}">{cells}</row>')
+        if len(self._buffer) >= FLUSH_ROWS:
+            self._flush()
+    
+    def write_rows(self, rows: Iterable[Sequence], style: int = STYLE_DEFAULT):
+        """Добавить строки."""
+        for values in rows:
+            self.write_row(values, style)
+    
+    def _flush(self):
+        self._sheet.write("".join(self._buffer).encode("utf-8"))
+        self._buffer = []
+    
+    def close(self):
+        """Дописать лист и служебные части книги."""
+        if self._zip is None:
+            return
+        self._buffer.append(SHEET_END)
+        self._flush()
+        self._sheet.close()
+        self._zip.writestr("[Content_Types].xml", CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", ROOT_RELS)
+        self._zip.writestr("xl/workbook.xml", WORKBOOK.format(name=escape(self.sheet_name, {'"': "&quot;"})))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        self._zip.writestr("xl/styles.xml", STYLES)
+        self._zip.close()
+        self._zip = None
+    
+    def __enter__(self) -> "XlsxWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -2,21 +2,129 @@
 Клиент для работы с API.
 """
 
+import json
+import time
 import requests
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+try:
+    import msgpack
+except ImportError:  # необязательная зависимость: без неё списки идут в JSON
+    msgpack = None
 
 
 class APIClient:
     """Клиент для работы с FastAPI backend."""
     
+    # Размер страницы при выгрузке списков
+    PAGE_SIZE = 500
+    # Сколько ответов с ETag хранить для условных запросов
+    ETAG_CACHE_SIZE = 64
+    # Пауза перед переподключением к потоку событий, секунды
+    EVENTS_RECONNECT_DELAY = 2
+    # Заголовки запроса списков: MessagePack, если установлен пакет msgpack
+    LIST_HEADERS = {'Accept': 'application/msgpack, application/json'} if msgpack else {}
+    
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url.rstrip('/')
+        # Ключ запроса -> (ETag, данные ответа)
+        self._etag_cache: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
     
-    def _get(self, endpoint: str, params: Optional[Dict] = None) -> List[Dict]:
-        """GET запрос."""
-        response = requests.get(f"{self.base_url}{endpoint}", params=params)
+    def _conditional_get(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None
+    ) -> Tuple[requests.Response, Optional[Any]]:
+        """
+        GET с If-None-Match из кэша ответов.
+        
+        Returns:
+            (ответ, закэшированные данные или None, если ответ не 304)
+        """
+        key = f"{endpoint}?{urlencode(sorted((params or {}).items()))}"
+        cached = self._etag_cache.get(key)
+        headers = dict(headers or {})
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        response = requests.get(f"{self.base_url}{endpoint}", params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            self._etag_cache.move_to_end(key)
+            return response, cached[1]
         response.raise_for_status()
-        return response.json()
+        return response, None
+    
+    def _remember(self, endpoint: str, params: Optional[Dict], response: requests.Response, data: Any):
+        """Сохранить данные ответа под его ETag."""
+        etag = response.headers.get('ETag')
+        if not etag:
+            return
+        key = f"{endpoint}?{urlencode(sorted((params or {}).items()))}"
+        self._etag_cache[key] = (etag, data)
+        self._etag_cache.move_to_end(key)
+        while len(self._etag_cache) > self.ETAG_CACHE_SIZE:
+            self._etag_cache.popitem(last=False)
+    
+    @staticmethod
+    def _decode_rows(response: requests.Response) -> List[Dict]:
+        """Разобрать страницу списка (MessagePack или JSON columns) в список словарей."""
+        if response.headers.get('Content-Type', '').startswith('application/msgpack'):
+            page = msgpack.unpackb(response.content)
+        else:
+            page = response.json()
+        if isinstance(page, list):
+            return page
+        columns = page['columns']
+        return [dict(zip(columns, row)) for row in page['rows']]
+    
+    def _get(self, endpoint: str, params: Optional[Dict] = None) -> List[Dict]:
+        """
+        GET запрос списка: постранично пройти по курсорам и собрать все строки.
+        
+        Страницы запрашиваются в колоночном формате (имена полей не
+        повторяются в каждой строке). ETag первой страницы отражает версию
+        всей таблицы, поэтому при ответе 304 возвращается закэшированный
+        список целиком.
+        """
+        params = dict(params or {})
+        params['limit'] = self.PAGE_SIZE
+        params['format'] = 'columns'
+        response, cached = self._conditional_get(endpoint, params, self.LIST_HEADERS)
+        if cached is not None:
+            return list(cached)
+        
+        items = self._decode_rows(response)
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor:
+            for page in self._iter_pages(endpoint, dict(params, cursor=next_cursor)):
+                items.extend(page)
+        self._remember(endpoint, params, response, items)
+        return list(items)
+    
+    def _iter_pages(self, endpoint: str, params: Optional[Dict] = None) -> Iterator[List[Dict]]:
+        """Итератор по страницам списка (keyset-пагинация через X-Next-Cursor)."""
+        params = dict(params or {})
+        params['limit'] = self.PAGE_SIZE
+        params['format'] = 'columns'
+        while True:
+            response = requests.get(f"{self.base_url}{endpoint}", params=params, headers=self.LIST_HEADERS)
+            response.raise_for_status()
+            yield self._decode_rows(response)
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params['cursor'] = next_cursor
+    
+    def _get_json(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
+        """GET запрос одного объекта (условный, по ETag)."""
+        response, cached = self._conditional_get(endpoint, params)
+        if cached is not None:
+            return dict(cached)
+        data = response.json()
+        self._remember(endpoint, params, response, data)
+        return dict(data)
     
     def _post(self, endpoint: str, data: Dict) -> Dict:
         """POST запрос."""
@@ -35,7 +143,71 @@ class APIClient:
         response = requests.delete(f"{self.base_url}{endpoint}/{item_id}")
         response.raise_for_status()
     
-    # Клиенты
+    # Пакет операций
+    def batch(self, operations: List[Dict]) -> Dict:
+        """
+        Выполнить операции одним запросом и одной транзакцией.
+        
+        Пример: [{'op': 'create', 'entity': 'clients', 'ref': 'c', 'data': {...}},
+                 {'op': 'create', 'entity': 'deals', 'data': {'title': ..., 'client_id': '$c'}}]
+        """
+        return self._post("/api/batch", {'operations': operations})
+    
+    # Журнал изменений
+    def get_changes(self, since: int = 0, limit: int = 500, entity: Optional[str] = None) -> Dict:
+        """Получить изменения после since (страница: changes, last_seq, has_more)."""
+        params = {'since': since, 'limit': limit}
+        if entity:
+            params['entity'] = entity
+        response = requests.get(f"{self.base_url}/api/changes", params=params)
+        response.raise_for_status()
+        return response.json()
+    
+    # Поток событий
+    def iter_events(self, since: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Подписка на /api/events с автоматическим переподключением.
+        
+        После обрыва переподключается с Last-Event-ID, сервер досылает
+        пропущенное из журнала изменений.
+        
+        Args:
+            since: Начать с изменений после этого seq (None - только новые)
+        
+        Yields:
+            {'event': 'open' | 'change' | 'resync' | 'closed', 'data': {...}}
+        """
+        last_id = since
+        while True:
+            headers = {'Last-Event-ID': str(last_id)} if last_id is not None else None
+            try:
+                with requests.get(f"{self.base_url}/api/events", headers=headers, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    yield {'event': 'open', 'data': {}}
+                    event, event_id, data = None, None, []
+                    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                        if line:
+                            field, _, value = line.partition(':')
+                            if value.startswith(' '):
+                                value = value[1:]
+                            if field == 'event':
+                                event = value
+                            elif field == 'id':
+                                event_id = value
+                            elif field == 'data':
+                                data.append(value)
+                            continue
+                        # Пустая строка завершает событие
+                        if data:
+                            if event_id and event_id.isdigit():
+                                last_id = int(event_id)
+                            yield {'event': event or 'message', 'data': json.loads("\n".join(data))}
+                        event, event_id, data = None, None, []
+            except (requests.RequestException, ValueError):
+                pass
+            yield {'event': 'closed', 'data': {}}
+            time.sleep(self.EVENTS_RECONNECT_DELAY)
+    
     def get_clients(self, q: Optional[str] = None, status: Optional[str] = None) -> List[Dict]:
         """Получить список клиентов."""
         params = {}
@@ -45,11 +217,18 @@ class APIClient:
             params['status'] = status
         return self._get("/api/clients", params)
     
+    def get_clients_stats(self, q: Optional[str] = None, status: Optional[str] = None) -> Dict:
+        """Получить агрегаты по клиентам (считаются на сервере)."""
+        params = {}
+        if q:
+            params['q'] = q
+        if status:
+            params['status'] = status
+        return self._get_json("/api/stats/clients", params)
+    
     def get_client(self, client_id: int) -> Dict:
         """Получить клиента по ID."""
-        response = requests.get(f"{self.base_url}/api/clients/{client_id}")
-        response.raise_for_status()
-        return response.json()
+        return self._get_json(f"/api/clients/{client_id}")
     
     def create_client(self, client: Dict) -> Dict:
         """Создать клиента."""
@@ -64,8 +243,14 @@ class APIClient:
         self._delete("/api/clients", client_id)
     
     # Сделки
-    def get_deals(self, q: Optional[str] = None, status: Optional[str] = None, client_id: Optional[int] = None) -> List[Dict]:
-        """Получить список сделок."""
+    def get_deals(
+        self,
+        q: Optional[str] = None,
+        status: Optional[str] = None,
+        client_id: Optional[int] = None,
+        include: Optional[str] = None
+    ) -> List[Dict]:
+        """Получить список сделок (include='client' - вложить клиента в каждую сделку)."""
         params = {}
         if q:
             params['q'] = q
@@ -73,13 +258,24 @@ class APIClient:
             params['status'] = status
         if client_id:
             params['client_id'] = client_id
+        if include:
+            params['include'] = include
         return self._get("/api/deals", params)
     
+    def get_deals_stats(self, q: Optional[str] = None, status: Optional[str] = None, client_id: Optional[int] = None) -> Dict:
+        """Получить агрегаты по сделкам (считаются на сервере)."""
+        params = {}
+        if q:
+            params['q'] = q
+        if status:
+            params['status'] = status
+        if client_id:
+            params['client_id'] = client_id
+        return self._get_json("/api/stats/deals", params)
+    
     def get_deal(self, deal_id: int) -> Dict:
         """Получить сделку по ID."""
-        response = requests.get(f"{self.base_url}/api/deals/{deal_id}")
-        response.raise_for_status()
-        return response.json()
+        return self._get_json(f"/api/deals/{deal_id}")
     
     def create_deal(self, deal: Dict) -> Dict:
         """Создать сделку."""
@@ -94,8 +290,15 @@ class APIClient:
         self._delete("/api/deals", deal_id)
     
     # Задачи
-    def get_tasks(self, q: Optional[str] = None, is_done: Optional[bool] = None, client_id: Optional[int] = None, deal_id: Optional[int] = None) -> List[Dict]:
-        """Получить список задач."""
+    def get_tasks(
+        self,
+        q: Optional[str] = None,
+        is_done: Optional[bool] = None,
+        client_id: Optional[int] = None,
+        deal_id: Optional[int] = None,
+        include: Optional[str] = None
+    ) -> List[Dict]:
+        """Получить список задач (include='client,deal' - вложить связанные записи)."""
         params = {}
         if q:
             params['q'] = q
@@ -105,13 +308,26 @@ class APIClient:
             params['client_id'] = client_id
         if deal_id:
             params['deal_id'] = deal_id
+        if include:
+            params['include'] = include
         return self._get("/api/tasks", params)
     
+    def get_tasks_stats(self, q: Optional[str] = None, is_done: Optional[bool] = None, client_id: Optional[int] = None, deal_id: Optional[int] = None) -> Dict:
+        """Получить агрегаты по задачам (считаются на сервере)."""
+        params = {}
+        if q:
+            params['q'] = q
+        if is_done is not None:
+            params['is_done'] = is_done
+        if client_id:
+            params['client_id'] = client_id
+        if deal_id:
+            params['deal_id'] = deal_id
+        return self._get_json("/api/stats/tasks", params)
+    
     def get_task(self, task_id: int) -> Dict:
         """Получить задачу по ID."""
-        response = requests.get(f"{self.base_url}/api/tasks/{task_id}")
-        response.raise_for_status()
-        return response.json()
+        return self._get_json(f"/api/tasks/{task_id}")
     
     def create_task(self, task: Dict) -> Dict:
         """Создать задачу."""
@@ -124,4 +340,54 @@ class APIClient:
     def delete_task(self, task_id: int):
         """Удалить задачу."""
         self._delete("/api/tasks", task_id)
-
+    
+    # Отчёты
+    def create_report(
+        self,
+        entity: str,
+        folder_id: Optional[str] = None,
+        report_format: str = "sheets",
+        **filters
+    ) -> Dict:
+        """
+        Поставить отчёт в очередь на сервере.
+        
+        Args:
+            entity: clients, deals или tasks
+            folder_id: Папка Drive (по умолчанию - из настроек сервера)
+            report_format: sheets, xlsx или csv (файл - по download_report)
+            filters: Фильтры списка (q, status, is_done, client_id, deal_id)
+        
+        Returns:
+            Задание (id, status, progress, ...)
+        """
+        data = {key: value for key, value in filters.items() if value is not None}
+        data['format'] = report_format
+        if folder_id:
+            data['folder_id'] = folder_id
+        return self._post(f"/api/reports/{entity}", data)
+    
+    def get_report_job(self, job_id: int) -> Dict:
+        """Получить статус задания отчёта (link - когда status == 'done')."""
+        response = requests.get(f"{self.base_url}/api/reports/jobs/{job_id}")
+        response.raise_for_status()
+        return response.json()
+    
+    def upload_google_token(self, token: Dict) -> None:
+        """
+        Передать серверу токен Google после входа в GUI.
+        
+        Args:
+            token: Authorized user JSON (json.loads(credentials.to_json()))
+        """
+        response = requests.put(f"{self.base_url}/api/reports/google-token", json=token)
+        response.raise_for_status()
+    
+    def download_report(self, job_id: int, path: str) -> str:
+        """Скачать файл готового отчёта xlsx/csv в path."""
+        with requests.get(f"{self.base_url}/api/reports/jobs/{job_id}/file", stream=True) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    f.write(chunk)
+        return path
@@ -2,18 +2,34 @@
 Главное окно GUI приложения CRM.
 """
 
+import json
+import os
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import webbrowser
 from typing import Optional
+import requests
 from gui.api_client import APIClient
 from gui.google_settings import GoogleSettingsTab
-from google_integration.report_generator import ReportGenerator
 
 
 class CRMGUI:
     """Главное окно приложения CRM."""
     
+    # Период разбора событий с сервера, мс
+    EVENTS_POLL_MS = 200
+    # Больше изменений за один разбор - перечитать таблицы вместо правки строк
+    EVENTS_RESYNC_THRESHOLD = 500
+    # Период опроса статуса задания отчёта, мс
+    REPORT_POLL_MS = 1000
+    # Через сколько перечитать вкладку после изменений, если на ней
+    # включены сортировка или поиск, мс (серия изменений - одно чтение)
+    EVENTS_REFRESH_DELAY_MS = 500
+    # Форматы отчёта: подпись в списке -> format для POST /api/reports
+    REPORT_FORMATS = {"Google Sheets": "sheets", "XLSX": "xlsx", "CSV": "csv"}
+    
     def __init__(self, root: tk.Tk):
         self.root = root
         self.root.title("Mini-CRM")
@@ -21,6 +37,8 @@ class CRMGUI:
         
         self.api_client = APIClient()
         self.google_settings_tab = None
+        # Формат отчёта, общий для всех вкладок
+        self.report_format_var = tk.StringVar(value="Google Sheets")
         
         # Состояние сортировки для каждой таблицы
         self.clients_sort_column = None
@@ -47,6 +65,15 @@ class CRMGUI:
         
         # Обновить данные при запуске
         self.refresh_all()
+        
+        # Изменения с сервера: фоновый поток слушает /api/events,
+        # главный поток применяет их к таблицам
+        self.events_connected = False
+        self._events = queue.Queue()
+        # Вкладки, для которых уже запланировано перечитывание
+        self._pending_refresh = set()
+        threading.Thread(target=self._listen_events, daemon=True).start()
+        self.root.after(self.EVENTS_POLL_MS, self._poll_events)
     
     def _create_clients_tab(self) -> tk.Frame:
         """Создать вкладку клиентов."""
@@ -61,6 +88,7 @@ class CRMGUI:
         tk.Button(control_frame, text="Редактировать", command=self.edit_client).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Удалить", command=self.delete_client).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Выгрузить отчет", command=self.export_clients_report, bg="#4CAF50", fg="white").pack(side=tk.RIGHT, padx=5)
+        self._report_format_combo(control_frame).pack(side=tk.RIGHT, padx=5)
         
         # Поиск
         search_frame = tk.Frame(frame)
@@ -121,6 +149,7 @@ class CRMGUI:
         tk.Button(control_frame, text="Редактировать", command=self.edit_deal).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Удалить", command=self.delete_deal).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Выгрузить отчет", command=self.export_deals_report, bg="#4CAF50", fg="white").pack(side=tk.RIGHT, padx=5)
+        self._report_format_combo(control_frame).pack(side=tk.RIGHT, padx=5)
         
         # Поиск
         search_frame = tk.Frame(frame)
@@ -181,6 +210,7 @@ class CRMGUI:
         tk.Button(control_frame, text="Редактировать", command=self.edit_task).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Удалить", command=self.delete_task).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Выгрузить отчет", command=self.export_tasks_report, bg="#4CAF50", fg="white").pack(side=tk.RIGHT, padx=5)
+        self._report_format_combo(control_frame).pack(side=tk.RIGHT, padx=5)
         
         # Поиск
         search_frame = tk.Frame(frame)
@@ -227,6 +257,16 @@ class CRMGUI:
         
         return frame
     
+    def _report_format_combo(self, parent: tk.Frame) -> ttk.Combobox:
+        """Список выбора формата отчёта рядом с кнопкой выгрузки."""
+        return ttk.Combobox(
+            parent,
+            textvariable=self.report_format_var,
+            values=list(self.REPORT_FORMATS),
+            state="readonly",
+            width=14
+        )
+    
     def _create_settings_tab(self) -> tk.Frame:
         """Создать вкладку настроек."""
         frame = GoogleSettingsTab(self.notebook)
@@ -243,6 +283,19 @@ class CRMGUI:
             self.clients_sort_reverse = False
         self.refresh_clients()
     
+    @staticmethod
+    def _client_row(client: dict) -> tuple:
+        """Значения строки таблицы клиентов."""
+        return (
+            client.get('id'),
+            client.get('name', ''),
+            client.get('email', ''),
+            client.get('phone', ''),
+            client.get('company', ''),
+            client.get('status', ''),
+            client.get('created_at', '')
+        )
+    
     def refresh_clients(self, q: Optional[str] = None):
         """Обновить список клиентов."""
         try:
@@ -267,15 +320,7 @@ class CRMGUI:
                     clients.sort(key=column_map[self.clients_sort_column], reverse=self.clients_sort_reverse)
             
             for client in clients:
-                tree.insert("", tk.END, values=(
-                    client.get('id'),
-                    client.get('name', ''),
-                    client.get('email', ''),
-                    client.get('phone', ''),
-                    client.get('company', ''),
-                    client.get('status', ''),
-                    client.get('created_at', '')
-                ))
+                tree.insert("", tk.END, iid=str(client['id']), values=self._client_row(client))
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить клиентов: {e}")
     
@@ -285,7 +330,7 @@ class CRMGUI:
         if dialog.result:
             try:
                 self.api_client.create_client(dialog.result)
-                self.refresh_clients()
+                self._after_change('clients')
                 messagebox.showinfo("Успех", "Клиент добавлен")
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось добавить клиента: {e}")
@@ -307,7 +352,7 @@ class CRMGUI:
             dialog = ClientDialog(self.root, "Редактировать клиента", client)
             if dialog.result:
                 self.api_client.update_client(client_id, dialog.result)
-                self.refresh_clients()
+                self._after_change('clients')
                 messagebox.showinfo("Успех", "Клиент обновлен")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось обновить клиента: {e}")
@@ -328,29 +373,14 @@ class CRMGUI:
         
         try:
             self.api_client.delete_client(client_id)
-            self.refresh_clients()
+            self._after_change('clients')
             messagebox.showinfo("Успех", "Клиент удален")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить клиента: {e}")
     
     def export_clients_report(self):
         """Экспортировать отчет по клиентам."""
-        try:
-            settings = self.google_settings_tab.get_settings()
-            if not settings.get('client_secret_path') or not settings.get('folder_id'):
-                messagebox.showerror("Ошибка", "Настройте Google интеграцию в разделе Настройки")
-                return
-            
-            clients = self.api_client.get_clients()
-            generator = ReportGenerator(
-                settings['client_secret_path'],
-                settings['folder_id']
-            )
-            link = generator.export_clients_report(clients)
-            messagebox.showinfo("Успех", f"Отчет создан!\nОткрыть в браузере?")
-            webbrowser.open(link)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось создать отчет: {e}")
+        self._start_report("clients")
     
     # Методы для работы со сделками
     def _sort_deals(self, column: str):
@@ -362,6 +392,19 @@ class CRMGUI:
             self.deals_sort_reverse = False
         self.refresh_deals()
     
+    @staticmethod
+    def _deal_row(deal: dict) -> tuple:
+        """Значения строки таблицы сделок."""
+        return (
+            deal.get('id'),
+            deal.get('title', ''),
+            deal.get('amount', 0),
+            deal.get('currency', ''),
+            deal.get('status', ''),
+            deal.get('client_id', ''),
+            deal.get('created_at', '')
+        )
+    
     def refresh_deals(self, q: Optional[str] = None):
         """Обновить список сделок."""
         try:
@@ -386,15 +429,7 @@ class CRMGUI:
                     deals.sort(key=column_map[self.deals_sort_column], reverse=self.deals_sort_reverse)
             
             for deal in deals:
-                tree.insert("", tk.END, values=(
-                    deal.get('id'),
-                    deal.get('title', ''),
-                    deal.get('amount', 0),
-                    deal.get('currency', ''),
-                    deal.get('status', ''),
-                    deal.get('client_id', ''),
-                    deal.get('created_at', '')
-                ))
+                tree.insert("", tk.END, iid=str(deal['id']), values=self._deal_row(deal))
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить сделки: {e}")
     
@@ -404,7 +439,7 @@ class CRMGUI:
         if dialog.result:
             try:
                 self.api_client.create_deal(dialog.result)
-                self.refresh_deals()
+                self._after_change('deals')
                 messagebox.showinfo("Успех", "Сделка добавлена")
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось добавить сделку: {e}")
@@ -426,7 +461,7 @@ class CRMGUI:
             dialog = DealDialog(self.root, "Редактировать сделку", deal)
             if dialog.result:
                 self.api_client.update_deal(deal_id, dialog.result)
-                self.refresh_deals()
+                self._after_change('deals')
                 messagebox.showinfo("Успех", "Сделка обновлена")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось обновить сделку: {e}")
@@ -447,29 +482,14 @@ class CRMGUI:
         
         try:
             self.api_client.delete_deal(deal_id)
-            self.refresh_deals()
+            self._after_change('deals')
             messagebox.showinfo("Успех", "Сделка удалена")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить сделку: {e}")
     
     def export_deals_report(self):
         """Экспортировать отчет по сделкам."""
-        try:
-            settings = self.google_settings_tab.get_settings()
-            if not settings.get('client_secret_path') or not settings.get('folder_id'):
-                messagebox.showerror("Ошибка", "Настройте Google интеграцию в разделе Настройки")
-                return
-            
-            deals = self.api_client.get_deals()
-            generator = ReportGenerator(
-                settings['client_secret_path'],
-                settings['folder_id']
-            )
-            link = generator.export_deals_report(deals)
-            messagebox.showinfo("Успех", f"Отчет создан!\nОткрыть в браузере?")
-            webbrowser.open(link)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось создать отчет: {e}")
+        self._start_report("deals")
     
     # Методы для работы с задачами
     def _sort_tasks(self, column: str):
@@ -481,6 +501,19 @@ class CRMGUI:
             self.tasks_sort_reverse = False
         self.refresh_tasks()
     
+    @staticmethod
+    def _task_row(task: dict) -> tuple:
+        """Значения строки таблицы задач."""
+        return (
+            task.get('id'),
+            task.get('title', ''),
+            task.get('description', '')[:50] + '...' if task.get('description') and len(task.get('description', '')) > 50 else task.get('description', ''),
+            task.get('due_date', ''),
+            "Да" if task.get('is_done') else "Нет",
+            task.get('client_id', ''),
+            task.get('deal_id', '')
+        )
+    
     def refresh_tasks(self, q: Optional[str] = None):
         """Обновить список задач."""
         try:
@@ -505,15 +538,7 @@ class CRMGUI:
                     tasks.sort(key=column_map[self.tasks_sort_column], reverse=self.tasks_sort_reverse)
             
             for task in tasks:
-                tree.insert("", tk.END, values=(
-                    task.get('id'),
-                    task.get('title', ''),
-                    task.get('description', '')[:50] + '...' if task.get('description') and len(task.get('description', '')) > 50 else task.get('description', ''),
-                    task.get('due_date', ''),
-                    "Да" if task.get('is_done') else "Нет",
-                    task.get('client_id', ''),
-                    task.get('deal_id', '')
-                ))
+                tree.insert("", tk.END, iid=str(task['id']), values=self._task_row(task))
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить задачи: {e}")
     
@@ -523,7 +548,7 @@ class CRMGUI:
         if dialog.result:
             try:
                 self.api_client.create_task(dialog.result)
-                self.refresh_tasks()
+                self._after_change('tasks')
                 messagebox.showinfo("Успех", "Задача добавлена")
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось добавить задачу: {e}")
@@ -545,7 +570,7 @@ class CRMGUI:
             dialog = TaskDialog(self.root, "Редактировать задачу", task)
             if dialog.result:
                 self.api_client.update_task(task_id, dialog.result)
-                self.refresh_tasks()
+                self._after_change('tasks')
                 messagebox.showinfo("Успех", "Задача обновлена")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось обновить задачу: {e}")
@@ -566,35 +591,237 @@ class CRMGUI:
         
         try:
             self.api_client.delete_task(task_id)
-            self.refresh_tasks()
+            self._after_change('tasks')
             messagebox.showinfo("Успех", "Задача удалена")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось удалить задачу: {e}")
     
     def export_tasks_report(self):
         """Экспортировать отчет по задачам."""
+        self._start_report("tasks")
+    
+    def _start_report(self, entity: str):
+        """
+        Поставить отчёт в очередь на сервере.
+        
+        Отчёт формируется сервером (POST /api/reports/...), окно не
+        блокируется: статус задания опрашивается через root.after.
+        Файлы XLSX/CSV не требуют настроек Google и скачиваются по готовности.
+        """
+        report_format = self.REPORT_FORMATS[self.report_format_var.get()]
         try:
-            settings = self.google_settings_tab.get_settings()
-            if not settings.get('client_secret_path') or not settings.get('folder_id'):
-                messagebox.showerror("Ошибка", "Настройте Google интеграцию в разделе Настройки")
-                return
-            
-            tasks = self.api_client.get_tasks()
-            generator = ReportGenerator(
-                settings['client_secret_path'],
-                settings['folder_id']
-            )
-            link = generator.export_tasks_report(tasks)
-            messagebox.showinfo("Успех", f"Отчет создан!\nОткрыть в браузере?")
-            webbrowser.open(link)
+            if report_format != "sheets":
+                job = self.api_client.create_report(entity, report_format=report_format)
+            else:
+                job = self._start_sheets_report(entity)
+                if job is None:
+                    return
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось создать отчет: {e}")
+            return
+        self.root.title("Mini-CRM - отчет в очереди")
+        self.root.after(self.REPORT_POLL_MS, self._poll_report, job['id'], report_format)
+    
+    def _start_sheets_report(self, entity: str) -> Optional[dict]:
+        """
+        Поставить отчёт в Google Sheets; при необходимости войти в Google.
+        
+        Returns:
+            Задание или None, если пользователь отказался от входа
+        """
+        settings = self.google_settings_tab.get_settings()
+        if not settings.get('client_secret_path') or not settings.get('folder_id'):
+            messagebox.showerror("Ошибка", "Настройте Google интеграцию в разделе Настройки")
+            return None
+        
+        try:
+            return self.api_client.create_report(entity, folder_id=settings['folder_id'])
+        except requests.HTTPError as e:
+            # Сервер не открывает вход в Google сам: войти здесь и повторить
+            if not self._sign_in_required(e):
+                raise
+        if not messagebox.askyesno("Google", "Нужно войти в Google. Открыть вход в браузере?"):
+            return None
+        self._google_sign_in(settings['client_secret_path'])
+        try:
+            return self.api_client.create_report(entity, folder_id=settings['folder_id'])
+        except requests.HTTPError as e:
+            if not self._sign_in_required(e):
+                raise
+            raise RuntimeError(
+                "сервер не принял токен Google после входа. Проверьте GOOGLE_TOKEN_PATH "
+                "на сервере: каталог токена должен быть доступен на запись"
+            ) from e
+    
+    @staticmethod
+    def _sign_in_required(error: requests.HTTPError) -> bool:
+        """Сервер отклонил отчёт, потому что у него нет токена Google."""
+        return error.response is not None and error.response.status_code == 400 and "sign-in" in error.response.text
+    
+    def _google_sign_in(self, client_secret_path: str):
+        """
+        Вход в Google в браузере и передача токена серверу.
+        
+        Токен сохраняется и локально (GOOGLE_TOKEN_PATH), а серверу
+        отправляется через PUT /api/reports/google-token: общий файл
+        токена у GUI и сервера не нужен (Docker, другая машина).
+        """
+        from google_integration.services import registry
+        
+        credentials = registry.credentials(client_secret_path, os.getenv("GOOGLE_TOKEN_PATH", "token.pickle"))
+        self.api_client.upload_google_token(json.loads(credentials.to_json()))
+    
+    def _poll_report(self, job_id: int, report_format: str = "sheets"):
+        """Проверить задание отчёта; по готовности открыть ссылку или сохранить файл."""
+        try:
+            job = self.api_client.get_report_job(job_id)
+        except Exception as e:
+            self.root.title("Mini-CRM")
+            messagebox.showerror("Ошибка", f"Не удалось получить статус отчета: {e}")
+            return
+        
+        if job['status'] == 'done':
+            self.root.title("Mini-CRM")
+            if report_format == "sheets":
+                messagebox.showinfo("Успех", f"Отчет создан!\nОткрыть в браузере?")
+                webbrowser.open(job['link'])
+            else:
+                self._save_report_file(job, report_format)
+        elif job['status'] == 'failed':
+            self.root.title("Mini-CRM")
+            messagebox.showerror("Ошибка", f"Не удалось создать отчет: {job['error']}")
+        else:
+            total = job['total'] if job['total'] is not None else "?"
+            self.root.title(f"Mini-CRM - выгрузка отчета: {job['progress']}/{total} строк")
+            self.root.after(self.REPORT_POLL_MS, self._poll_report, job_id, report_format)
+    
+    def _save_report_file(self, job: dict, report_format: str):
+        """Скачать готовый файл отчёта в место, выбранное пользователем."""
+        path = filedialog.asksaveasfilename(
+            title="Сохранить отчет",
+            defaultextension=f".{report_format}",
+            initialfile=f"{job['entity']}_{job['id']}.{report_format}",
+            filetypes=[(report_format.upper(), f"*.{report_format}")]
+        )
+        if not path:
+            return
+        try:
+            self.api_client.download_report(job['id'], path)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось скачать отчет: {e}")
+            return
+        messagebox.showinfo("Успех", f"Отчет сохранен: {path}")
+    
+    def _after_change(self, entity: str):
+        """
+        Обновить таблицу после изменения.
+        
+        При подключённом потоке событий строка обновится по событию,
+        перечитывать таблицу не нужно.
+        """
+        if not self.events_connected:
+            self._refresh_tab(entity)
+    
+    def _listen_events(self):
+        """Фоновый поток: читать /api/events и складывать изменения в очередь."""
+        connected_before = False
+        for event in self.api_client.iter_events():
+            kind, data = event['event'], event['data']
+            if kind == 'open':
+                self.events_connected = True
+                # Изменения между первой загрузкой и подпиской: перечитать
+                # (по ETag это дешёвые 304, если ничего не менялось)
+                if not connected_before:
+                    self._events.put(('resync', None, None))
+                connected_before = True
+            elif kind == 'closed':
+                self.events_connected = False
+            elif kind == 'resync':
+                self._events.put(('resync', None, None))
+            elif kind == 'change' and data.get('entity') in ('clients', 'deals', 'tasks'):
+                # Текущая строка приходит в самом событии (None - запись удалена),
+                # отдельный запрос на каждую запись не нужен
+                row = data.get('row') if data['op'] != 'delete' else None
+                self._events.put((data['entity'], data['entity_id'], row))
+    
+    def _poll_events(self):
+        """
+        Применить накопленные изменения к таблицам (главный поток).
+        
+        После массовой операции (больше EVENTS_RESYNC_THRESHOLD изменений)
+        таблицы перечитываются целиком: это дешевле, чем править тысячи строк.
+        """
+        changes = []
+        try:
+            while True:
+                changes.append(self._events.get_nowait())
+        except queue.Empty:
+            pass
+        if len(changes) > self.EVENTS_RESYNC_THRESHOLD or any(change[0] == 'resync' for change in changes):
+            self.refresh_all()
+        else:
+            for entity, entity_id, row in changes:
+                self._apply_change(entity, entity_id, row)
+        self.root.after(self.EVENTS_POLL_MS, self._poll_events)
+    
+    def _entity_tab(self, entity: str) -> tuple:
+        """Вкладка, таблица, функция строки таблицы и метод обновления сущности."""
+        return {
+            'clients': (self.clients_tab, self.clients_tab.clients_tree, self._client_row, self.refresh_clients),
+            'deals': (self.deals_tab, self.deals_tab.deals_tree, self._deal_row, self.refresh_deals),
+            'tasks': (self.tasks_tab, self.tasks_tab.tasks_tree, self._task_row, self.refresh_tasks)
+        }[entity]
+    
+    def _apply_change(self, entity: str, entity_id: int, row: Optional[dict]):
+        """
+        Обновить одну строку таблицы на месте.
+        
+        Без сортировки и поиска таблица идёт по id по убыванию, и новая
+        запись встаёт первой. Если на вкладке включены сортировка или
+        поиск, место строки и то, подходит ли она под поиск, знает только
+        сервер: вкладка перечитывается (один раз на серию изменений).
+        
+        Args:
+            entity: clients, deals или tasks
+            entity_id: ID записи
+            row: Новые данные записи или None, если запись удалена
+        """
+        tab, tree, make_row, _ = self._entity_tab(entity)
+        iid = str(entity_id)
+        
+        if row is None:
+            if tree.exists(iid):
+                tree.delete(iid)
+            return
+        if tree.exists(iid):
+            tree.item(iid, values=make_row(row))
+        
+        if tab.search_entry.get() or getattr(self, f"{entity}_sort_column"):
+            self._schedule_refresh(entity)
+        elif not tree.exists(iid):
+            tree.insert("", 0, iid=iid, values=make_row(row))
+    
+    def _schedule_refresh(self, entity: str):
+        """Перечитать вкладку через EVENTS_REFRESH_DELAY_MS, если это ещё не запланировано."""
+        if entity in self._pending_refresh:
+            return
+        self._pending_refresh.add(entity)
+        
+        def refresh():
+            self._pending_refresh.discard(entity)
+            self._refresh_tab(entity)
+        
+        self.root.after(self.EVENTS_REFRESH_DELAY_MS, refresh)
+    
+    def _refresh_tab(self, entity: str):
+        """Перечитать вкладку с текущим текстом поиска (сортировку применяет refresh_*)."""
+        tab, _, _, refresh = self._entity_tab(entity)
+        refresh(tab.search_entry.get() or None)
     
     def refresh_all(self):
-        """Обновить все вкладки."""
-        self.refresh_clients()
-        self.refresh_deals()
-        self.refresh_tasks()
+        """Обновить все вкладки (с текущим текстом поиска на каждой)."""
+        for entity in ('clients', 'deals', 'tasks'):
+            self._refresh_tab(entity)
 
 
 # Диалоги для ввода данных
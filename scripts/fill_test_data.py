@@ -1,106 +1,340 @@
 """
 Скрипт для заполнения БД тестовыми данными.
+
+Два режима:
+- через API (по умолчанию): пачки через POST /api/{entity}/bulk;
+- --direct: прямая запись в файл SQLite. Данные генерируют параллельные
+  процессы, основной процесс пишет их executemany большими
+  транзакциями. Вторичные индексы и триггеры (поиск, версии, журнал
+  изменений) на время загрузки снимаются и восстанавливаются в конце,
+  FTS-индексы перестраиваются целиком. Сервер на это время лучше
+  остановить.
 """
 
 import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
 import requests
 from faker import Faker
 import random
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.migrations import migrate
 
 fake = Faker('ru_RU')
 
 
-def create_client(base_url: str) -> int:
-    """Создать клиента."""
-    client = {
+def fake_client() -> dict:
+    """Сгенерировать клиента."""
+    return {
         'name': fake.name(),
         'email': fake.email(),
         'phone': fake.phone_number(),
         'company': fake.company() if random.random() > 0.3 else None,
         'status': random.choice(['active', 'archived'])
     }
-    response = requests.post(f"{base_url}/api/clients", json=client)
-    response.raise_for_status()
-    return response.json()['id']
 
 
-def create_deal(base_url: str, client_id: Optional[int] = None) -> int:
-    """Создать сделку."""
-    deal = {
+def fake_deal(client_id: Optional[int] = None) -> dict:
+    """Сгенерировать сделку."""
+    return {
         'title': f"Сделка {fake.word().capitalize()}",
         'amount': round(random.uniform(10000, 1000000), 2),
         'currency': random.choice(['RUB', 'USD', 'EUR']),
         'status': random.choice(['new', 'in_progress', 'closed', 'cancelled']),
-        'client_id': client_id if client_id else (random.randint(1, 100) if random.random() > 0.2 else None)
+        'client_id': client_id
     }
-    response = requests.post(f"{base_url}/api/deals", json=deal)
-    response.raise_for_status()
-    return response.json()['id']
 
 
-def create_task(base_url: str, client_id: Optional[int] = None, deal_id: Optional[int] = None) -> int:
-    """Создать задачу."""
-    task = {
+def fake_task(client_id: Optional[int] = None, deal_id: Optional[int] = None) -> dict:
+    """Сгенерировать задачу."""
+    return {
         'title': fake.sentence(nb_words=4)[:-1],
         'description': fake.text(max_nb_chars=200) if random.random() > 0.3 else None,
         'due_date': (datetime.now() + timedelta(days=random.randint(-30, 60))).strftime('%Y-%m-%d') if random.random() > 0.3 else None,
         'is_done': random.choice([True, False]),
-        'client_id': client_id if client_id else (random.randint(1, 100) if random.random() > 0.3 else None),
-        'deal_id': deal_id if deal_id else (random.randint(1, 100) if random.random() > 0.5 else None)
+        'client_id': client_id,
+        'deal_id': deal_id
     }
-    response = requests.post(f"{base_url}/api/tasks", json=task)
+
+
+def bulk_create(base_url: str, entity: str, items: List[dict]) -> List[int]:
+    """Создать пачку записей одним запросом (одна транзакция на сервере)."""
+    response = requests.post(f"{base_url}/api/{entity}/bulk", json={'create': items})
     response.raise_for_status()
-    return response.json()['id']
+    return response.json()['created_ids']
+
+
+def create_batched(base_url: str, entity: str, title: str, n: int, batch_size: int, make_item) -> List[int]:
+    """Создать n записей пачками по batch_size."""
+    print(f"Создание {n} {title}...")
+    ids = []
+    for start in range(0, n, batch_size):
+        items = [make_item() for _ in range(min(batch_size, n - start))]
+        try:
+            ids.extend(bulk_create(base_url, entity, items))
+            print(f"  Создано {len(ids)}/{n} {title}")
+        except Exception as e:
+            print(f"  Ошибка при создании {title} {start + 1}-{start + len(items)}: {e}")
+    return ids
+
+
+# ===== ПРЯМАЯ ЗАПИСЬ В SQLITE =====
+
+INSERT_SQL = {
+    "clients": """
+        INSERT INTO clients (id, name, email, phone, company, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    "deals": """
+        INSERT INTO deals (id, title, amount, currency, status, client_id, close_date, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    "tasks": """
+        INSERT INTO tasks (id, title, description, due_date, is_done, client_id, deal_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+}
+
+# Задание процессу-генератору: (сущность, первый id, количество,
+# диапазон id клиентов, диапазон id сделок, зерно)
+Chunk = Tuple[str, int, int, Tuple[int, int], Tuple[int, int], int]
+
+
+# Faker медленный (тысячи строк в секунду), поэтому для прямой записи
+# каждый процесс один раз генерирует наборы значений, а строки
+# собираются из них случайным выбором
+VALUE_POOL_SIZE = 5000
+_value_pool: Optional[dict] = None
+
+
+def _values(seed: int) -> dict:
+    """Наборы значений Faker для процесса-генератора (создаются один раз)."""
+    global _value_pool
+    if _value_pool is None:
+        fake.seed_instance(seed)
+        size = VALUE_POOL_SIZE
+        _value_pool = {
+            'name': [fake.name() for _ in range(size)],
+            'user': [fake.user_name() for _ in range(size)],
+            'domain': [fake.free_email_domain() for _ in range(50)],
+            'phone': [fake.phone_number() for _ in range(size)],
+            'company': [fake.company() for _ in range(size)],
+            'word': [fake.word().capitalize() for _ in range(size)],
+            'sentence': [fake.sentence(nb_words=4)[:-1] for _ in range(size)],
+            'text': [fake.text(max_nb_chars=200) for _ in range(size // 5)],
+        }
+    return _value_pool
+
+
+def generate_chunk(chunk: Chunk) -> List[tuple]:
+    """Сгенерировать строки для INSERT_SQL[entity] (выполняется в процессе-генераторе)."""
+    entity, start_id, count, client_ids, deal_ids, seed = chunk
+    values = _values(seed)
+    rnd = random.Random(seed + start_id)
+    choice = rnd.choice
+    created_at = datetime.now().isoformat()
+    today = datetime.now()
+    rows = []
+    
+    def pick(id_range: Tuple[int, int], probability: float) -> Optional[int]:
+        # Ссылка только на строку, созданную в этом же запуске
+        first, last = id_range
+        if last < first or rnd.random() > probability:
+            return None
+        return rnd.randint(first, last)
+    
+    for item_id in range(start_id, start_id + count):
+        if entity == "clients":
+            rows.append((
+                item_id, choice(values['name']),
+                f"{choice(values['user'])}{item_id}@{choice(values['domain'])}",
+                choice(values['phone']),
+                choice(values['company']) if rnd.random() > 0.3 else None,
+                choice(['active', 'archived']), created_at
+            ))
+        elif entity == "deals":
+            rows.append((
+                item_id, f"Сделка {choice(values['word'])}",
+                round(rnd.uniform(10000, 1000000), 2),
+                choice(['RUB', 'USD', 'EUR']),
+                choice(['new', 'in_progress', 'closed', 'cancelled']),
+                pick(client_ids, 0.8), None, created_at
+            ))
+        else:
+            due_date = None
+            if rnd.random() > 0.3:
+                due_date = (today + timedelta(days=rnd.randint(-30, 60))).strftime('%Y-%m-%d')
+            rows.append((
+                item_id, choice(values['sentence']),
+                choice(values['text']) if rnd.random() > 0.3 else None,
+                due_date, rnd.randint(0, 1),
+                pick(client_ids, 0.7), pick(deal_ids, 0.5), created_at
+            ))
+    return rows
+
+
+def _database_path(url: str) -> Path:
+    """Путь к файлу БД из DATABASE_URL (sqlite:///./data/crm.db) или пути."""
+    prefix = "sqlite:///"
+    return Path(url[len(prefix):] if url.startswith(prefix) else url)
+
+
+def _next_id(conn: sqlite3.Connection, table: str) -> int:
+    """Первый свободный id таблицы с AUTOINCREMENT."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return (row[0] if row else 0) + 1
+
+
+def _drop_deferred(conn: sqlite3.Connection) -> List[str]:
+    """
+    Снять вторичные индексы и триггеры таблиц данных.
+    
+    Returns:
+        SQL для их восстановления
+    """
+    objects = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+          AND tbl_name IN ('clients', 'deals', 'tasks')
+    """).fetchall()
+    with conn:
+        for kind, name, _ in objects:
+            conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in objects]
+
+
+def _restore_deferred(conn: sqlite3.Connection, statements: List[str]):
+    """Восстановить индексы и триггеры, перестроить поиск, версии и журнал."""
+    with conn:
+        for sql in statements:
+            conn.execute(sql)
+        for table in ("clients", "deals", "tasks"):
+            conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+        # Версии таблиц меняются один раз - кэши и ETag устаревают
+        conn.execute("UPDATE table_versions SET version = version + 1")
+        # Загруженных строк нет в журнале изменений: журнал очищается, а
+        # номер сдвигается, так что GET /api/changes с любым прежним
+        # since ответит 410, и клиенты перечитают данные целиком
+        conn.execute("DELETE FROM changes")
+        updated = conn.execute(
+            "UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'changes'"
+        ).rowcount
+        if not updated:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('changes', 1)")
+
+
+def _chunks(entity: str, start_id: int, n: int, chunk_size: int, client_ids, deal_ids, seed: int) -> Iterator[Chunk]:
+    for offset in range(0, n, chunk_size):
+        yield (entity, start_id + offset, min(chunk_size, n - offset), client_ids, deal_ids, seed)
+
+
+def fill_direct(db: Path, n: int, workers: int, chunk_size: int, seed: int):
+    """
+    Заполнить БД напрямую, минуя API.
+    
+    Args:
+        db: Файл БД (схема создаётся миграциями, если её нет)
+        n: Количество записей каждого типа
+        workers: Количество процессов-генераторов
+        chunk_size: Строк в одном задании генератору и в одной транзакции
+        seed: Зерно генераторов
+    """
+    db.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db))
+    conn.execute("PRAGMA journal_mode = WAL")
+    migrate(conn)
+    # Ссылки генерируются только на создаваемые здесь же строки
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    
+    first = {table: _next_id(conn, table) for table in ("clients", "deals", "tasks")}
+    client_ids = (first["clients"], first["clients"] + n - 1)
+    deal_ids = (first["deals"], first["deals"] + n - 1)
+    
+    # Перестройка индексов стоит пропорционально всей таблице: при
+    # небольшой дозаписи в большую БД выгоднее обновлять их построчно
+    existing = sum(first.values()) - 3
+    defer = n * 3 >= existing
+    
+    started = time.perf_counter()
+    deferred = _drop_deferred(conn) if defer else []
+    total = 0
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for entity, title in (("clients", "клиентов"), ("deals", "сделок"), ("tasks", "задач")):
+                done = 0
+                chunks = _chunks(entity, first[entity], n, chunk_size, client_ids, deal_ids, seed)
+                for rows in pool.imap(generate_chunk, chunks):
+                    with conn:
+                        conn.executemany(INSERT_SQL[entity], rows)
+                    done += len(rows)
+                    print(f"  Записано {done}/{n} {title}", flush=True)
+                total += done
+    finally:
+        if defer:
+            print("Восстановление индексов и триггеров...", flush=True)
+            _restore_deferred(conn, deferred)
+    
+    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    conn.execute("PRAGMA optimize")
+    conn.close()
+    
+    elapsed = time.perf_counter() - started
+    print(f"Записано {total} строк за {elapsed:.1f} с ({total / elapsed * 60:,.0f} строк/мин)")
+    if violations:
+        print(f"Нарушений внешних ключей: {len(violations)}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Заполнить БД тестовыми данными")
     parser.add_argument('--base-url', default='http://localhost:8000', help='URL API')
     parser.add_argument('--n', type=int, default=100, help='Количество записей каждого типа')
+    parser.add_argument('--batch-size', type=int, default=500, help='Записей в одном bulk-запросе')
+    parser.add_argument('--direct', action='store_true', help='Писать напрямую в SQLite, минуя API')
+    parser.add_argument('--db', type=Path,
+                        default=_database_path(os.getenv("DATABASE_URL", "sqlite:///./data/crm.db")),
+                        help='Файл БД для --direct')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Процессов-генераторов для --direct')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='Строк в одной транзакции для --direct')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генераторов для --direct')
     
     args = parser.parse_args()
     
+    if args.direct:
+        fill_direct(args.db, args.n, args.workers, args.chunk_size, args.seed)
+        return
+    
     base_url = args.base_url.rstrip('/')
     
-    print(f"Создание {args.n} клиентов...")
-    client_ids = []
-    for i in range(args.n):
-        try:
-            client_id = create_client(base_url)
-            client_ids.append(client_id)
-            if (i + 1) % 10 == 0:
-                print(f"  Создано {i + 1}/{args.n} клиентов")
-        except Exception as e:
-            print(f"  Ошибка при создании клиента {i + 1}: {e}")
+    client_ids = create_batched(
+        base_url, "clients", "клиентов", args.n, args.batch_size,
+        fake_client
+    )
     
-    print(f"Создание {args.n} сделок...")
-    deal_ids = []
-    for i in range(args.n):
-        try:
-            client_id = random.choice(client_ids) if client_ids and random.random() > 0.2 else None
-            deal_id = create_deal(base_url, client_id)
-            deal_ids.append(deal_id)
-            if (i + 1) % 10 == 0:
-                print(f"  Создано {i + 1}/{args.n} сделок")
-        except Exception as e:
-            print(f"  Ошибка при создании сделки {i + 1}: {e}")
+    deal_ids = create_batched(
+        base_url, "deals", "сделок", args.n, args.batch_size,
+        lambda: fake_deal(random.choice(client_ids) if client_ids and random.random() > 0.2 else None)
+    )
     
-    print(f"Создание {args.n} задач...")
-    for i in range(args.n):
-        try:
-            client_id = random.choice(client_ids) if client_ids and random.random() > 0.3 else None
-            deal_id = random.choice(deal_ids) if deal_ids and random.random() > 0.5 else None
-            create_task(base_url, client_id, deal_id)
-            if (i + 1) % 10 == 0:
-                print(f"  Создано {i + 1}/{args.n} задач")
-        except Exception as e:
-            print(f"  Ошибка при создании задачи {i + 1}: {e}")
+    create_batched(
+        base_url, "tasks", "задач", args.n, args.batch_size,
+        lambda: fake_task(
+            random.choice(client_ids) if client_ids and random.random() > 0.3 else None,
+            random.choice(deal_ids) if deal_ids and random.random() > 0.5 else None
+        )
+    )
     
     print("Готово!")
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,47 @@
+"""
+Общие фикстуры: временная БД с миграциями и поток записи для неё.
+"""
+
+import os
+import tempfile
+
+# backend.database читает DATABASE_URL при импорте: тесты не трогают data/crm.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='crm-test-')}/crm.db")
+
+import pytest
+from backend.database import connect
+from backend.migrations import migrate
+from backend.writer import Writer
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Файл свежей БД со схемой приложения."""
+    path = tmp_path / "crm.db"
+    conn = connect(path)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+    return path
+
+
+@pytest.fixture
+def db(db_path):
+    """Отдельное соединение для проверок: видит только закоммиченное."""
+    conn = connect(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def db_writer(db_path):
+    """
+    Поток записи для временной БД.
+    
+    Окно 100 мс: операции, отправленные подряд, попадают в одну транзакцию.
+    """
+    writer = Writer(db_path, window_ms=100)
+    writer.start()
+    yield writer
+    writer.stop()
@@ -0,0 +1,89 @@
+"""
+POST /api/batch: ссылки "$имя" и откат всего пакета при ошибке операции.
+"""
+
+import pytest
+from fastapi import HTTPException
+import backend.crud as crud
+from backend.batch import execute_batch, prepare_batch
+from backend.schemas import BatchOperation
+
+
+def run_batch(db_writer, operations):
+    prepared = prepare_batch([BatchOperation(**operation) for operation in operations])
+    return db_writer.submit(lambda conn: execute_batch(conn, prepared))
+
+
+def counts(conn) -> dict:
+    return {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("clients", "deals", "tasks")
+    }
+
+
+def test_refs_resolve_to_created_ids(db_writer):
+    run_batch(db_writer, [{"op": "create", "entity": "clients", "data": {"name": "first"}}])
+    
+    result = run_batch(db_writer, [
+        {"op": "create", "entity": "clients", "ref": "c", "data": {"name": "Иван"}},
+        {"op": "create", "entity": "deals", "ref": "d", "data": {"title": "Сделка", "client_id": "$c"}},
+        {"op": "create", "entity": "tasks", "data": {"title": "Звонок", "client_id": "$c", "deal_id": "$d"}},
+        {"op": "update", "entity": "clients", "id": "$c", "data": {"company": "Альфа"}},
+    ])
+    
+    assert result["refs"] == {"c": 2, "d": 1}
+    client, deal, task, updated = result["results"]
+    assert deal["row"]["client_id"] == client["id"] == 2
+    assert task["row"]["client_id"] == 2
+    assert task["row"]["deal_id"] == deal["id"]
+    assert updated["id"] == 2
+    assert updated["row"]["company"] == "Альфа"
+
+
+def test_unknown_ref_is_rejected_before_execution():
+    with pytest.raises(HTTPException) as exc:
+        prepare_batch([
+            BatchOperation(op="create", entity="deals", data={"title": "d", "client_id": "$missing"}),
+        ])
+    assert exc.value.status_code == 422
+
+
+def test_not_found_rolls_back_earlier_operations(db_writer, db):
+    with pytest.raises(HTTPException) as exc:
+        run_batch(db_writer, [
+            {"op": "create", "entity": "clients", "ref": "c", "data": {"name": "a"}},
+            {"op": "create", "entity": "deals", "data": {"title": "d", "client_id": "$c"}},
+            {"op": "update", "entity": "clients", "id": 999, "data": {"name": "b"}},
+        ])
+    
+    assert exc.value.status_code == 404
+    assert exc.value.detail.startswith("Operation 2:")
+    assert counts(db) == {"clients": 0, "deals": 0, "tasks": 0}
+
+
+def test_integrity_error_rolls_back_earlier_operations(db_writer, db):
+    with pytest.raises(HTTPException) as exc:
+        run_batch(db_writer, [
+            {"op": "create", "entity": "clients", "data": {"name": "a"}},
+            {"op": "create", "entity": "tasks", "data": {"title": "t"}},
+            # Внешний ключ на несуществующего клиента
+            {"op": "create", "entity": "deals", "data": {"title": "d", "client_id": 999}},
+        ])
+    
+    assert exc.value.status_code == 409
+    assert exc.value.detail.startswith("Operation 2:")
+    assert counts(db) == {"clients": 0, "deals": 0, "tasks": 0}
+
+
+def test_failed_batch_does_not_affect_neighbours_in_same_commit(db_writer, db):
+    prepared = prepare_batch([
+        BatchOperation(op="create", entity="clients", data={"name": "in batch"}),
+        BatchOperation(op="delete", entity="clients", id=999),
+    ])
+    neighbour = db_writer.submit_async(lambda conn: crud.create_client(conn, {"name": "neighbour"}))
+    failed = db_writer.submit_async(lambda conn: execute_batch(conn, prepared))
+    
+    neighbour.result()
+    with pytest.raises(HTTPException):
+        failed.result()
+    assert [row[0] for row in db.execute("SELECT name FROM clients")] == ["neighbour"]
@@ -0,0 +1,46 @@
+"""
+Строки отчёта читаются страницами, соединение пула берётся только на страницу.
+"""
+
+import backend.crud as crud
+from backend.database import ConnectionPool
+from backend.reports import iter_report_rows
+
+
+def seed_clients(db_writer, names):
+    db_writer.submit(lambda conn: crud.bulk_clients(conn, [{"name": name} for name in names], [], []))
+
+
+def test_pages_cover_all_rows_in_list_order(db_writer, db_path):
+    seed_clients(db_writer, [f"client {index}" for index in range(7)])
+    connections = ConnectionPool(db_path, size=1)
+    
+    rows = list(iter_report_rows("clients", {}, page_rows=3, connections=connections))
+    
+    assert [row["id"] for row in rows] == list(range(7, 0, -1))
+    assert rows[0]["name"] == "client 6"
+    assert set(rows[0]) == set(crud.COLUMNS["clients"])
+
+
+def test_connection_is_released_between_pages(db_writer, db_path):
+    seed_clients(db_writer, [f"client {index}" for index in range(5)])
+    connections = ConnectionPool(db_path, size=1)
+    
+    rows = iter_report_rows("clients", {}, page_rows=2, connections=connections)
+    next(rows)
+    # Единственное соединение пула свободно, пока строки страницы обрабатываются
+    with connections.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0] == 5
+    assert len(list(rows)) == 4
+
+
+def test_search_pages_follow_rank_keys(db_writer, db_path):
+    seed_clients(db_writer, ["Альфа", "Бета", "Альфа Бета", "Альфа Альфа", "Гамма"])
+    connections = ConnectionPool(db_path, size=1)
+    
+    paged = list(iter_report_rows("clients", {"q": "альфа"}, page_rows=1, connections=connections))
+    with connections.connection() as conn:
+        expected = crud.get_clients(conn, q="альфа")
+    
+    assert [row["id"] for row in paged] == [row["id"] for row in expected]
+    assert len(paged) == 3
@@ -0,0 +1,114 @@
+"""
+Поток записи: групповой коммит, SAVEPOINT на операцию, хуки после COMMIT.
+"""
+
+import sqlite3
+import threading
+import pytest
+import backend.crud as crud
+from backend.database import connect
+
+
+def client_names(conn) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM clients")}
+
+
+def test_operations_share_one_commit(db_writer):
+    commits = []
+    db_writer.on_commit(lambda: commits.append(1))
+    
+    futures = [db_writer.submit_async(lambda conn: crud.create_client(conn, {"name": name})) for name in "abc"]
+    
+    assert [future.result() for future in futures] == [1, 2, 3]
+    assert commits == [1]
+
+
+def test_each_caller_gets_own_result(db_writer, db):
+    names = [f"client-{index}" for index in range(32)]
+    results = {}
+    
+    def create(name):
+        results[name] = db_writer.submit(lambda conn: crud.create_client(conn, {"name": name}))
+    
+    threads = [threading.Thread(target=create, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(results.values()) == list(range(1, len(names) + 1))
+    for name, client_id in results.items():
+        assert crud.get_client(db, client_id)["name"] == name
+
+
+def test_each_caller_gets_own_exception(db_writer):
+    def fail(conn):
+        raise ValueError("boom")
+    
+    ok = db_writer.submit_async(lambda conn: crud.create_client(conn, {"name": "a"}))
+    failed = db_writer.submit_async(fail)
+    also_ok = db_writer.submit_async(lambda conn: "done")
+    
+    assert ok.result() == 1
+    with pytest.raises(ValueError, match="boom"):
+        failed.result()
+    assert also_ok.result() == "done"
+
+
+def test_failed_operation_rolls_back_only_its_savepoint(db_writer, db):
+    def create_then_fail(conn):
+        crud.create_client(conn, {"name": "b"})
+        raise RuntimeError("rollback b")
+    
+    futures = [
+        db_writer.submit_async(lambda conn: crud.create_client(conn, {"name": "a"})),
+        db_writer.submit_async(create_then_fail),
+        db_writer.submit_async(lambda conn: crud.create_client(conn, {"name": "c"})),
+    ]
+    
+    assert futures[0].result() == 1
+    with pytest.raises(RuntimeError):
+        futures[1].result()
+    futures[2].result()
+    assert client_names(db) == {"a", "c"}
+
+
+def test_integrity_error_rolls_back_only_its_operation(db_writer, db):
+    ok = db_writer.submit_async(lambda conn: crud.create_client(conn, {"name": "a"}))
+    # Внешний ключ на несуществующего клиента
+    bad = db_writer.submit_async(lambda conn: crud.create_deal(conn, {"title": "d", "client_id": 999}))
+    
+    ok.result()
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result()
+    assert client_names(db) == {"a"}
+    assert db.execute("SELECT COUNT(*) FROM deals").fetchone()[0] == 0
+
+
+def test_on_commit_runs_after_commit(db_writer, db_path):
+    seen = []
+    
+    def hook():
+        # Другое соединение видит данные только после COMMIT
+        conn = connect(db_path)
+        try:
+            seen.append(client_names(conn))
+        finally:
+            conn.close()
+    
+    db_writer.on_commit(hook)
+    db_writer.submit(lambda conn: crud.create_client(conn, {"name": "a"}))
+    # Хуки идут после результатов пачки: следующая операция ждёт их
+    db_writer.submit(lambda conn: None)
+    
+    assert seen[0] == {"a"}
+
+
+def test_failing_hook_does_not_stop_writer(db_writer):
+    def hook():
+        raise RuntimeError("hook failed")
+    
+    db_writer.on_commit(hook)
+    
+    assert db_writer.submit(lambda conn: crud.create_client(conn, {"name": "a"})) == 1
+    assert db_writer.submit(lambda conn: crud.create_client(conn, {"name": "b"})) == 2